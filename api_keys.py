@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+
+from rate_limiter import AdaptiveRateLimiter
+
+# 401 is a bad or revoked key, 402 an exhausted one: neither recovers
+# within a run, so the key is dropped from rotation.
+DISABLING_HTTP = {401: "rejected (401)", 402: "out of credit (402)"}
+
+
+class NoUsableKey(RuntimeError):
+    pass
+
+
+class ApiKey:
+    def __init__(self, key, limiter, credits=None, name=None):
+        self.key = key
+        self.name = name or f"...{key[-4:]}"  # summaries never carry the full key
+        self.limiter = limiter
+        self.credits = credits  # max billable calls this process may spend
+        self.calls = 0
+        self.spent = 0  # calls reserved against credits, in flight included
+        self.successes = 0
+        self.throttled = 0
+        self.credits_left = None
+        self.disabled = None
+
+    def available(self):
+        return self.disabled is None and (self.credits is None or self.spent < self.credits)
+
+    def usage(self):
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "successes": self.successes,
+            "throttled": self.throttled,
+            "credits_left": self.credits_left,
+            "rate": round(self.limiter.rate, 3),
+            "disabled": self.disabled,
+        }
+
+
+class KeyPool:
+    # Spreads requests over several scrapin.io keys. Each key has its own
+    # AIMD limiter, so a 429 only slows the key that got it; every request
+    # goes to the usable key whose next send slot comes first.
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def single(cls, key, limiter):
+        return cls([ApiKey(key, limiter)])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _reserve(self):
+        with self._lock:
+            candidates = [k for k in self.keys if k.available()]
+            if not candidates:
+                reasons = sorted({k.disabled or "credit limit reached" for k in self.keys})
+                raise NoUsableKey(f"No usable API key left ({', '.join(reasons)})")
+            key = min(candidates, key=lambda k: k.limiter.ready_in())
+            key.spent += 1
+            return key, key.limiter.reserve()
+
+    def acquire(self):
+        key, delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return key, delay
+
+    async def acquire_async(self):
+        key, delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return key, delay
+
+    def record(self, key, status_code):
+        with self._lock:
+            if status_code == 429:
+                key.throttled += 1
+                key.spent -= 1  # throttled calls are not billed
+                return
+            key.calls += 1
+            if status_code in DISABLING_HTTP and key.disabled is None:
+                key.disabled = DISABLING_HTTP[status_code]
+                print(f"🔑 API key {key.name} {key.disabled}, routing around it")
+
+    def record_success(self, key, credits_left=None):
+        # credits_left is what scrapin.io reports in the response body.
+        with self._lock:
+            key.successes += 1
+            if isinstance(credits_left, (int, float)):
+                key.credits_left = credits_left
+                if credits_left <= 0 and key.disabled is None:
+                    key.disabled = "out of credit"
+                    print(f"🔑 API key {key.name} is out of credit, routing around it")
+
+    def latencies(self):
+        samples = []
+        for k in self.keys:
+            samples.extend(k.limiter.latencies)
+        return samples
+
+    def throttle_events(self):
+        events = [dict(event, key=k.name) for k in self.keys for event in k.limiter.throttle_events]
+        return sorted(events, key=lambda event: event["time"])
+
+    def stats(self):
+        # Same shape as AdaptiveRateLimiter.stats(), summed over the keys.
+        if len(self.keys) == 1:
+            return self.keys[0].limiter.stats()
+        merged = AdaptiveRateLimiter()
+        for k in self.keys:
+            merged.latencies.extend(k.limiter.latencies)
+        p50, p95 = merged.latency_percentile(50), merged.latency_percentile(95)
+        per_key = [k.limiter.stats() for k in self.keys]
+        return {
+            "latency_p50_s": round(p50, 3) if p50 is not None else None,
+            "latency_p95_s": round(p95, 3) if p95 is not None else None,
+            "rate": round(sum(s["rate"] for s in per_key), 3),
+            "successes": sum(s["successes"] for s in per_key),
+            "throttle_events": sum(s["throttle_events"] for s in per_key),
+            "paused_for_s": min(s["paused_for_s"] for s in per_key),
+        }
+
+    def usage(self):
+        with self._lock:
+            return [k.usage() for k in self.keys]
+
+
+def key_entries(config):
+    # config.json holds either "API_KEY": "..." or "API_KEYS": a list of
+    # keys, each a string or {"key", "name", "rate", "max_rate", "credits"}.
+    entries = config.get("API_KEYS") or [config["API_KEY"]]
+    return [{"key": entry} if isinstance(entry, str) else dict(entry) for entry in entries]
+
+
+def key_pool_from_config(config, rate, max_rate, limiter=None):
+    # rate/max_rate apply per key unless an entry sets its own. A single
+    # key keeps the caller's limiter, so its learned rate carries over.
+    entries = key_entries(config)
+    keys = []
+    for entry in entries:
+        if limiter is not None and len(entries) == 1:
+            key_limiter = limiter
+        else:
+            key_rate = float(entry.get("rate", rate))
+            key_max_rate = max(key_rate, float(entry.get("max_rate", max_rate)))
+            key_limiter = AdaptiveRateLimiter(rate=key_rate, max_rate=key_max_rate)
+        keys.append(ApiKey(entry["key"], key_limiter, entry.get("credits"), entry.get("name")))
+    return KeyPool(keys)
+
+
+def combine_key_usage(usages):
+    # Sums per-key usage across summaries (queue units, daemon chunks);
+    # credits, rate and state come from the latest one that reported them.
+    combined = {}
+    for usage in usages:
+        for entry in usage or ():
+            total = combined.get(entry["name"])
+            if total is None:
+                combined[entry["name"]] = dict(entry)
+                continue
+            for field in ("calls", "successes", "throttled"):
+                total[field] += entry[field]
+            for field in ("credits_left", "rate", "disabled"):
+                if entry[field] is not None:
+                    total[field] = entry[field]
+    return list(combined.values())
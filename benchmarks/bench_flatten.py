@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from linkedin_scraper import build_projection  # noqa: E402
+from field_projection import KEEP_FIELD_PREFIXES  # noqa: E402
+from benchmarks.profiles import synthetic_profile  # noqa: E402
+
+
+def load_responses(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def flatten_json(y, prefix='', out=None):
+    # The scraper's original path: flatten the whole response, then filter.
+    if out is None:
+        out = {}
+    for k, v in y.items():
+        new_key = f'{prefix}.{k}' if prefix else k
+        if isinstance(v, dict):
+            flatten_json(v, new_key, out)
+        elif isinstance(v, list):
+            for i, item in enumerate(v):
+                if isinstance(item, dict):
+                    flatten_json(item, f'{new_key}[{i}]', out)
+                else:
+                    out[f'{new_key}[{i}]'] = item
+        else:
+            out[new_key] = v
+    return out
+
+
+def legacy_path(response):
+    flat = flatten_json(response)
+    return {k: v for k, v in flat.items() if k.startswith(KEEP_FIELD_PREFIXES)}
+
+
+def time_it(fn, responses, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for response in responses:
+            fn(response)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare flatten+filter against the compiled field projection")
+    parser.add_argument("--responses", help="JSONL file of recorded /enrichment/profile responses")
+    parser.add_argument("--count", type=int, default=2000, help="Synthetic responses when --responses is not given")
+    parser.add_argument("--positions", type=int, default=15, help="Positions per synthetic profile")
+    parser.add_argument("--max-positions", type=int, help="List cap to apply to the projection")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.responses:
+        responses = load_responses(args.responses)
+    else:
+        responses = [synthetic_profile(f"https://www.linkedin.com/in/user-{i}", positions=args.positions)
+                     for i in range(args.count)]
+
+    projection = build_projection(args.max_positions)
+    if args.max_positions is None:
+        mismatches = sum(1 for r in responses if legacy_path(r) != projection.project(r))
+    else:
+        mismatches = None  # capped output intentionally differs
+
+    legacy_s = time_it(legacy_path, responses, args.repeat)
+    projected_s = time_it(projection.project, responses, args.repeat)
+    print(json.dumps({
+        "responses": len(responses),
+        "legacy_us_per_row": round(legacy_s / len(responses) * 1e6, 2),
+        "projection_us_per_row": round(projected_s / len(responses) * 1e6, 2),
+        "speedup": round(legacy_s / projected_s, 2),
+        "mismatches": mismatches,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.profiles import synthetic_profile  # noqa: E402
+
+PAYLOAD_VARIANTS = 64  # distinct bodies, serialized once up front
+
+
+class MockScrapin(ThreadingHTTPServer):
+    # Local stand-in for GET /enrichment/profile. Latency, payload size and
+    # the share of 429, 5xx and success:false answers are configurable so
+    # benchmarks exercise retries and the rate limiter without API credits.
+    daemon_threads = True
+
+    def __init__(self, port=0, latency_ms=200.0, latency_dist="lognormal", jitter=0.5, positions=10,
+                 rate_429=0.0, rate_5xx=0.0, rate_fail=0.0, retry_after="1", seed=0, key_rate=0.0,
+                 rate_hang=0.0, hang_ms=60000.0, host="127.0.0.1"):
+        super().__init__((host, port), MockHandler)
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rate_fail = rate_fail
+        self.retry_after = retry_after
+        self.key_rate = key_rate
+        self.rate_hang = rate_hang
+        self.hang_ms = hang_ms
+        self.key_slots = {}  # apikey -> next time a request is allowed
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.bodies = [
+            json.dumps(synthetic_profile(f"https://www.linkedin.com/in/mock-{i}", positions=positions, seed=i)).encode()
+            for i in range(PAYLOAD_VARIANTS)
+        ]
+        self.fail_body = json.dumps({"success": False, "message": "Profile not found"}).encode()
+        self.stats = {"requests": 0, "200": 0, "429": 0, "5xx": 0, "success_false": 0, "hung": 0}
+        self.stats_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/enrichment/profile"
+
+    def draw(self):
+        with self.rng_lock:
+            if self.latency_dist == "fixed":
+                delay = self.latency_ms
+            elif self.latency_dist == "uniform":
+                delay = self.rng.uniform(self.latency_ms * (1 - self.jitter), self.latency_ms * (1 + self.jitter))
+            else:  # lognormal around latency_ms as the median, long right tail
+                delay = self.latency_ms * self.rng.lognormvariate(0, self.jitter)
+            roll = self.rng.random()
+            body = self.rng.choice(self.bodies)
+            # A hung upstream: the answer only comes after hang_ms, if the
+            # client is still waiting.
+            hung = bool(self.rate_hang) and self.rng.random() < self.rate_hang
+            if hung:
+                delay = self.hang_ms
+        if hung:
+            with self.stats_lock:
+                self.stats["hung"] += 1
+        if roll < self.rate_429:
+            outcome = "429"
+        elif roll < self.rate_429 + self.rate_5xx:
+            outcome = "5xx"
+        elif roll < self.rate_429 + self.rate_5xx + self.rate_fail:
+            outcome = "success_false"
+        else:
+            outcome = "200"
+        return delay / 1000, outcome, body
+
+    def over_key_rate(self, apikey):
+        # Per-key rate limit like the real API's: each key gets key_rate
+        # requests per second, anything faster is answered with a 429.
+        if not self.key_rate:
+            return False
+        with self.stats_lock:
+            now = time.monotonic()
+            slot = self.key_slots.get(apikey, now)
+            if slot > now + 1.0:  # allow a one second burst
+                return True
+            self.key_slots[apikey] = max(slot, now) + 1.0 / self.key_rate
+            return False
+
+    def count(self, outcome):
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            self.stats[outcome] += 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return  # client dropped a keep-alive connection
+        super().handle_error(request, client_address)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def do_GET(self):
+        server = self.server
+        path = urlparse(self.path)
+        if path.path == "/__stats":
+            with server.stats_lock:
+                return self.reply(200, json.dumps(server.stats).encode())
+        query = parse_qs(path.query)
+        if path.path != "/enrichment/profile" or "linkedInUrl" not in query:
+            return self.reply(404, b'{"success": false, "message": "Not found"}')
+
+        delay, outcome, body = server.draw()
+        if server.over_key_rate(query.get("apikey", [""])[0]):
+            outcome = "429"
+        time.sleep(delay)
+        server.count(outcome)
+        if outcome == "429":
+            self.reply(429, b'{"success": false, "message": "Too many requests"}',
+                       {"Retry-After": server.retry_after})
+        elif outcome == "5xx":
+            self.reply(503, b'{"success": false, "message": "Service unavailable"}')
+        elif outcome == "success_false":
+            self.reply(200, server.fail_body)
+        else:
+            self.reply(200, body)
+
+    def reply(self, status, body, headers=None):
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up on a hung request
+
+    def log_message(self, *args):
+        pass
+
+
+def add_mock_arguments(parser):
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Median response latency")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--jitter", type=float, default=0.5,
+                        help="Lognormal sigma, or the +/- fraction for a uniform distribution")
+    parser.add_argument("--positions", type=int, default=10, help="Positions per profile (payload size)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--rate-fail", type=float, default=0.0, help="Share answered with success: false")
+    parser.add_argument("--retry-after", default="1", help="Retry-After header sent with 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--key-rate", type=float, default=0.0,
+                        help="Requests/s allowed per API key before 429s (0: no per-key limit)")
+    parser.add_argument("--rate-hang", type=float, default=0.0, help="Share of requests that hang for --hang-ms")
+    parser.add_argument("--hang-ms", type=float, default=60000.0, help="How long a hung request stalls")
+
+
+def mock_options(args):
+    return {
+        "latency_ms": args.latency_ms,
+        "latency_dist": args.latency_dist,
+        "jitter": args.jitter,
+        "positions": args.positions,
+        "rate_429": args.rate_429,
+        "rate_5xx": args.rate_5xx,
+        "rate_fail": args.rate_fail,
+        "retry_after": args.retry_after,
+        "seed": args.seed,
+        "key_rate": args.key_rate,
+        "rate_hang": args.rate_hang,
+        "hang_ms": args.hang_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock scrapin.io /enrichment/profile endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockScrapin(args.port, host=args.host, **mock_options(args))
+    print(json.dumps({"url": server.url, "payload_bytes": sum(map(len, server.bodies)) // len(server.bodies)}),
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import random
+
+
+def synthetic_profile(url, positions=10, educations=3, skills=25, seed=None):
+    # Shape follows the scrapin.io /enrichment/profile response.
+    rng = random.Random(seed if seed is not None else url)
+    slug = url.rstrip("/").rsplit("/", 1)[-1]
+
+    def date(year):
+        return {"month": rng.randint(1, 12), "year": year}
+
+    history = []
+    year = 2024
+    for i in range(positions):
+        start = year - rng.randint(1, 4)
+        history.append({
+            "title": f"Title {i} at {slug}",
+            "companyName": f"Company {rng.randint(1, 5000)}",
+            "companyLocation": "Berlin, Germany",
+            "description": "Responsible for " + " ".join(rng.choice(["sales", "ops", "growth", "data"]) for _ in range(30)),
+            "linkedInUrl": f"https://www.linkedin.com/company/{rng.randint(1, 10**6)}",
+            "linkedInId": str(rng.randint(1, 10**8)),
+            "companyLogo": f"https://media.licdn.com/logo/{rng.randint(1, 10**9)}.png",
+            "startEndDate": {"start": date(start), "end": date(year) if i else None},
+        })
+        year = start
+    return {
+        "success": True,
+        "credits_left": rng.randint(0, 10**6),
+        "rate_limit_left": rng.randint(0, 500),
+        "person": {
+            "publicIdentifier": slug,
+            "linkedInIdentifier": str(rng.randint(1, 10**9)),
+            "firstName": slug.split("-")[0].title(),
+            "lastName": "Doe",
+            "headline": "Head of Something",
+            "location": "Berlin, Germany",
+            "summary": "Summary " * 40,
+            "photoUrl": f"https://media.licdn.com/photo/{slug}.jpg",
+            "backgroundUrl": f"https://media.licdn.com/bg/{slug}.jpg",
+            "openToWork": False,
+            "premium": rng.random() < 0.3,
+            "followerCount": rng.randint(0, 50000),
+            "linkedInUrl": url,
+            "positions": {"positionsCount": positions, "positionHistory": history},
+            "schools": {
+                "educationsCount": educations,
+                "educationHistory": [
+                    {"degreeName": "MSc", "fieldOfStudy": "Physics", "schoolName": f"University {j}",
+                     "startEndDate": {"start": date(2000 + j), "end": date(2004 + j)}}
+                    for j in range(educations)
+                ],
+            },
+            "skills": [f"skill {k}" for k in range(skills)],
+            "languages": ["English", "German"],
+            "recommendations": {"recommendationsCount": 0, "recommendationHistory": []},
+            "certifications": {"certificationsCount": 0, "certificationHistory": []},
+        },
+        "company": {
+            "linkedInId": str(rng.randint(1, 10**6)),
+            "name": f"Company {rng.randint(1, 5000)}",
+            "universalName": "company",
+            "linkedInUrl": "https://www.linkedin.com/company/company",
+            "employeeCount": rng.randint(1, 10000),
+            "websiteUrl": "https://example.com",
+            "industry": "Software",
+            "specialities": [f"spec {k}" for k in range(10)],
+            "headquarter": {"city": "Berlin", "country": "DE", "postalCode": "10115"},
+        },
+    }
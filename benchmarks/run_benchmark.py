@@ -0,0 +1,198 @@
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.mock_scrapin import add_mock_arguments  # noqa: E402
+
+ENTRIES = ["cli-threads", "cli-async", "ui"]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+
+def write_input(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["LinkedIn URL"])
+        for i in range(rows):
+            writer.writerow([f"https://www.linkedin.com/in/bench-user-{i}"])
+
+
+def run_entry(entry, args):
+    # Runs inside the child process so RSS and CPU belong to one entry point.
+    from scraper_metrics import metrics
+
+    if entry == "ui":
+        logging.getLogger("streamlit").setLevel(logging.ERROR)
+        with contextlib.redirect_stderr(open(os.devnull, "w")):
+            import linkedin_scraper_ui as ui
+        ui.INITIAL_RATE, ui.MAX_RATE = args.rate, args.max_rate
+        scrape = ui.scrape_profile
+
+        def timed_scrape(url, limiter=None):
+            with metrics.timer("request_seconds"):
+                result = scrape(url, limiter)
+            metrics.inc("results_total", "success" if result["status"] == "✅ Success" else "failure")
+            return result
+
+        ui.scrape_profile = timed_scrape
+        with open(args.input, newline="") as f:
+            urls = [row[0] for row in list(csv.reader(f))[1:]]
+
+        def call():
+            ui.batch_scrape(urls, "refresh")
+    else:
+        import linkedin_scraper
+
+        def call():
+            linkedin_scraper.batch_scrape(
+                args.input, "result_bench.csv", batch_index="bench", engine=entry.split("-", 1)[1],
+                concurrency=args.concurrency, rate=args.rate, max_rate=args.max_rate, cache_path=None,
+                read_timeout=args.read_timeout, hedge=args.hedge, deadline_s=args.chunk_deadline,
+                summary_file="summary_bench.json",
+            )
+
+    rss_before = peak_rss_mb()
+    cpu_before = cpu_seconds()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")), contextlib.redirect_stderr(open(os.devnull, "w")):
+        call()
+    wall = time.perf_counter() - started
+    cpu = cpu_seconds() - cpu_before
+
+    snapshot = metrics.snapshot()
+    request = snapshot["histograms"].get("request_seconds", {})
+    summary = {}
+    if os.path.exists("summary_bench.json"):
+        with open("summary_bench.json") as f:
+            summary = json.load(f)
+    return {
+        "entry": entry,
+        "rows": args.rows,
+        "wall_s": round(wall, 3),
+        "rows_per_s": round(args.rows / wall, 2),
+        "latency_p50_s": request.get("p50"),
+        "latency_p99_s": request.get("p99"),
+        "tail_s": summary.get("tail_s"),
+        "hedges": summary.get("hedges"),
+        "timeouts": sum(snapshot["counters"].get("timeouts_total", {}).values()),
+        "cpu_s": round(cpu, 3),
+        "cpu_ms_per_row": round(cpu / args.rows * 1000, 4),
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "outcomes": snapshot["counters"].get("results_total", {}),
+        "throttled": sum(snapshot["counters"].get("throttled_total", {}).values()),
+        "retries": sum(snapshot["counters"].get("retries_total", {}).values()),
+    }
+
+
+def start_mock(args):
+    command = [
+        sys.executable, os.path.join(REPO_ROOT, "benchmarks", "mock_scrapin.py"), "--port", "0",
+        "--latency-ms", str(args.latency_ms), "--latency-dist", args.latency_dist, "--jitter", str(args.jitter),
+        "--positions", str(args.positions), "--rate-429", str(args.rate_429), "--rate-5xx", str(args.rate_5xx),
+        "--rate-fail", str(args.rate_fail), "--retry-after", args.retry_after, "--seed", str(args.seed),
+        "--key-rate", str(args.key_rate), "--rate-hang", str(args.rate_hang), "--hang-ms", str(args.hang_ms),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    info = json.loads(process.stdout.readline())
+    return process, info
+
+
+def mock_stats(url):
+    with urllib.request.urlopen(url.replace("/enrichment/profile", "/__stats")) as response:
+        return json.loads(response.read())
+
+
+def run_child(entry, rows, mock_url, args):
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{entry}_")
+    input_file = os.path.join(work_dir, "input.csv")
+    write_input(input_file, rows)
+    with open(os.path.join(work_dir, "config.json"), "w") as f:
+        json.dump({"API_KEYS": [f"bench-{i}" for i in range(args.keys)]}, f)
+
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", entry, "--input", input_file, "--rows", str(rows),
+        "--rate", str(args.rate), "--max-rate", str(args.max_rate), "--concurrency", str(args.concurrency),
+        "--read-timeout", str(args.read_timeout),
+    ]
+    if args.hedge:
+        command.append("--hedge")
+    if args.chunk_deadline:
+        command += ["--chunk-deadline", str(args.chunk_deadline)]
+    env = {**os.environ, "SCRAPIN_API_URL": mock_url}
+    before = mock_stats(mock_url)
+    output = subprocess.run(command, cwd=work_dir, env=env, capture_output=True, text=True, check=True).stdout
+    after = mock_stats(mock_url)
+    result = json.loads(output.strip().splitlines()[-1])
+    result["mock"] = {key: after[key] - before[key] for key in after}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark both scraper entry points against a mock scrapin.io")
+    parser.add_argument("--entries", nargs="+", choices=ENTRIES, default=ENTRIES)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000], help="Synthetic URLs per run")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="Starting limiter rate; high by default to measure engine overhead")
+    parser.add_argument("--max-rate", type=float, default=1000.0)
+    parser.add_argument("--concurrency", type=int, default=20, help="In-flight requests for cli-async")
+    parser.add_argument("--keys", type=int, default=1, help="API keys in the generated config.json (CLI entries)")
+    parser.add_argument("--read-timeout", type=float, default=30.0, help="Read timeout for the CLI entries")
+    parser.add_argument("--hedge", action="store_true", help="Hedge slow requests in the CLI entries")
+    parser.add_argument("--chunk-deadline", type=float, help="Chunk deadline (seconds) for the CLI entries")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--child", choices=ENTRIES, help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        args.rows = args.rows[0]
+        print(json.dumps(run_entry(args.child, args)))
+        return
+
+    mock, info = start_mock(args)
+    try:
+        runs = [run_child(entry, rows, info["url"], args) for rows in args.rows for entry in args.entries]
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    report = {
+        "mock": {
+            "latency_ms": args.latency_ms, "latency_dist": args.latency_dist, "jitter": args.jitter,
+            "payload_bytes": info["payload_bytes"], "rate_429": args.rate_429, "rate_5xx": args.rate_5xx,
+            "rate_fail": args.rate_fail, "key_rate": args.key_rate,
+            "rate_hang": args.rate_hang, "hang_ms": args.hang_ms,
+        },
+        "keys": args.keys,
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
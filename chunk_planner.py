@@ -0,0 +1,92 @@
+import math
+import statistics
+from collections import defaultdict
+
+# Used until the progress log holds telemetry from real runs: the old
+# dashboard estimate of 200 rows per minute per VM.
+DEFAULT_ROWS_PER_SEC = 200 / 60
+VM_STARTUP_S = 120  # boot, module download and config before the first request
+MIN_CHUNK_ROWS = 50
+MAX_SAMPLES = 50  # most recent worker summaries considered
+THROTTLE_TOLERANCE = 0.02  # 429s per API call above which a run counts as throttled
+DEFAULT_COST_PER_CALL = 0.01  # USD per profile lookup
+
+
+def worker_summaries(records):
+    return [
+        record for record in records
+        if isinstance(record.get("summary"), dict)
+        and record["summary"].get("rows")
+        and record["summary"].get("rows_per_s")
+    ]
+
+
+def throughput_profile(records, max_samples=MAX_SAMPLES):
+    # Condenses past workers' run summaries from the progress log into the
+    # per-VM numbers the planner needs.
+    samples = worker_summaries(records)[-max_samples:]
+    if not samples:
+        return {
+            "samples": 0,
+            "rows_per_s": DEFAULT_ROWS_PER_SEC,
+            "latency_p95_s": None,
+            "throttle_rate": 0.0,
+            "fetch_ratio": 1.0,
+            "vm_ceiling": None,
+        }
+
+    summaries = [record["summary"] for record in samples]
+    rows = sum(s["rows"] for s in summaries)
+    fetched = sum(s.get("fetched", s["rows"]) for s in summaries)
+    throttles = sum(s.get("throttle_events", 0) for s in summaries)
+    latencies = [s["latency_p95_s"] for s in summaries if s.get("latency_p95_s") is not None]
+
+    # All VMs share one API key, so more VMs stop helping once the API starts
+    # answering 429. Cap the plan at the most workers a run had without that.
+    runs = defaultdict(lambda: {"workers": 0, "fetched": 0, "throttles": 0})
+    for record in samples:
+        run = runs[record.get("run_id")]
+        run["workers"] += 1
+        run["fetched"] += record["summary"].get("fetched", 0)
+        run["throttles"] += record["summary"].get("throttle_events", 0)
+    throttled = [r for r in runs.values() if r["fetched"] and r["throttles"] / r["fetched"] > THROTTLE_TOLERANCE]
+    clean = [r["workers"] for r in runs.values() if r not in throttled]
+    vm_ceiling = max(clean, default=1) if throttled else None
+
+    return {
+        "samples": len(summaries),
+        "rows_per_s": statistics.median(s["rows_per_s"] for s in summaries),
+        "latency_p95_s": statistics.median(latencies) if latencies else None,
+        "throttle_rate": throttles / fetched if fetched else 0.0,
+        "fetch_ratio": fetched / rows if rows else 1.0,
+        "vm_ceiling": vm_ceiling,
+    }
+
+
+def plan_chunks(total_rows, target_minutes, max_vms, profile, cost_per_call=DEFAULT_COST_PER_CALL,
+                startup_s=VM_STARTUP_S, min_chunk_rows=MIN_CHUNK_ROWS):
+    # Smallest number of equal chunks (one VM each) that finishes within the
+    # target, limited by max_vms and the observed 429 ceiling.
+    rows_per_s = profile["rows_per_s"]
+    budget_s = max(target_minutes * 60 - startup_s, 60)
+    wanted = math.ceil(total_rows / (rows_per_s * budget_s)) if total_rows else 1
+
+    caps = {"max VMs": max_vms, "minimum chunk size": max(1, math.ceil(total_rows / min_chunk_rows))}
+    if profile.get("vm_ceiling"):
+        caps["429 ceiling"] = profile["vm_ceiling"]
+    limited_by = min(caps, key=caps.get)
+    vms = max(1, min(wanted, caps[limited_by]))
+
+    rows_per_chunk = max(1, math.ceil(total_rows / vms))
+    chunks = max(1, math.ceil(total_rows / rows_per_chunk))
+    predicted_s = startup_s + rows_per_chunk / rows_per_s
+    api_calls = round(total_rows * profile.get("fetch_ratio", 1.0))
+    return {
+        "chunks": chunks,
+        "rows_per_chunk": rows_per_chunk,
+        "predicted_minutes": predicted_s / 60,
+        "meets_target": predicted_s <= target_minutes * 60,
+        "limited_by": limited_by if vms < wanted else None,
+        "api_calls": api_calls,
+        "api_cost": api_calls * cost_per_call,
+    }
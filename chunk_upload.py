@@ -0,0 +1,81 @@
+import csv
+import gzip
+import io
+import itertools
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+UPLOAD_WORKERS = 8
+SPOOL_MAX_BYTES = 16 * 1024 * 1024  # larger chunks roll over to a temp file
+GZIP_LEVEL = 6  # most of level 9's ratio on CSV at a fraction of the CPU
+
+
+def read_csv_rows(file):
+    # Header, then data rows, read straight from a binary upload stream.
+    # Blank lines are skipped, as pd.read_csv does.
+    file.seek(0)
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        for row in csv.reader(text):
+            if row:
+                yield row
+    finally:
+        text.detach()  # leave the upload open for the next pass
+
+
+def count_rows(file):
+    return max(0, sum(1 for _ in read_csv_rows(file)) - 1)
+
+
+def spool_chunks(header, rows, rows_per_chunk, name_for, gzip_chunks=False):
+    # Cuts rows into CSV chunks of rows_per_chunk, each written to its own
+    # spooled buffer. Yields (blob_name, buffer, rows) one chunk at a time.
+    rows = iter(rows)
+    index = 0
+    for first in rows:
+        index += 1
+        buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        raw = gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=GZIP_LEVEL, mtime=0) if gzip_chunks else buffer
+        text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        writer = csv.writer(text)
+        writer.writerow(header)
+        writer.writerow(first)
+        count = 1
+        for row in itertools.islice(rows, rows_per_chunk - 1):
+            writer.writerow(row)
+            count += 1
+        text.flush()
+        text.detach()
+        if gzip_chunks:
+            raw.close()  # writes the gzip trailer, buffer stays open
+        yield name_for(index), buffer, count
+
+
+def upload_chunks(bucket, chunks, workers=UPLOAD_WORKERS, gzip_chunks=False):
+    # Uploads spooled chunks on a bounded pool and yields (blob_name, rows,
+    # bytes) as each one lands. The next chunk is only built once a slot is
+    # free, so at most workers + 1 buffers exist at a time.
+    def upload(name, buffer, count):
+        try:
+            size = buffer.seek(0, io.SEEK_END)
+            buffer.seek(0)
+            blob = bucket.blob(name)
+            if gzip_chunks:
+                # Served decompressed (decompressive transcoding), so gsutil
+                # and the workers still read a plain CSV.
+                blob.content_encoding = "gzip"
+            blob.upload_from_file(buffer, size=size, content_type="text/csv")
+            return name, count, size
+        finally:
+            buffer.close()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as pool:
+        in_flight = set()
+        for chunk in chunks:
+            if len(in_flight) >= workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            in_flight.add(pool.submit(upload, *chunk))
+        for future in as_completed(in_flight):
+            yield future.result()
@@ -1,13 +1,136 @@
 # main.py
-from google.cloud import storage
-from googleapiclient import discovery
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def launch_scraper_vms(event, context):
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+from vm_launch import CHUNK_BLOB, http_status, insert_instance, instance_body, vm_name_for
+
+LAUNCH_WORKERS = 8
+
+# Quota and rate errors clear up on their own; the event is retried.
+RETRIABLE_HTTP = {403, 429, 500, 502, 503}
+QUOTA_MARKERS = ("quota", "ratelimitexceeded", "resource_pool_exhausted")
+
+
+class LaunchDeferred(RuntimeError):
+    # Raised so Cloud Functions redelivers the event (deploy with --retry).
+    pass
+
+
+def launch_marker(run_id, chunk_index):
+    return f"users/{run_id}/launches/chunk_{chunk_index}.json"
+
+
+def is_retriable(exc):
+    status = http_status(exc)
+    if status == 403:
+        return any(marker in str(exc).lower() for marker in QUOTA_MARKERS)
+    return status in RETRIABLE_HTTP
+
+
+class ChunkLauncher:
+    # Starts exactly one worker VM per chunk of a session, however many
+    # finalize events arrive for it. Each chunk is claimed through a
+    # create-only launch marker; only the event that creates the marker
+    # inserts the VM. Clients are injected so this runs against LocalBucket
+    # and a fake compute API; compute_factory is called per thread because
+    # googleapiclient services are not thread-safe.
+    def __init__(self, bucket, compute_factory, project, zone, template, workers=LAUNCH_WORKERS):
+        self.bucket = bucket
+        self.compute_factory = compute_factory
+        self._local = threading.local()
+        self.project = project
+        self.zone = zone
+        self.template = template
+        self.workers = workers
+
+    @property
+    def compute(self):
+        if not hasattr(self._local, "compute"):
+            self._local.compute = self.compute_factory()
+        return self._local.compute
+
+    def session_chunks(self, run_id):
+        # The whole session in one listing, so a dropped event for a sibling
+        # chunk is picked up by the next one.
+        prefix = f"users/{run_id}/chunks/"
+        indexes = set()
+        for blob in self.bucket.list_blobs(prefix=prefix, match_glob=f"{prefix}chunk_*.csv"):
+            match = CHUNK_BLOB.match(blob.name)
+            if match:
+                indexes.add(int(match.group(2)))
+        return sorted(indexes)
+
+    def claimed_chunks(self, run_id):
+        prefix = f"users/{run_id}/launches/"
+        return {blob.name for blob in self.bucket.list_blobs(prefix=prefix)}
+
+    def claim(self, run_id, chunk_index, event_id):
+        marker = self.bucket.blob(launch_marker(run_id, chunk_index))
+        record = {"vm_name": vm_name_for(run_id, chunk_index), "event_id": event_id,
+                  "claimed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        try:
+            marker.upload_from_string(json.dumps(record), content_type="application/json", if_generation_match=0)
+        except PreconditionFailed:
+            return None
+        return marker
+
+    def release(self, marker):
+        # Lets a redelivered event claim the chunk again.
+        try:
+            marker.delete(if_generation_match=marker.generation)
+        except (NotFound, PreconditionFailed):
+            pass
+
+    def launch(self, run_id, chunk_index, marker):
+        vm_name = vm_name_for(run_id, chunk_index)
+        try:
+            insert_instance(self.compute, self.project, self.zone, self.template,
+                            instance_body(self.bucket.name, vm_name, run_id))
+            return vm_name, "launched"
+        except Exception as e:
+            if http_status(e) == 409:
+                return vm_name, "exists"
+            self.release(marker)
+            if is_retriable(e):
+                return vm_name, f"deferred: {e}"
+            return vm_name, f"error: {e}"
+
+    def run(self, run_id, event_id=None):
+        claimed = self.claimed_chunks(run_id)
+        launches = []
+        for index in self.session_chunks(run_id):
+            if launch_marker(run_id, index) in claimed:
+                continue
+            marker = self.claim(run_id, index, event_id)
+            if marker is not None:
+                launches.append((run_id, index, marker))
+        if not launches:
+            print(f"✅ Session {run_id}: every chunk already has a worker")
+            return {}
+
+        print(f"🚀 Session {run_id}: launching {len(launches)} VMs with {self.workers} parallel requests")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = dict(executor.map(lambda launch: self.launch(*launch), launches))
+        for vm_name, outcome in sorted(results.items()):
+            print(f"   {vm_name}: {outcome}")
+
+        deferred = [vm_name for vm_name, outcome in results.items() if outcome.startswith("deferred")]
+        if deferred:
+            raise LaunchDeferred(f"{len(deferred)} launches hit quota or transient errors: {', '.join(sorted(deferred))}")
+        return results
+
+
+def launch_scraper_vms(event, context, storage_client=None, compute_factory=None):
     bucket_name = event['bucket']
     file_name = event['name']
 
-    if not file_name.startswith("chunks/") or not file_name.endswith(".csv"):
+    match = CHUNK_BLOB.match(file_name)
+    if not match:
         print(f"Ignoring unrelated file: {file_name}")
         return
 
@@ -15,31 +138,14 @@ def launch_scraper_vms(event, context):
     project = os.environ.get("GCP_PROJECT_ID")
     zone = os.environ.get("GCP_COMPUTE_ZONE", "us-central1-a")
     template = os.environ.get("INSTANCE_TEMPLATE_NAME")
+    workers = int(os.environ.get("LAUNCH_WORKERS", LAUNCH_WORKERS))
 
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
-
-    # Get all chunks
-    blobs = list(storage_client.list_blobs(bucket_name, prefix="chunks/"))
-    chunk_files = sorted([b.name for b in blobs if b.name.endswith(".csv")])
-
-    compute = discovery.build("compute", "v1")
+    if storage_client is None:
+        from google.cloud import storage
+        storage_client = storage.Client()
+    if compute_factory is None:
+        from googleapiclient import discovery
+        compute_factory = lambda: discovery.build("compute", "v1", cache_discovery=False)
 
-    for i, chunk_file in enumerate(chunk_files):
-        vm_name = f"scraper-vm-{i+1}"
-
-        print(f"Launching {vm_name} for chunk: {chunk_file}")
-        request_body = {
-            "name": vm_name,
-            "sourceInstanceTemplate": f"global/instanceTemplates/{template}"
-        }
-
-        try:
-            response = compute.instances().insert(
-                project=project,
-                zone=zone,
-                body=request_body
-            ).execute()
-            print(f"VM {vm_name} launch triggered.")
-        except Exception as e:
-            print(f"Error launching {vm_name}: {e}")
+    launcher = ChunkLauncher(storage_client.bucket(bucket_name), compute_factory, project, zone, template, workers)
+    return launcher.run(match.group(1), getattr(context, "event_id", None))
@@ -0,0 +1,47 @@
+# Shared by launcher.py and the Cloud Function, so both paths name, describe
+# and insert worker VMs the same way.
+import re
+
+VM_PREFIX = "scraper-vm-"
+MAX_VM_NAME = 63  # GCE limit
+
+CHUNK_BLOB = re.compile(r"^users/([^/]+)/chunks/chunk_(\d+)\.csv$")
+
+
+def vm_name_for(run_id, chunk_index):
+    # The one naming rule for worker VMs, so both launch paths see the same
+    # instance (and a 409 instead of a second launch). GCE names are
+    # lowercase letters, digits and dashes; the trailing digits are the
+    # chunk index the startup script reads back from the instance name.
+    run = re.sub(r"[^a-z0-9-]+", "-", str(run_id).lower()).strip("-")
+    suffix = f"-{chunk_index}"
+    return f"{VM_PREFIX}{run}"[:MAX_VM_NAME - len(suffix)].rstrip("-") + suffix
+
+
+def http_status(exc):
+    resp = getattr(exc, "resp", None)
+    status = getattr(resp, "status", None) or getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+def instance_body(bucket_name, vm_name, run_id, mode="chunk"):
+    return {
+        "name": vm_name,
+        "metadata": {"items": [
+            {"key": "startup-script-url", "value": f"gs://{bucket_name}/startup.sh"},
+            {"key": "run_id", "value": run_id},
+            {"key": "mode", "value": mode},
+        ]},
+    }
+
+
+def insert_instance(compute, project, zone, template, body):
+    return compute.instances().insert(
+        project=project,
+        zone=zone,
+        sourceInstanceTemplate=f"projects/{project}/global/instanceTemplates/{template}",
+        body=body,
+    ).execute()
@@ -0,0 +1,288 @@
+import csv
+import os
+import re
+from functools import lru_cache
+
+from result_journal import iter_journal
+
+pa = pq = None  # imported on first use, CSV-only runs never pay for pyarrow
+
+COLUMNAR_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+ROW_GROUP_SIZE = 5000
+LIST_ITEM_VALUE = "value"  # struct field used for lists of scalars
+
+# Splits "person.positions.positionHistory[3].title" at its first index into
+# the list column name, the item index and the field inside the item.
+_LIST_KEY = re.compile(r"^([^\[]+)\[(\d+)\](?:\.(.*)|(.+))?$")
+
+
+def _require_pyarrow():
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:  # only required for --format parquet/arrow
+            raise RuntimeError("Parquet/Arrow output requires pyarrow (pip install pyarrow)")
+        pa, pq = pyarrow, pyarrow.parquet
+
+
+def columnar_path(path, fmt):
+    return os.path.splitext(path)[0] + COLUMNAR_FORMATS[fmt]
+
+
+@lru_cache(maxsize=65536)
+def _split_list_key(key):
+    # Keys repeat across rows, so the regex runs once per distinct key.
+    match = _LIST_KEY.match(key)
+    if not match:
+        return None
+    base, index, field, suffix = match.groups()
+    return base, int(index), field or suffix or LIST_ITEM_VALUE
+
+
+def nest_row(row):
+    # Folds exploded "[i]" keys back into list-of-struct values.
+    scalars = {}
+    lists = {}
+    for key, value in row.items():
+        parts = _split_list_key(key)
+        if parts is None:
+            scalars[key] = value
+            continue
+        base, index, field = parts
+        lists.setdefault(base, {}).setdefault(index, {})[field] = value
+    for base, items in lists.items():
+        scalars[base] = [items[i] for i in sorted(items)]
+    return scalars
+
+
+def explode_row(row):
+    # Inverse of nest_row: gives back the flat "[i]" keys used by the CSVs.
+    out = {}
+    for key, value in row.items():
+        if isinstance(value, list):
+            for i, item in enumerate(value):
+                for field, item_value in (item or {}).items():
+                    if item_value is None:
+                        continue
+                    if field == LIST_ITEM_VALUE:
+                        out[f"{key}[{i}]"] = item_value
+                    elif field.startswith("["):
+                        out[f"{key}[{i}]{field}"] = item_value
+                    else:
+                        out[f"{key}[{i}].{field}"] = item_value
+        elif value is not None:
+            out[key] = value
+    return out
+
+
+def _note_type(types, name, value):
+    if value is not None:
+        types.setdefault(name, set()).add(type(value))
+
+
+def _arrow_type(python_types):
+    if python_types and python_types <= {bool}:
+        return pa.bool_()
+    if python_types and python_types <= {int}:
+        return pa.int64()
+    if python_types and python_types <= {int, float}:
+        return pa.float64()
+    return pa.string()
+
+
+class ColumnarSchema:
+    # Union schema gathered in one streaming pass so every row group is
+    # written with the same, stable column layout.
+    def __init__(self, preferred_fields):
+        self.preferred_fields = list(preferred_fields)
+        self.scalar_types = {}
+        self.list_types = {}
+
+    def observe(self, row):
+        for key, value in nest_row(row).items():
+            if isinstance(value, list):
+                fields = self.list_types.setdefault(key, {})
+                for item in value:
+                    for field, item_value in item.items():
+                        _note_type(fields, field, item_value)
+            else:
+                self.scalar_types.setdefault(key, set())
+                _note_type(self.scalar_types, key, value)
+
+    def to_arrow(self):
+        names = set(self.scalar_types) | set(self.list_types) | set(self.preferred_fields)
+        ordered = self.preferred_fields + sorted(n for n in names if n not in self.preferred_fields)
+        fields = []
+        for name in ordered:
+            if name in self.list_types:
+                item_types = self.list_types[name] or {LIST_ITEM_VALUE: set()}
+                struct = pa.struct([pa.field(f, _arrow_type(t)) for f, t in sorted(item_types.items())])
+                fields.append(pa.field(name, pa.list_(struct)))
+            else:
+                fields.append(pa.field(name, _arrow_type(self.scalar_types.get(name))))
+        return pa.schema(fields)
+
+
+def _to_str(value):
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def _to_float(value):
+    return None if value is None else float(value)
+
+
+def _identity(value):
+    return value
+
+
+def _converter(arrow_type):
+    if pa.types.is_string(arrow_type):
+        return _to_str
+    if pa.types.is_floating(arrow_type):
+        return _to_float
+    return _identity
+
+
+class ColumnarWriter:
+    # Accumulates rows into per-column builders and flushes them as record
+    # batches, so memory is bounded by ROW_GROUP_SIZE rather than chunk size.
+    def __init__(self, path, schema, fmt="parquet", row_group_size=ROW_GROUP_SIZE):
+        _require_pyarrow()
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._columns = {name: [] for name in schema.names}
+        # Conversion plan resolved once per schema instead of once per cell.
+        self._plan = []
+        for field in schema:
+            if pa.types.is_list(field.type):
+                item_plan = [(f.name, _converter(f.type)) for f in field.type.value_type]
+                self._plan.append((field.name, None, item_plan))
+            else:
+                self._plan.append((field.name, _converter(field.type), None))
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, schema)
+
+    def write(self, row):
+        nested = nest_row(row)
+        columns = self._columns
+        for name, convert, item_plan in self._plan:
+            value = nested.get(name)
+            if item_plan is not None:
+                if value:
+                    value = [{f: conv(item.get(f)) for f, conv in item_plan} for item in value]
+                else:
+                    value = None
+            else:
+                value = convert(value)
+            columns[name].append(value)
+        self.rows += 1
+        if len(self._columns[self.schema.names[0]]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self._columns[self.schema.names[0]]:
+            return
+        arrays = [pa.array(self._columns[f.name], type=f.type) for f in self.schema]
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self._columns = {name: [] for name in self.schema.names}
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        if hasattr(self, "_sink"):
+            self._sink.close()
+
+
+def compact_journal_columnar(journal_file, output_file, failure_file, preferred_fields, fmt="parquet"):
+    # Columnar counterpart of result_journal.compact_journal: one pass for
+    # the schema, one pass streaming rows into the writers.
+    _require_pyarrow()
+    schema_builder = ColumnarSchema(preferred_fields)
+    failures = 0
+    for row in iter_journal(journal_file):
+        schema_builder.observe(row)
+        if row.get("status") != "Success":
+            failures += 1
+    schema = schema_builder.to_arrow()
+
+    results = ColumnarWriter(output_file, schema, fmt)
+    failed = ColumnarWriter(failure_file, schema, fmt) if failures else None
+    try:
+        for row in iter_journal(journal_file):
+            results.write(row)
+            if failed and row.get("status") != "Success":
+                failed.write(row)
+    finally:
+        results.close()
+        if failed:
+            failed.close()
+    return results.rows, failures
+
+
+def iter_columnar_rows(path, batch_size=ROW_GROUP_SIZE):
+    # Yields flat CSV-style rows from a Parquet or Arrow IPC result file.
+    _require_pyarrow()
+    if path.endswith(COLUMNAR_FORMATS["parquet"]):
+        batches = pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    for batch in batches:
+        for row in batch.to_pylist():
+            yield explode_row(row)
+
+
+def columnar_fieldnames(path):
+    # Flat "[i]" header for a columnar file without materializing its rows:
+    # only list columns are scanned, for their longest list.
+    _require_pyarrow()
+    import pyarrow.compute as pc
+    if path.endswith(COLUMNAR_FORMATS["parquet"]):
+        parquet_file = pq.ParquetFile(path)
+        schema = parquet_file.schema_arrow
+
+        def list_column(name):
+            return parquet_file.read(columns=[name]).column(name)
+    else:
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        schema = table.schema
+
+        def list_column(name):
+            return table.column(name)
+
+    names = []
+    for field in schema:
+        if not pa.types.is_list(field.type):
+            names.append(field.name)
+            continue
+        longest = pc.max(pc.list_value_length(list_column(field.name))).as_py() or 0
+        for i in range(longest):
+            for item_field in field.type.value_type:
+                if item_field.name == LIST_ITEM_VALUE:
+                    names.append(f"{field.name}[{i}]")
+                elif item_field.name.startswith("["):
+                    names.append(f"{field.name}[{i}]{item_field.name}")
+                else:
+                    names.append(f"{field.name}[{i}].{item_field.name}")
+    return names
+
+
+def is_columnar_file(path):
+    return path.endswith(tuple(COLUMNAR_FORMATS.values()))
+
+
+def iter_result_rows(path):
+    # Rows of a result or failure file as dicts, CSV or columnar alike.
+    if is_columnar_file(path):
+        yield from iter_columnar_rows(path)
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
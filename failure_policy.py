@@ -0,0 +1,53 @@
+import re
+
+from columnar_output import iter_result_rows
+from linkedin_urls import DUPLICATE_COLUMN
+
+SUCCESS, TRANSIENT, PERMANENT = "success", "transient", "permanent"
+
+# 401/402/403 are account problems (key, credits, plan), not profile ones:
+# the same URL is expected to work once they are fixed.
+TRANSIENT_HTTP = {401, 402, 403, 408, 425, 429}
+TRANSIENT_MARKERS = (
+    "timed out", "timeout", "temporarily", "try again", "connection", "reset by peer", "max retries",
+    "too many requests", "rate limit", "service unavailable", "expecting value", "cache miss",
+    "no usable api key",
+)
+HTTP_STATUS = re.compile(r"HTTPError: (\d{3})")
+
+
+def classify_status(status):
+    # Sorts a result row's status into success, transient (worth another
+    # paid request) or permanent (not found, invalid URL, ...). Accepts the
+    # CLI statuses and the UI's emoji-prefixed ones.
+    status = (status or "").strip()
+    text = status.lstrip("✅🚫🛑💤 ").lower()
+    if text == "success":
+        return SUCCESS
+    match = HTTP_STATUS.search(status)
+    if match:
+        code = int(match.group(1))
+        return TRANSIENT if code >= 500 or code in TRANSIENT_HTTP else PERMANENT
+    if any(marker in text for marker in TRANSIENT_MARKERS):
+        return TRANSIENT
+    return PERMANENT
+
+
+def retriable_urls(paths):
+    # Transient failures across failure files, first occurrence order.
+    # Returns (urls, counts per class). Rows filled in from another URL's
+    # fetch are skipped: retrying that URL fills them in again.
+    urls = []
+    seen = set()
+    counts = {TRANSIENT: 0, PERMANENT: 0, SUCCESS: 0}
+    for path in paths:
+        for row in iter_result_rows(path):
+            url = row.get("sourceUrl")
+            if not url or row.get(DUPLICATE_COLUMN):
+                continue
+            kind = classify_status(row.get("status"))
+            counts[kind] += 1
+            if kind == TRANSIENT and url not in seen:
+                seen.add(url)
+                urls.append(url)
+    return urls, counts
@@ -0,0 +1,74 @@
+import re
+
+_KEEP_ALL = object()  # trie marker: a keep-prefix ends here
+_INDEX = re.compile(r"\[\d+\]")
+
+# Flattened result columns both entry points keep, by key prefix.
+KEEP_FIELD_PREFIXES = (
+    "person.linkedin", "person.firstName", "person.lastName", "person.headline", "person.location",
+    "person.summary", "person.positions", "person.followerCount", "company",
+)
+
+
+class FieldProjection:
+    # Character trie over keep-prefixes, compiled once. project() walks the
+    # API response and produces exactly the keys a full flatten would produce
+    # (benchmarks/bench_flatten.py) that also start with one of the prefixes,
+    # but it never descends into a subtree that cannot match.
+    def __init__(self, prefixes, list_limits=None):
+        self.root = {}
+        for prefix in prefixes:
+            node = self.root
+            for ch in prefix:
+                node = node.setdefault(ch, {})
+            node[_KEEP_ALL] = True
+        self.list_limits = dict(list_limits or {})
+
+    def project(self, y):
+        out = {}
+        self._walk(y, "", self.root, out)
+        return out
+
+    def _advance(self, node, text):
+        for ch in text:
+            if _KEEP_ALL in node:
+                return _KEEP_ALL
+            node = node.get(ch)
+            if node is None:
+                return None
+        return _KEEP_ALL if _KEEP_ALL in node else node
+
+    def _limit(self, key, items):
+        if self.list_limits:
+            cap = self.list_limits.get(_INDEX.sub("", key))
+            if cap is not None:
+                return items[:cap]
+        return items
+
+    def _walk(self, y, prefix, node, out):
+        for k, v in y.items():
+            new_key = f'{prefix}.{k}' if prefix else k
+            child = node if node is _KEEP_ALL else self._advance(node, f'.{k}' if prefix else k)
+            if child is None:
+                continue
+            self._emit(v, new_key, child, out)
+
+    def _emit(self, v, new_key, node, out):
+        if isinstance(v, dict):
+            self._walk(v, new_key, node, out)
+        elif isinstance(v, list):
+            for i, item in enumerate(self._limit(new_key, v)):
+                item_key = f'{new_key}[{i}]'
+                child = node if node is _KEEP_ALL else self._advance(node, f'[{i}]')
+                if child is None:
+                    continue
+                if isinstance(item, dict):
+                    self._walk(item, item_key, child, out)
+                elif child is _KEEP_ALL:
+                    out[item_key] = item
+        elif node is _KEEP_ALL:
+            out[new_key] = v
+
+
+def compile_projection(prefixes, list_limits=None):
+    return FieldProjection(prefixes, list_limits)
@@ -34,51 +34,92 @@ fi
 # Clean and log the run_id
 RUN_ID=$(echo "$RUN_ID_RAW" | tr -d '[:space:]')
 
+# "queue" workers pull work units until the run's queue is drained; a
+# "daemon" keeps one process up for every chunk of the run
+MODE=$(curl -s -f -H "Metadata-Flavor: Google" \
+  http://metadata.google.internal/computeMetadata/v1/instance/attributes/mode)
+MODE=${MODE:-chunk}
+
 echo "🖥️ VM Name: '$VM_NAME'"
 echo "📄 Chunk Index: '$CHUNK_INDEX'"
 echo "🧾 Sanitized Run ID: '$RUN_ID'"
+echo "⚙️ Mode: '$MODE'"
 export RUN_ID="$RUN_ID"
 
 mkdir -p ~/workspace
 cd ~/workspace || exit 1
 
 echo "📥 Downloading files..."
-gsutil cp "gs://$BUCKET/linkedin_scraper.py" . || exit 1
+for module in linkedin_scraper.py rate_limiter.py linkedin_urls.py profile_cache.py result_journal.py field_projection.py columnar_output.py local_bucket.py work_queue.py scraper_metrics.py failure_policy.py progress_log.py api_keys.py chunk_upload.py hedging.py; do
+  gsutil cp "gs://$BUCKET/$module" . || exit 1
+done
 gsutil cp "gs://$BUCKET/config.json" . || exit 1
-gsutil cp "gs://$BUCKET/users/$RUN_ID/chunks/chunk_${CHUNK_INDEX}.csv" input.csv
 
-if [[ ! -f input.csv ]]; then
-  echo "❌ Chunk file missing. Aborting."
-  gsutil cp /var/log/startup-script.log "gs://$BUCKET/users/$RUN_ID/results/logs/error_${CHUNK_INDEX}.txt"
-  exit 1
-fi
+# Ship the worker's metrics snapshot so the dashboard can chart the run live
+METRICS_BLOB="gs://$BUCKET/users/$RUN_ID/metrics/metrics_${CHUNK_INDEX}.json"
+( while sleep 30; do [[ -f metrics.json ]] && gsutil -q cp metrics.json "$METRICS_BLOB"; done ) &
+METRICS_UPLOADER=$!
+
+if [[ "$MODE" == "queue" ]]; then
+  echo "🚀 Running queue worker..."
+  # Each unit's zip is uploaded by the worker as soon as the unit is done
+  python3 linkedin_scraper.py --queue "$RUN_ID" --bucket "$BUCKET" --worker-id "$VM_NAME" --summary run_summary.json --metrics metrics.json
+  ZIP_FILE=""
+elif [[ "$MODE" == "daemon" ]]; then
+  echo "🚀 Running scraper daemon..."
+  # Claims chunks, uploads each zip and appends its progress record itself
+  python3 linkedin_scraper.py --daemon --watch "users/$RUN_ID/chunks/" --bucket "$BUCKET" --worker-id "$VM_NAME" --idle-timeout 300 --summary run_summary.json --metrics metrics.json
+else
+  gsutil cp "gs://$BUCKET/users/$RUN_ID/chunks/chunk_${CHUNK_INDEX}.csv" input.csv
 
-echo "🚀 Running scraper..."
-python3 linkedin_scraper.py --input input.csv --output result_${CHUNK_INDEX}.csv --batch-index "${CHUNK_INDEX}"
+  if [[ ! -f input.csv ]]; then
+    echo "❌ Chunk file missing. Aborting."
+    gsutil cp /var/log/startup-script.log "gs://$BUCKET/users/$RUN_ID/results/logs/error_${CHUNK_INDEX}.txt"
+    exit 1
+  fi
 
-ZIP_FILE="scrape_results_${CHUNK_INDEX}.zip"
+  echo "🚀 Running scraper..."
+  # The .claimed marker keeps a daemon watching users/ off this chunk (and
+  # this VM off a chunk a daemon already took)
+  python3 linkedin_scraper.py --input input.csv --output result_${CHUNK_INDEX}.csv --batch-index "${CHUNK_INDEX}" --summary run_summary.json --metrics metrics.json \
+    --claim-chunk "users/$RUN_ID/chunks/chunk_${CHUNK_INDEX}.csv" --bucket "$BUCKET" --worker-id "$VM_NAME"
+  if [[ $? -eq 3 ]]; then
+    echo "⏭️ Chunk ${CHUNK_INDEX} is claimed by another worker, deleting VM..."
+    kill "$METRICS_UPLOADER" 2>/dev/null
+    gsutil cp /var/log/startup-script.log "gs://$BUCKET/users/$RUN_ID/results/logs/log_${CHUNK_INDEX}.txt"
+    gcloud compute instances delete "$VM_NAME" --zone="$ZONE" --quiet || sudo shutdown -h now
+    exit 0
+  fi
 
-echo "📤 Uploading zipped results..."
-if [[ -f "$ZIP_FILE" ]]; then
-  gsutil cp "$ZIP_FILE" "gs://$BUCKET/users/$RUN_ID/results/"
-else
-  echo "⚠️ Zip file not found. No results to upload."
+  ZIP_FILE="scrape_results_${CHUNK_INDEX}.zip"
+
+  echo "📤 Uploading zipped results..."
+  if [[ -f "$ZIP_FILE" ]]; then
+    gsutil cp "$ZIP_FILE" "gs://$BUCKET/users/$RUN_ID/results/"
+  else
+    echo "⚠️ Zip file not found. No results to upload."
+  fi
 fi
 
+kill "$METRICS_UPLOADER" 2>/dev/null
+[[ -f metrics.json ]] && gsutil -q cp metrics.json "$METRICS_BLOB"
+
 echo "📝 Uploading log..."
 gsutil cp /var/log/startup-script.log "gs://$BUCKET/users/$RUN_ID/results/logs/log_${CHUNK_INDEX}.txt"
 
+if [[ "$MODE" == "daemon" ]]; then
+  echo "✅ Daemon idle, deleting VM..."
+  gcloud compute instances delete "$VM_NAME" --zone="$ZONE" --quiet || sudo shutdown -h now
+  exit 0
+fi
+
 # Append progress to central file
 echo "🧾 Appending to central progress log..."
+# One record per line so readers can tail the log incrementally. The run
+# summary feeds the dashboard's chunk planner.
+SUMMARY=$(cat run_summary.json 2>/dev/null || echo null)
 cat <<EOF > progress_tmp.json
-{
-  "run_id": "$RUN_ID",
-  "chunk_index": $CHUNK_INDEX,
-  "vm_name": "$VM_NAME",
-  "status": "completed",
-  "timestamp": "$(date -u +"%Y-%m-%dT%H:%M:%SZ")",
-  "result_path": "gs://$BUCKET/users/$RUN_ID/results/$ZIP_FILE"
-}
+{"run_id": "$RUN_ID", "chunk_index": $CHUNK_INDEX, "vm_name": "$VM_NAME", "status": "completed", "mode": "$MODE", "timestamp": "$(date -u +"%Y-%m-%dT%H:%M:%SZ")", "result_path": "gs://$BUCKET/users/$RUN_ID/results/$ZIP_FILE", "summary": $SUMMARY}
 EOF
 
 # Safely append to central progress.jsonl in root
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+
+HEDGE_QUANTILE = 95
+HEDGE_MAX_FRACTION = 0.05  # duplicates are paid calls, cap them at 5% of requests
+HEDGE_MIN_SAMPLES = 20  # latencies needed before the quantile is trusted
+HEDGE_REFRESH = 20  # requests between recomputing the hedge delay
+HEDGE_POOL_SIZE = 50  # until run_threaded sizes it from its worker count
+
+
+class HedgePolicy:
+    # Sends a duplicate of a request that is still out after the observed
+    # p95 latency and keeps whichever good response arrives first. Cuts the
+    # tail left by slow or hung connections at the cost of a few extra calls.
+    def __init__(self, quantile=HEDGE_QUANTILE, max_fraction=HEDGE_MAX_FRACTION, min_samples=HEDGE_MIN_SAMPLES):
+        self.quantile = quantile
+        self.max_fraction = max_fraction
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+        self._delay = None
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_size = HEDGE_POOL_SIZE
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._pool_size, thread_name_prefix="hedge")
+            return self._pool
+
+    def size_for(self, workers):
+        # Room for a primary and a hedge per calling thread, so a primary
+        # never waits behind other requests for a pool thread.
+        with self._lock:
+            if 2 * workers <= self._pool_size:
+                return
+            self._pool_size = 2 * workers
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+    def delay_for(self, keys):
+        # Seconds to wait before hedging, or None when out of budget or
+        # without enough latency samples yet.
+        with self._lock:
+            self.requests += 1
+            if self.hedges >= self.max_fraction * self.requests:
+                return None
+            refresh = self._delay is None or self.requests % HEDGE_REFRESH == 0
+        if refresh:
+            samples = keys.latencies()
+            if len(samples) >= self.min_samples:
+                samples.sort()
+                self._delay = samples[min(len(samples) - 1, int(len(samples) * self.quantile / 100))]
+        return self._delay
+
+    def _note(self, won=False):
+        with self._lock:
+            if won:
+                self.wins += 1
+            else:
+                self.hedges += 1
+
+    def run(self, send, keys):
+        # send() makes one request (key, limiter and bookkeeping included).
+        delay = self.delay_for(keys)
+        if delay is None:
+            return send()
+        started = threading.Event()
+
+        def send_primary():
+            started.set()
+            return send()
+
+        primary = self.pool.submit(send_primary)
+        # The delay counts from when the primary is sent, not queued.
+        started.wait()
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        self._note()
+        secondary = self.pool.submit(send)
+        pending = {primary, secondary}
+        error = None
+        try:
+            # A loser already sent keeps its thread until its read timeout.
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is secondary:
+                            self._note(won=True)
+                        return future.result()
+                    error = error or future.exception()
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def run_async(self, send, keys):
+        delay = self.delay_for(keys)
+        if delay is None:
+            return await send()
+        primary = asyncio.ensure_future(send())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        self._note()
+        secondary = asyncio.ensure_future(send())
+        pending = {primary, secondary}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            self._note(won=True)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hedges": self.hedges,
+                "hedge_wins": self.wins,
+                "hedge_rate": round(self.hedges / self.requests, 4) if self.requests else 0.0,
+            }
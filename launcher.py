@@ -0,0 +1,144 @@
+import argparse
+import json
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from progress_log import PROGRESS_BLOB, parse_records
+from cloudfunction.vm_launch import CHUNK_BLOB, VM_PREFIX, http_status, insert_instance, instance_body, vm_name_for
+
+BUCKET_NAME = "contact-scraper-bucket"
+ZONE = "us-central1-a"
+TEMPLATE = "scraper-template-v14"
+PROJECT = "contact-scraper-463913"
+LAUNCH_WORKERS = 8
+
+QUEUE_MANIFEST = re.compile(r"^users/([^/]+)/queue/manifest\.json$")
+
+
+def logged_sessions(bucket, blob_name=PROGRESS_BLOB):
+    # One pass over the progress log. As in the original shell watcher, a
+    # session that has any record in the log has been picked up already.
+    blob = bucket.get_blob(blob_name)
+    if blob is None:
+        return set()
+    records, _ = parse_records(blob.download_as_text())
+    return {record["run_id"] for record in records if record.get("run_id")}
+
+
+def chunks_by_run(bucket):
+    # One listing for every session's chunks instead of one per session.
+    chunks = defaultdict(set)
+    for blob in bucket.list_blobs(prefix="users/", match_glob="users/*/chunks/chunk_*.csv"):
+        match = CHUNK_BLOB.match(blob.name)
+        if match:
+            chunks[match.group(1)].add(int(match.group(2)))
+    return chunks
+
+
+def queue_workers_by_run(bucket):
+    # Queue sessions ask for a number of workers rather than one VM per chunk.
+    workers = {}
+    for blob in bucket.list_blobs(prefix="users/", match_glob="users/*/queue/manifest.json"):
+        match = QUEUE_MANIFEST.match(blob.name)
+        if match:
+            workers[match.group(1)] = int(json.loads(blob.download_as_text()).get("workers", 1))
+    return workers
+
+
+def existing_instances(compute, project, zone, prefix=VM_PREFIX):
+    names = set()
+    request = compute.instances().list(project=project, zone=zone, filter=f'name eq "{prefix}.*"')
+    while request is not None:
+        response = request.execute()
+        names.update(item["name"] for item in response.get("items", []))
+        request = compute.instances().list_next(previous_request=request, previous_response=response)
+    return names
+
+
+class Launcher:
+    # Starts one worker VM per pending chunk. Clients are injected so the
+    # launcher can run against LocalBucket and a fake compute API. The
+    # compute client is built per thread by compute_factory because
+    # googleapiclient services are not thread-safe.
+    def __init__(self, bucket, compute_factory, project=PROJECT, zone=ZONE, template=TEMPLATE,
+                 workers=LAUNCH_WORKERS, dry_run=False):
+        self.bucket = bucket
+        self.compute_factory = compute_factory
+        self._local = threading.local()
+        self.project = project
+        self.zone = zone
+        self.template = template
+        self.workers = workers
+        self.dry_run = dry_run
+
+    @property
+    def compute(self):
+        if not hasattr(self._local, "compute"):
+            self._local.compute = self.compute_factory()
+        return self._local.compute
+
+    def plan(self):
+        logged = logged_sessions(self.bucket)
+        running = existing_instances(self.compute, self.project, self.zone)
+        sessions = {run_id: ("chunk", sorted(indexes)) for run_id, indexes in chunks_by_run(self.bucket).items()}
+        for run_id, workers in queue_workers_by_run(self.bucket).items():
+            sessions[run_id] = ("queue", list(range(1, workers + 1)))
+        launches = []
+        for run_id, (mode, indexes) in sorted(sessions.items()):
+            if run_id in logged:
+                print(f"✅ Session {run_id} found in progress log. Skipping...")
+                continue
+            for index in indexes:
+                vm_name = vm_name_for(run_id, index)
+                if vm_name in running:
+                    continue
+                launches.append((run_id, index, vm_name, mode))
+        return launches
+
+    def launch(self, run_id, chunk_index, vm_name, mode="chunk"):
+        if self.dry_run:
+            return vm_name, "planned"
+        try:
+            insert_instance(self.compute, self.project, self.zone, self.template,
+                            instance_body(self.bucket.name, vm_name, run_id, mode))
+            return vm_name, "launched"
+        except Exception as e:
+            if http_status(e) == 409:
+                return vm_name, "exists"
+            return vm_name, f"error: {e}"
+
+    def run(self):
+        launches = self.plan()
+        if not launches:
+            print("⚠️ Nothing to launch.")
+            return {}
+        print(f"🚀 Launching {len(launches)} VMs with {self.workers} parallel requests")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = dict(executor.map(lambda launch: self.launch(*launch), launches))
+        for vm_name, outcome in sorted(results.items()):
+            print(f"   {vm_name}: {outcome}")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Launch scraper VMs for chunks that are not done yet")
+    parser.add_argument("--bucket", default=BUCKET_NAME)
+    parser.add_argument("--project", default=PROJECT)
+    parser.add_argument("--zone", default=ZONE)
+    parser.add_argument("--template", default=TEMPLATE)
+    parser.add_argument("--workers", type=int, default=LAUNCH_WORKERS, help="Concurrent insert requests")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the VMs that would be created")
+    args = parser.parse_args()
+
+    from google.cloud import storage
+    from googleapiclient import discovery
+
+    bucket = storage.Client(project=args.project).bucket(args.bucket)
+    Launcher(bucket, lambda: discovery.build("compute", "v1", cache_discovery=False),
+             args.project, args.zone, args.template, args.workers, args.dry_run).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,81 +1,181 @@
 import argparse
-import pandas as pd
+import asyncio
+import csv
+import itertools
 import requests
 import json
 import os
+import re
+import socket
 import time
-import csv
 import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from threading import Lock
+from rate_limiter import AdaptiveRateLimiter
+from api_keys import KeyPool, NoUsableKey, key_pool_from_config, combine_key_usage
+from hedging import HedgePolicy, HEDGE_QUANTILE, HEDGE_MAX_FRACTION
+from profile_cache import ProfileCache, DEFAULT_CACHE_PATH, DEFAULT_TTL, DEFAULT_MAX_ENTRIES
+from result_journal import ResultJournal, journal_path_for, completed_urls, compact_journal
+from field_projection import compile_projection, KEEP_FIELD_PREFIXES
+from columnar_output import COLUMNAR_FORMATS, columnar_path, compact_journal_columnar
+from local_bucket import open_bucket, NotFound, PreconditionFailed
+from work_queue import WorkQueue, LeaseKeeper, LeaseLost, LEASE_SECONDS, POLL_SECONDS, read_queue_manifest, default_worker_id
+from failure_policy import retriable_urls, TRANSIENT, PERMANENT
+from scraper_metrics import metrics, outcome_of, SnapshotWriter, serve_prometheus, SNAPSHOT_INTERVAL
+from progress_log import append_record
+from linkedin_urls import group_by_profile, DUPLICATE_COLUMN
+
+aiohttp = None  # imported by AsyncEngine, only required for --engine async
 
-API_URL = "https://api.scrapin.io/enrichment/profile"
-MAX_WORKERS = 5
+BUCKET_NAME = "contact-scraper-bucket"
+API_URL = os.environ.get("SCRAPIN_API_URL", "https://api.scrapin.io/enrichment/profile")
+MAX_WORKERS = 5  # threads per API key
+HTTP_POOL_SIZE = 50
+ASYNC_CONCURRENCY = 20
 MAX_RETRIES = 2
 INITIAL_BACKOFF = 1
-PER_REQUEST_DELAY = 5
+MAX_THROTTLE_RETRIES = 5
+CONNECT_TIMEOUT = 5.0  # seconds
+READ_TIMEOUT = 30.0
+REQUEST_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+DEADLINE_STATUS = "Timeout: chunk deadline reached before this profile finished"
+INITIAL_RATE = 1.0  # requests/second across all workers, adapts at runtime
+MAX_RATE = 10.0
+DAEMON_WATCH_PREFIX = "users/"
+DAEMON_IDLE_TIMEOUT = 600  # seconds without new chunks before the daemon exits
+DAEMON_POLL_SECONDS = 10
+DAEMON_WORK_DIR = "daemon_work"
+CHUNK_CLAIMED_EXIT = 3  # --claim-chunk found the chunk taken by another worker
+CHUNK_BLOB = re.compile(r"(?:^|/)chunk_([^/]+)\.csv$")
+RUN_CHUNK_BLOB = re.compile(r"^users/([^/]+)/chunks/")
 
 lock = Lock()
+default_limiter = AdaptiveRateLimiter(rate=INITIAL_RATE, max_rate=MAX_RATE)
+
+# One keep-alive pool shared by every worker thread and every chunk the
+# process scrapes.
+http_session = requests.Session()
+http_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE))
+http_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE))
 
 PREFERRED_FIELDS = [
     "sourceUrl", "status", "person.firstName", "person.lastName", "person.headline", "person.location",
     "person.positions.positionsCount", "person.summary", "person.followerCount"
 ]
 
+POSITIONS_LIST_KEY = "person.positions.positionHistory"
+FIELD_PROJECTION = compile_projection(KEEP_FIELD_PREFIXES)
+
+def build_projection(max_positions=None):
+    if max_positions is None:
+        return FIELD_PROJECTION
+    return compile_projection(KEEP_FIELD_PREFIXES, {POSITIONS_LIST_KEY: max_positions})
+
 def load_config():
     with open("config.json", "r") as f:
         return json.load(f)
 
-def flatten_json(y, prefix='', out=None):
-    if out is None:
-        out = {}
-    for k, v in y.items():
-        new_key = f'{prefix}.{k}' if prefix else k
-        if isinstance(v, dict):
-            flatten_json(v, new_key, out)
-        elif isinstance(v, list):
-            for i, item in enumerate(v):
-                if isinstance(item, dict):
-                    flatten_json(item, f'{new_key}[{i}]', out)
-                else:
-                    out[f'{new_key}[{i}]'] = item
-        else:
-            out[new_key] = v
-    return out
-
-def should_keep_field(field):
-    return (
-        field.startswith("person.linkedin") or
-        field.startswith("person.firstName") or
-        field.startswith("person.lastName") or
-        field.startswith("person.headline") or
-        field.startswith("person.location") or
-        field.startswith("person.summary") or
-        field.startswith("person.positions") or
-        field.startswith("person.followerCount") or
-        field.startswith("company")
-    )
+def read_input_urls(input_file):
+    # First column of the input CSV, blank cells skipped. Plain csv keeps
+    # pandas out of the scraper's startup.
+    with open(input_file, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return [row[0].strip() for row in reader if row and row[0].strip()]
+
+def write_input_urls(urls, input_file):
+    with open(input_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["LinkedIn URL"])
+        writer.writerows([url] for url in urls)
+
+def report_throttle(limiter, retry_after, keys=None, key=None):
+    metrics.inc("throttled_total")
+    pause = limiter.on_throttle(retry_after)
+    if keys is not None and len(keys) > 1:
+        print(f"Rate limit hit (429) on key {key.name}. Pausing it for {pause:.0f}s, "
+              f"rate now {limiter.rate:.2f} req/s")
+        return
+    print(f"Rate limit hit (429). Pausing all workers for {pause:.0f}s, rate now {limiter.rate:.2f} req/s")
+
+def key_pool_for(apikey, limiter):
+    # apikey is a single key string or a KeyPool from batch_scrape.
+    if isinstance(apikey, KeyPool):
+        return apikey
+    return KeyPool.single(apikey, limiter or default_limiter)
+
+def deadline_result(url):
+    return {"sourceUrl": url, "status": DEADLINE_STATUS}
 
-def scrape_profile(url, apikey, retries=MAX_RETRIES, backoff=INITIAL_BACKOFF):
-    time.sleep(PER_REQUEST_DELAY)
-    for attempt in range(1, retries + 1):
+@metrics.timer("scrape_seconds")
+def scrape_profile(url, apikey, retries=MAX_RETRIES, backoff=INITIAL_BACKOFF, limiter=None, projection=None,
+                   timeout=REQUEST_TIMEOUT, hedge=None, deadline=None):
+    keys = key_pool_for(apikey, limiter)
+    projection = projection or FIELD_PROJECTION
+
+    def send():
+        key, waited = keys.acquire()
+        metrics.observe("rate_limit_wait_seconds", waited)
+        started = time.monotonic()
+        response = http_session.get(API_URL, params={"apikey": key.key, "linkedInUrl": url}, timeout=timeout)
+        latency = time.monotonic() - started
+        key.limiter.record_latency(latency)
+        keys.record(key, response.status_code)
+        metrics.observe("request_seconds", latency)
+        metrics.inc("requests_total", str(response.status_code))
+        metrics.inc("key_requests_total", key.name)
+        return response, key
+
+    def pause(seconds):
+        # Backoff that ends at the chunk deadline; no more paid retries after it.
+        if deadline is not None:
+            seconds = min(seconds, max(0.0, deadline - time.monotonic()))
+        time.sleep(seconds)
+
+    attempt = 0
+    throttled = 0
+    while attempt < retries:
+        if deadline is not None and time.monotonic() >= deadline:
+            return deadline_result(url)
+        try:
+            response, key = hedge.run(send, keys) if hedge else send()
+        except NoUsableKey as e:
+            return {"sourceUrl": url, "status": f"Error: {e}"}
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            # Hung or dropped connections are retried like a 5xx.
+            attempt += 1
+            metrics.inc("timeouts_total")
+            if attempt == retries:
+                return {"sourceUrl": url, "status": f"{type(e).__name__}: {str(e)}"}
+            metrics.inc("retries_total")
+            pause(backoff)
+            backoff *= 2
+            continue
+        except Exception as e:
+            return {"sourceUrl": url, "status": f"Error: {str(e)}"}
+
+        limiter = key.limiter
         try:
-            response = requests.get(API_URL, params={"apikey": apikey, "linkedInUrl": url})
             if response.status_code == 429:
-                print("Rate limit hit (429). Sleeping for 60 seconds...")
-                time.sleep(60)
+                throttled += 1
+                if throttled > MAX_THROTTLE_RETRIES:
+                    return {"sourceUrl": url, "status": "HTTPError: 429 Too Many Requests"}
+                report_throttle(limiter, response.headers.get("Retry-After"), keys, key)
                 continue
 
+            attempt += 1
             response.raise_for_status()
             result = response.json()
             if not result.get("success", False):
                 error_msg = result.get("message") or result.get("error") or "Unknown API error"
                 raise ValueError(f"API Error: {error_msg}")
 
-            flat = flatten_json(result)
-            filtered = {k: v for k, v in flat.items() if should_keep_field(k)}
+            with metrics.timer("project_seconds"):
+                filtered = projection.project(result)
             filtered["sourceUrl"] = url
             filtered["status"] = "Success"
+            limiter.on_success()
+            keys.record_success(key, result.get("credits_left"))
             return filtered
 
         except (requests.exceptions.HTTPError, ValueError) as e:
@@ -83,71 +183,785 @@ def scrape_profile(url, apikey, retries=MAX_RETRIES, backoff=INITIAL_BACKOFF):
             if attempt == retries or not (500 <= status < 600):
                 return {"sourceUrl": url, "status": f"{type(e).__name__}: {str(e)}"}
             else:
-                time.sleep(backoff)
+                metrics.inc("retries_total")
+                pause(backoff)
                 backoff *= 2
         except Exception as e:
             return {"sourceUrl": url, "status": f"Error: {str(e)}"}
 
-def batch_scrape(input_file, output_file, shutdown=False, batch_index=None):
-    config = load_config()
-    apikey = config["API_KEY"]
-    run_id = os.environ.get("RUN_ID", "unknown")
+async def scrape_profile_async(session, url, apikey, retries=MAX_RETRIES, backoff=INITIAL_BACKOFF, limiter=None,
+                               projection=None, timeout=None, hedge=None):
+    keys = key_pool_for(apikey, limiter)
+    projection = projection or FIELD_PROJECTION
+
+    async def send():
+        key, waited = await keys.acquire_async()
+        metrics.observe("rate_limit_wait_seconds", waited)
+        started = time.monotonic()
+        async with session.get(API_URL, params={"apikey": key.key, "linkedInUrl": url}, timeout=timeout) as response:
+            latency = time.monotonic() - started
+            key.limiter.record_latency(latency)
+            keys.record(key, response.status)
+            metrics.observe("request_seconds", latency)
+            metrics.inc("requests_total", str(response.status))
+            metrics.inc("key_requests_total", key.name)
+            # The body is read here so a hedged duplicate can win outright.
+            body = await response.read()
+            return response.status, response.reason, response.headers.get("Retry-After"), body, key
+
+    attempt = 0
+    throttled = 0
+    while attempt < retries:
+        try:
+            status, reason, retry_after, body, key = await (hedge.run_async(send, keys) if hedge else send())
+        except NoUsableKey as e:
+            return {"sourceUrl": url, "status": f"Error: {e}"}
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+            attempt += 1
+            metrics.inc("timeouts_total")
+            if attempt == retries:
+                return {"sourceUrl": url, "status": f"{type(e).__name__}: {str(e) or 'request timed out'}"}
+            metrics.inc("retries_total")
+            await asyncio.sleep(backoff)
+            backoff *= 2
+            continue
+        except Exception as e:
+            return {"sourceUrl": url, "status": f"Error: {str(e)}"}
+
+        limiter = key.limiter
+        try:
+            if status == 429:
+                throttled += 1
+                if throttled > MAX_THROTTLE_RETRIES:
+                    return {"sourceUrl": url, "status": "HTTPError: 429 Too Many Requests"}
+                report_throttle(limiter, retry_after, keys, key)
+                continue
+
+            attempt += 1
+            if status >= 400:
+                if attempt == retries or not (500 <= status < 600):
+                    return {"sourceUrl": url, "status": f"HTTPError: {status} {reason or ''}"}
+                metrics.inc("retries_total")
+                await asyncio.sleep(backoff)
+                backoff *= 2
+                continue
+            result = json.loads(body)
+            if not result.get("success", False):
+                error_msg = result.get("message") or result.get("error") or "Unknown API error"
+                raise ValueError(f"API Error: {error_msg}")
+
+            with metrics.timer("project_seconds"):
+                filtered = projection.project(result)
+            filtered["sourceUrl"] = url
+            filtered["status"] = "Success"
+            limiter.on_success()
+            keys.record_success(key, result.get("credits_left"))
+            return filtered
+
+        except ValueError as e:
+            return {"sourceUrl": url, "status": f"{type(e).__name__}: {str(e)}"}
+        except Exception as e:
+            return {"sourceUrl": url, "status": f"Error: {str(e)}"}
 
-    df = pd.read_csv(input_file)
-    urls = df.iloc[:, 0].dropna().tolist()
+class AsyncEngine:
+    # Keeps one event loop and one keep-alive connection pool for its whole
+    # lifetime, so consecutive runs reuse warm connections.
+    def __init__(self, concurrency=ASYNC_CONCURRENCY):
+        global aiohttp
+        if aiohttp is None:
+            try:
+                import aiohttp
+            except ImportError:
+                raise RuntimeError("The async engine requires aiohttp (pip install aiohttp)")
+        self.concurrency = concurrency
+        self.loop = asyncio.new_event_loop()
+        self.session = None
+
+    def run(self, urls, apikey, on_result, limiter=None, projection=None, timeout=REQUEST_TIMEOUT, hedge=None,
+            deadline=None):
+        self.loop.run_until_complete(self._run(urls, apikey, on_result, limiter, projection, timeout, hedge, deadline))
+
+    async def _run(self, urls, apikey, on_result, limiter, projection, timeout, hedge, deadline):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector)
+        client_timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+
+        queue = asyncio.Queue()
+        for url in urls:
+            queue.put_nowait(url)
+        active = set()
+
+        async def worker():
+            while True:
+                try:
+                    url = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                active.add(url)
+                started = time.perf_counter()
+                result = await scrape_profile_async(self.session, url, apikey, limiter=limiter,
+                                                    projection=projection, timeout=client_timeout, hedge=hedge)
+                metrics.observe("scrape_seconds", time.perf_counter() - started)
+                active.discard(url)
+                on_result(result)
+
+        workers = asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(urls)) or 1)))
+        if deadline is None:
+            await workers
+            return
+        try:
+            await asyncio.wait_for(workers, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            # Stragglers and unstarted URLs are left to a retry pass.
+            stragglers = list(active)
+            while not queue.empty():
+                stragglers.append(queue.get_nowait())
+            for url in stragglers:
+                on_result(deadline_result(url))
+
+    def close(self):
+        if self.session is not None:
+            self.loop.run_until_complete(self.session.close())
+            self.session = None
+        self.loop.close()
+
+def run_threaded(urls, apikey, on_result, limiter=None, projection=None, timeout=REQUEST_TIMEOUT, hedge=None,
+                 deadline=None):
+    # Only a small window of futures is kept alive so finished rows are not
+    # held in memory until the whole chunk is done. Threads scale with the
+    # number of API keys, each key brings its own rate budget.
+    workers = MAX_WORKERS * (len(apikey) if isinstance(apikey, KeyPool) else 1)
+    if hedge is not None:
+        hedge.size_for(workers)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    in_flight = {}
+    urls = iter(urls)
+    try:
+        while True:
+            while len(in_flight) < workers * 2:
+                url = next(urls, None)
+                if url is None:
+                    break
+                future = executor.submit(scrape_profile, url, apikey, limiter=limiter, projection=projection,
+                                         timeout=timeout, hedge=hedge, deadline=deadline)
+                in_flight[future] = url
+            if not in_flight:
+                break
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                # Answers that landed since the last wait are kept; they are
+                # paid for. Stragglers and unstarted URLs are left to a retry
+                # pass: queued futures are cancelled, running ones stop before
+                # their next retry and their late answers are dropped.
+                for future in [f for f in in_flight if f.done() and not f.cancelled()]:
+                    on_result(future.result())
+                    del in_flight[future]
+                for future in in_flight:
+                    future.cancel()
+                for url in itertools.chain(in_flight.values(), urls):
+                    on_result(deadline_result(url))
+                in_flight.clear()
+                break
+            done, _ = wait(in_flight, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                del in_flight[future]
+                on_result(future.result())
+    finally:
+        executor.shutdown(wait=not in_flight and deadline is None, cancel_futures=True)
+
+def run_async(urls, apikey, on_result, concurrency=ASYNC_CONCURRENCY, limiter=None, projection=None,
+              timeout=REQUEST_TIMEOUT, hedge=None, deadline=None):
+    engine = AsyncEngine(concurrency)
+    try:
+        engine.run(urls, apikey, on_result, limiter, projection, timeout, hedge, deadline)
+    finally:
+        engine.close()
+
+def lookup_cached(urls, cache, cache_mode, on_result):
+    # Serves cache hits straight to on_result and returns the URLs that still
+    # need a network call. Hits never touch the rate limiter.
+    if cache is None or cache_mode == "refresh":
+        return list(urls)
+    pending = []
+    for url in urls:
+        cached = cache.get(url)
+        if cached is not None:
+            on_result({**cached, "sourceUrl": url, "status": "Success"})
+        elif cache_mode == "cache-only":
+            on_result({"sourceUrl": url, "status": "Cache miss"})
+        else:
+            pending.append(url)
+    return pending
+
+def tail_seconds(finish_times):
+    # How long the slowest 1% of fetches kept the chunk open after the
+    # other 99% were done.
+    if len(finish_times) < 2:
+        return 0.0
+    finish_times = sorted(finish_times)
+    return finish_times[-1] - finish_times[int(len(finish_times) * 0.99) - 1]
+
+def run_summary(engine, concurrency, processed, fetched, elapsed, saved, failures, limiter_stats,
+                key_usage=None, tail_s=None, hedge_stats=None, deduped=0):
+    # Per-worker telemetry; startup.sh copies it into the progress record so
+    # the dashboard's chunk planner can learn real throughput.
+    summary = {
+        "engine": engine,
+        "concurrency": concurrency if engine == "async" else MAX_WORKERS,
+        "rows": processed,
+        "fetched": fetched,
+        "deduped": deduped,
+        "successes": saved,
+        "failures": failures,
+        "throttle_events": limiter_stats["throttle_events"],
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(processed / elapsed, 3) if elapsed > 0 else None,
+        "latency_p50_s": limiter_stats["latency_p50_s"],
+        "latency_p95_s": limiter_stats["latency_p95_s"],
+        "final_rate": limiter_stats["rate"],
+        "tail_s": round(tail_s, 2) if tail_s is not None else None,
+    }
+    if hedge_stats:
+        summary.update(hedge_stats)
+    if key_usage:
+        summary["keys"] = key_usage
+    return summary
+
+def combine_summaries(summaries):
+    # Folds the summaries of the units one queue worker processed.
+    summaries = [s for s in summaries if s]
+    if not summaries:
+        return None
+    combined = dict(summaries[-1])
+    for key in ("rows", "fetched", "successes", "failures", "throttle_events", "elapsed_s"):
+        combined[key] = round(sum(s[key] for s in summaries), 2)
+    combined["deduped"] = sum(s.get("deduped", 0) for s in summaries)
+    elapsed = combined["elapsed_s"]
+    combined["rows_per_s"] = round(combined["rows"] / elapsed, 3) if elapsed > 0 else None
+    for key in ("latency_p50_s", "latency_p95_s", "tail_s"):
+        values = sorted(s[key] for s in summaries if s.get(key) is not None)
+        combined[key] = values[len(values) // 2] if values else None
+    if any(s.get("keys") for s in summaries):
+        combined["keys"] = combine_key_usage(s.get("keys") for s in summaries)
+    return combined
+
+def write_summary(summary, summary_file):
+    with open(summary_file, "w") as f:
+        json.dump(summary, f)  # single line, it is embedded in progress.jsonl
+
+def batch_scrape(input_file, output_file, shutdown=False, batch_index=None, engine="threads",
+                 concurrency=ASYNC_CONCURRENCY, rate=INITIAL_RATE, max_rate=MAX_RATE,
+                 cache_path=DEFAULT_CACHE_PATH, cache_ttl=DEFAULT_TTL, cache_max_entries=DEFAULT_MAX_ENTRIES,
+                 cache_mode="use", max_positions=None, output_format="csv", summary_file=None, config=None,
+                 limiter=None, async_engine=None, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 hedge=False, hedge_quantile=HEDGE_QUANTILE, hedge_budget=HEDGE_MAX_FRACTION, deadline_s=None):
+    # config, limiter and async_engine let a long-lived caller (--daemon)
+    # carry its loaded config, learned rate and warm connections across chunks.
+    config = config or load_config()
+    if cache_path and max_positions is not None:
+        # The cache holds full rows keyed by URL only: truncated rows must not
+        # be served to uncapped runs, nor full ones to capped runs. The CLI
+        # rejects --cache-only with --max-positions for the same reason.
+        assert cache_mode != "cache-only", "cache-only runs can't cap lists"
+        print("💾 Profile cache not used: --max-positions rows are truncated")
+        cache_path = None
+
+    urls = read_input_urls(input_file)
+
+    journal_file = journal_path_for(output_file)
+    already_done = completed_urls(journal_file)
+    total = len(urls)
+    urls = [url for url in urls if url not in already_done]
 
     batch_label = f"[Batch {batch_index}]" if batch_index else "[Batch]"
-    print(f"{batch_label} Starting batch of {len(urls)} records")
+    print(f"{batch_label} Starting batch of {total} records ({engine} engine)")
+    if already_done:
+        print(f"♻️  Resuming: {total - len(urls)} records already in {journal_file}")
+    # Rows spelling the same profile differently (or repeating it) share one
+    # fetch; its result is written back to each of them.
+    profiles = group_by_profile(urls)
+    deduped = len(urls) - len(profiles)
+    if deduped:
+        print(f"🧬 Dedup: {len(urls)} rows point at {len(profiles)} profiles, saving {deduped} API calls")
 
-    results = []
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(scrape_profile, url, apikey) for url in urls]
-        for i, future in enumerate(as_completed(futures), 1):
-            result = future.result()
-            with lock:
-                results.append(result)
-                print(f"[{i}/{len(urls)}] {result['sourceUrl']} → {result['status']}")
+    completed = total - len(urls)
+    journal = ResultJournal(journal_file)
+    cache = ProfileCache(cache_path, cache_ttl, cache_max_entries) if cache_path else None
 
-    all_fields = set().union(*(r.keys() for r in results))
-    remaining_fields = sorted(f for f in all_fields if f not in PREFERRED_FIELDS)
-    fieldnames = PREFERRED_FIELDS + remaining_fields
+    def on_result(result, fetched=False):
+        nonlocal completed
+        metrics.inc("results_total", outcome_of(result["status"]))
+        source_url = result["sourceUrl"]
+        rows = profiles.get(source_url) or [source_url]
+        with lock, metrics.timer("journal_write_seconds"):
+            journal.append(result)
+            for url in rows[1:]:
+                journal.append({**result, "sourceUrl": url, DUPLICATE_COLUMN: source_url})
+            completed += len(rows)
+            shared = f" (+{len(rows) - 1} duplicate rows)" if len(rows) > 1 else ""
+            print(f"[{completed}/{total}] {source_url} → {result['status']}{shared}")
+        if fetched and cache is not None and result["status"] == "Success":
+            cache.put(result["sourceUrl"], result)
 
-    failure_file = output_file.replace("result_", "failures_")
+    finish_times = []
 
-    with open(output_file, mode='w', newline='', encoding='utf-8') as res_f:
-        writer = csv.DictWriter(res_f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
+    def on_fetched(result):
+        finish_times.append(time.monotonic())
+        on_result(result, fetched=True)
 
-    print(f"\n✅ Done. Saved {len(results)} results to {output_file}")
+    keys = key_pool_from_config(config, rate, max_rate, limiter)
+    projection = build_projection(max_positions)
+    timeout = (connect_timeout, read_timeout)
+    hedge_policy = HedgePolicy(hedge_quantile, hedge_budget) if hedge else None
+    started = time.monotonic()
+    # Rows still out at the deadline are written as transient failures, so
+    # --retry-failures or the dashboard's retry picks them up.
+    deadline = started + deadline_s if deadline_s else None
+    run_options = dict(projection=projection, timeout=timeout, hedge=hedge_policy, deadline=deadline)
+    pending = []
+    try:
+        pending = lookup_cached(list(profiles), cache, cache_mode, on_result)
+        if engine == "async" and async_engine is not None:
+            async_engine.run(pending, keys, on_fetched, **run_options)
+        elif engine == "async":
+            run_async(pending, keys, on_fetched, concurrency, **run_options)
+        else:
+            run_threaded(pending, keys, on_fetched, **run_options)
+    finally:
+        journal.close()
+    elapsed = time.monotonic() - started
+    tail_s = tail_seconds(finish_times)
+
+    if cache is not None:
+        cache_stats = cache.stats()
+        cache.close()
+        print(f"💾 Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"({len(pending)} profiles fetched from the API)")
+
+    limiter_stats = keys.stats()
+    print(f"🚦 Rate limiter: {limiter_stats['rate']} req/s at end, "
+          f"{limiter_stats['throttle_events']} throttle events")
+    for event in keys.throttle_events()[-10:]:
+        print(f"   429 at {event['time']}: paused {event['pause_s']}s, rate → {event['rate_after']} req/s")
+    print(f"⏱️  Tail: slowest 1% of fetches finished {tail_s:.2f}s after the rest")
+    hedge_stats = hedge_policy.stats() if hedge_policy else None
+    if hedge_stats:
+        print(f"🪞 Hedging: {hedge_stats['hedges']} duplicate requests ({hedge_stats['hedge_rate']:.1%}), "
+              f"{hedge_stats['hedge_wins']} answered first")
+    key_usage = keys.usage()
+    if len(keys) > 1:
+        for usage in key_usage:
+            state = f", {usage['disabled']}" if usage["disabled"] else ""
+            print(f"🔑 {usage['name']}: {usage['calls']} calls, {usage['throttled']} throttled, "
+                  f"{usage['rate']} req/s{state}")
 
-    failures = [r for r in results if r["status"] != "Success"]
+    failure_file = os.path.join(os.path.dirname(output_file),
+                                os.path.basename(output_file).replace("result_", "failures_"))
+    with metrics.timer("compact_seconds"):
+        if output_format in COLUMNAR_FORMATS:
+            output_file = columnar_path(output_file, output_format)
+            failure_file = columnar_path(failure_file, output_format)
+            saved, failures = compact_journal_columnar(journal_file, output_file, failure_file, PREFERRED_FIELDS,
+                                                       output_format)
+        else:
+            saved, failures = compact_journal(journal_file, output_file, failure_file, PREFERRED_FIELDS)
+
+    print(f"\n✅ Done. Saved {saved} results to {output_file}")
     if failures:
-        with open(failure_file, mode='w', newline='', encoding='utf-8') as fail_f:
-            writer = csv.DictWriter(fail_f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(failures)
-        print(f"⚠️  Saved {len(failures)} failures to {failure_file}")
+        print(f"⚠️  Saved {failures} failures to {failure_file}")
 
-    zip_file = f"scrape_results_{batch_index or '0'}.zip"
+    zip_file = os.path.join(os.path.dirname(output_file), f"scrape_results_{batch_index or '0'}.zip")
     with zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
         if os.path.exists(output_file):
-            zipf.write(output_file)
+            zipf.write(output_file, os.path.basename(output_file))
         if failures and os.path.exists(failure_file):
-            zipf.write(failure_file)
+            zipf.write(failure_file, os.path.basename(failure_file))
 
     print(f"📦 Zipped results into {zip_file}")
 
+    if summary_file:
+        write_summary(run_summary(engine, concurrency, len(urls), len(pending), elapsed, saved, failures,
+                                  limiter_stats, key_usage, tail_s, hedge_stats, deduped), summary_file)
+
+    if shutdown:
+        print("Shutting down machine...")
+        os.system("sudo shutdown -h now")
+    return zip_file
+
+def retry_output_path(output_file, output_format="csv"):
+    # The run that produced the failures journaled them as done, so a retry
+    # into the same output would resume and scrape nothing. It gets the
+    # first result_x_retryN name without an output yet; an unfinished retry
+    # there is resumed from its own journal.
+    if not os.path.exists(journal_path_for(output_file)):
+        return output_file
+    stem, ext = os.path.splitext(output_file)
+    n = 1
+    while True:
+        candidate = f"{stem}_retry{n}{ext}"
+        finished = candidate if output_format not in COLUMNAR_FORMATS else columnar_path(candidate, output_format)
+        if not os.path.exists(finished):
+            return candidate
+        n += 1
+
+def retry_label(batch_index, retry_output):
+    # Batch label of a retry pass, e.g. 5_retry1, so its zip and summary sit
+    # next to the original chunk's instead of overwriting them.
+    batch = batch_index or "0"
+    match = re.search(r"_retry(\d+)$", os.path.splitext(retry_output)[0])
+    if match:
+        return f"{batch}_retry{match.group(1)}"
+    directory = os.path.dirname(retry_output)
+    n = 1
+    while os.path.exists(os.path.join(directory, f"scrape_results_{batch}_retry{n}.zip")):
+        n += 1
+    return f"{batch}_retry{n}"
+
+def retry_failures(failure_files, output_file, batch_index=None, summary_file=None, **scrape_kwargs):
+    # Re-scrapes only the rows whose failure was transient (429, 5xx,
+    # timeouts); permanent ones (not found, invalid URL) are not paid for again.
+    urls, counts = retriable_urls(failure_files)
+    print(f"🔁 {counts[TRANSIENT]} transient and {counts[PERMANENT]} permanent failures; "
+          f"retrying {len(urls)} URLs")
+    if not urls:
+        return None
+    retry_output = retry_output_path(output_file, scrape_kwargs.get("output_format", "csv"))
+    if retry_output != output_file:
+        print(f"📝 {output_file} already has a journal, writing the retry to {retry_output}")
+    output_file = retry_output
+    retry_input = f"{os.path.splitext(output_file)[0]}_retry_input.csv"
+    write_input_urls(urls, retry_input)
+    label = retry_label(batch_index, output_file)
+    if summary_file:
+        stem, ext = os.path.splitext(summary_file)
+        summary_file = f"{stem}_{label}{ext}"
+    return batch_scrape(retry_input, output_file, batch_index=label, summary_file=summary_file, **scrape_kwargs)
+
+def run_queue_worker(run_id, bucket, worker_id=None, lease_seconds=LEASE_SECONDS, shutdown=False, summary_file=None,
+                     **scrape_kwargs):
+    # Pulls work units until the queue is empty. Units leased by other
+    # workers are waited on, so a dead worker's units get picked up once
+    # its lease expires.
+    queue = WorkQueue(bucket, run_id, worker_id, lease_seconds)
+    print(f"🧵 Queue worker {queue.worker_id} starting on run {run_id}")
+    # Retry queues deliver into the original run's results folder; their
+    # files carry the queue's run id so they don't clash with its units.
+    results_prefix = f"users/{run_id}/results/"
+    manifest = read_queue_manifest(bucket, run_id) or {}
+    label_prefix = ""
+    if manifest.get("results_prefix") and manifest["results_prefix"] != results_prefix:
+        results_prefix = manifest["results_prefix"]
+        label_prefix = f"{run_id}_"
+    processed = 0
+    summaries = []
+    while True:
+        lease = queue.claim()
+        if lease is None:
+            remaining = queue.remaining()
+            if remaining == 0:
+                break
+            print(f"⏳ {remaining} units still leased by other workers. Waiting {POLL_SECONDS}s...")
+            time.sleep(POLL_SECONDS)
+            continue
+
+        keeper = LeaseKeeper(queue, lease)
+        keeper.start()
+        try:
+            input_file = f"{lease.unit}.csv"
+            queue.unit_blob(lease.unit).download_to_filename(input_file)
+            unit_summary = f"run_summary_{lease.unit}.json"
+            label = label_prefix + lease.unit
+            zip_file = batch_scrape(input_file, f"result_{label}.csv", batch_index=label,
+                                    summary_file=unit_summary, **scrape_kwargs)
+            keeper.stop()
+            if not keeper.lost:
+                # Renewals may have failed quietly; one more proves the lease
+                # is still ours right before publishing.
+                queue.renew(lease)
+        except LeaseLost as e:
+            keeper.lost = True
+            print(f"⚠️  {e}")
+        except BaseException:
+            keeper.stop()
+            queue.release(lease)
+            raise
+        if keeper.lost:
+            # Another worker owns the unit now; its results and done marker win.
+            print(f"🚫 Abandoning {lease.unit}: lease lost, results not published")
+            continue
+        with open(unit_summary) as f:
+            summaries.append(json.load(f))
+        result_blob = results_prefix + os.path.basename(zip_file)
+        try:
+            bucket.blob(result_blob).upload_from_filename(zip_file)
+        except BaseException:
+            queue.release(lease)
+            raise
+        queue.complete(lease, result_blob)
+        processed += 1
+
+    print(f"🏁 Queue for run {run_id} is drained. This worker processed {processed} units.")
+    if summary_file and summaries:
+        write_summary(combine_summaries(summaries), summary_file)
+    if shutdown:
+        print("Shutting down machine...")
+        os.system("sudo shutdown -h now")
+
+def chunk_results_prefix(chunk_name):
+    # users/<run>/chunks/chunk_3.csv -> users/<run>/results/, the folder a
+    # one-shot chunk VM uploads to.
+    folder = chunk_name.rsplit("/", 1)[0] + "/" if "/" in chunk_name else ""
+    if folder.endswith("chunks/"):
+        folder = folder[:-len("chunks/")]
+    return folder + "results/"
+
+def claim_owner(bucket, chunk_name):
+    marker = bucket.get_blob(chunk_name + ".claimed")
+    if marker is None:
+        return None
+    try:
+        return marker.download_as_text()
+    except NotFound:
+        return None
+
+def claim_chunk(bucket, chunk_name, worker_id):
+    # Create-only marker: exactly one worker, daemon or one-shot chunk VM,
+    # wins each chunk. The owner may claim it again, so a rebooted or
+    # relaunched VM of the same name resumes its chunk from the journal.
+    try:
+        bucket.blob(chunk_name + ".claimed").upload_from_string(worker_id, if_generation_match=0)
+        return True
+    except PreconditionFailed:
+        return claim_owner(bucket, chunk_name) == worker_id
+
+def chunk_result_blob(chunk_name):
+    return chunk_results_prefix(chunk_name) + f"scrape_results_{CHUNK_BLOB.search(chunk_name).group(1)}.zip"
+
+def run_claimed_chunk(bucket, chunk_name, worker_id, input_file, output_file, **batch_kwargs):
+    # The one-shot chunk VM path: takes the chunk's marker first, so a daemon
+    # watching the same prefix does not scrape (and pay for) it again.
+    # Returns False when another worker already has it.
+    worker_id = worker_id or default_worker_id()
+    if not claim_chunk(bucket, chunk_name, worker_id):
+        print(f"⏭️ {chunk_name} is already claimed by another worker, skipping it")
+        return False
+    try:
+        batch_scrape(input_file, output_file, **batch_kwargs)
+    except BaseException:
+        bucket.blob(chunk_name + ".claimed").delete()
+        raise
+    return True
+
+def process_daemon_chunk(bucket, chunk_name, worker_id, **scrape_kwargs):
+    index = CHUNK_BLOB.search(chunk_name).group(1)
+    run_match = RUN_CHUNK_BLOB.match(chunk_name)
+    run_id = run_match.group(1) if run_match else os.environ.get("RUN_ID", "unknown")
+    # One folder per chunk keeps journals of different runs apart.
+    work_dir = os.path.join(DAEMON_WORK_DIR, run_id, f"chunk_{index}")
+    os.makedirs(work_dir, exist_ok=True)
+    input_file = os.path.join(work_dir, "input.csv")
+    bucket.blob(chunk_name).download_to_filename(input_file)
+    chunk_summary = os.path.join(work_dir, "run_summary.json")
+    zip_file = batch_scrape(input_file, os.path.join(work_dir, f"result_{index}.csv"), batch_index=index,
+                            summary_file=chunk_summary, **scrape_kwargs)
+    result_blob = chunk_result_blob(chunk_name)
+    bucket.blob(result_blob).upload_from_filename(zip_file)
+    with open(chunk_summary) as f:
+        summary = json.load(f)
+    if run_match:
+        # Same record startup.sh writes, so the dashboard counts the chunk.
+        append_record(bucket, {
+            "run_id": run_id,
+            "chunk_index": int(index) if index.isdigit() else index,
+            "vm_name": worker_id,
+            "status": "completed",
+            "mode": "daemon",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "result_path": f"gs://{bucket.name}/{result_blob}",
+            "summary": summary,
+        })
+    return summary
+
+def run_daemon(bucket, watch_prefix=DAEMON_WATCH_PREFIX, worker_id=None, idle_timeout=DAEMON_IDLE_TIMEOUT,
+               poll_seconds=DAEMON_POLL_SECONDS, shutdown=False, summary_file=None, engine="threads",
+               concurrency=ASYNC_CONCURRENCY, rate=INITIAL_RATE, max_rate=MAX_RATE, **scrape_kwargs):
+    # Keeps one process up across chunks, so VM boot, imports, config and
+    # warm connections are paid once instead of per chunk. Exits after
+    # idle_timeout seconds without a chunk to claim.
+    worker_id = worker_id or default_worker_id()
+    config = load_config()
+    async_engine = AsyncEngine(concurrency) if engine == "async" else None
+    next_rate = rate
+    summaries = []
+    idle_since = time.monotonic()
+    print(f"👀 Daemon {worker_id} watching {bucket.name}/{watch_prefix} (idle timeout {idle_timeout:.0f}s)")
+    # Chunks this worker claimed before a restart and never uploaded.
+    resume = None
+    try:
+        while True:
+            names = {blob.name for blob in bucket.list_blobs(prefix=watch_prefix,
+                                                             match_glob=f"{watch_prefix}**chunk_*.csv*")}
+            if resume is None:
+                resume = sorted(n for n in names if CHUNK_BLOB.search(n) and n + ".claimed" in names
+                                and claim_owner(bucket, n) == worker_id
+                                and bucket.get_blob(chunk_result_blob(n)) is None)
+            pending = sorted(n for n in names if CHUNK_BLOB.search(n) and n + ".claimed" not in names)
+            if resume:
+                chunk_name = resume.pop(0)
+            else:
+                chunk_name = next((n for n in pending if claim_chunk(bucket, n, worker_id)), None)
+            if chunk_name is None:
+                idle = time.monotonic() - idle_since
+                if idle >= idle_timeout:
+                    break
+                time.sleep(min(poll_seconds, idle_timeout - idle))
+                continue
+
+            print(f"📥 Claimed {chunk_name}")
+            # Each chunk starts at the rate the previous one ended on, with
+            # fresh counters so its summary only covers its own requests.
+            limiter = AdaptiveRateLimiter(rate=next_rate, max_rate=max(rate, max_rate))
+            try:
+                summaries.append(process_daemon_chunk(
+                    bucket, chunk_name, worker_id, config=config, limiter=limiter, async_engine=async_engine,
+                    engine=engine, concurrency=concurrency, rate=rate, max_rate=max_rate, **scrape_kwargs,
+                ))
+            except BaseException:
+                bucket.blob(chunk_name + ".claimed").delete()
+                raise
+            next_rate = limiter.rate
+            idle_since = time.monotonic()
+    finally:
+        if async_engine is not None:
+            async_engine.close()
+
+    print(f"💤 No new chunks for {idle_timeout:.0f}s. This daemon processed {len(summaries)} chunks.")
+    if summary_file and summaries:
+        write_summary(combine_summaries(summaries), summary_file)
     if shutdown:
         print("Shutting down machine...")
         os.system("sudo shutdown -h now")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--input", required=True, help="Path to input CSV")
-    parser.add_argument("--output", required=True, help="Path to save output CSV")
+    parser.add_argument("--input", help="Path to input CSV")
+    parser.add_argument("--output", help="Path to save output CSV")
     parser.add_argument("--shutdown", action="store_true", help="Shutdown machine after run")
     parser.add_argument("--batch-index", help="Optional index label for logging")
+    parser.add_argument("--retry-failures", nargs="+", metavar="FAILURES_FILE",
+                        help="Re-scrape the transient failures in these failures_*/ALL_FAILURES files")
+    parser.add_argument("--summary", help="Write run telemetry (throughput, latency, 429s) to this JSON file")
+    parser.add_argument("--metrics", help="Keep a JSON snapshot of counters and latency histograms at this path")
+    parser.add_argument("--metrics-interval", type=float, default=SNAPSHOT_INTERVAL,
+                        help="Seconds between metrics snapshots")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus text metrics on this port")
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads",
+                        help="Request engine: thread pool or asyncio with a pooled HTTP client")
+    parser.add_argument("--concurrency", type=int, default=ASYNC_CONCURRENCY,
+                        help="Max in-flight requests for the async engine")
+    parser.add_argument("--rate", type=float, default=INITIAL_RATE,
+                        help="Starting request rate (req/s) per API key, shared by all workers")
+    parser.add_argument("--max-rate", type=float, default=MAX_RATE,
+                        help="Ceiling the adaptive rate limiter may climb to (req/s per API key)")
+    parser.add_argument("--connect-timeout", type=float, default=CONNECT_TIMEOUT,
+                        help="Seconds to wait for a connection to the API")
+    parser.add_argument("--read-timeout", type=float, default=READ_TIMEOUT,
+                        help="Seconds to wait for response data; hung requests are retried")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate of requests still out after the observed latency quantile")
+    parser.add_argument("--hedge-quantile", type=float, default=HEDGE_QUANTILE,
+                        help="Latency percentile after which a request is hedged")
+    parser.add_argument("--hedge-budget", type=float, default=HEDGE_MAX_FRACTION,
+                        help="Max fraction of requests that may be duplicated (duplicates cost credits)")
+    parser.add_argument("--chunk-deadline", type=float,
+                        help="Seconds after which unfinished rows are failed as transient and the chunk finishes")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Path to the local profile cache (SQLite)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the profile cache")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL / 86400,
+                        help="Days before a cached profile is fetched again")
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help="Max cached profiles before least recently used ones are evicted")
+    parser.add_argument("--format", choices=["csv"] + list(COLUMNAR_FORMATS), default="csv",
+                        help="Result file format; parquet/arrow keep positions as list columns")
+    parser.add_argument("--max-positions", type=int,
+                        help="Keep only the first N entries of person.positions.positionHistory")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--cache-only", action="store_true", help="Never call the API; misses are reported")
+    cache_group.add_argument("--refresh", action="store_true", help="Ignore cached profiles and fetch them again")
+    parser.add_argument("--queue", metavar="RUN_ID", help="Pull work units for this run from the bucket queue")
+    parser.add_argument("--bucket", default=BUCKET_NAME, help="Bucket holding the work queue")
+    parser.add_argument("--local-bucket", help="Use a local directory in place of the GCS bucket")
+    parser.add_argument("--worker-id", help="Name recorded on leases (default: hostname plus a random suffix)")
+    parser.add_argument("--lease-seconds", type=int, default=LEASE_SECONDS,
+                        help="Seconds a claimed unit stays reserved without a renewal")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Stay up and scrape every chunk_*.csv that appears under --watch")
+    parser.add_argument("--watch", default=DAEMON_WATCH_PREFIX,
+                        help="Bucket prefix (or --local-bucket directory prefix) the daemon watches for chunks")
+    parser.add_argument("--idle-timeout", type=float, default=DAEMON_IDLE_TIMEOUT,
+                        help="Seconds without a new chunk before the daemon exits")
+    parser.add_argument("--poll-seconds", type=float, default=DAEMON_POLL_SECONDS,
+                        help="Seconds between listings of the watched prefix")
+    parser.add_argument("--claim-chunk", metavar="CHUNK_BLOB",
+                        help=f"Claim this chunk in --bucket before scraping --input; exits {CHUNK_CLAIMED_EXIT} "
+                             "if another worker has it")
 
     args = parser.parse_args()
-    batch_scrape(args.input, args.output, args.shutdown, args.batch_index)
+    if not (args.queue or args.daemon) and not args.output:
+        parser.error("--output is required unless --queue or --daemon is given")
+    if not (args.queue or args.daemon) and not args.input and not args.retry_failures:
+        parser.error("--input is required unless --queue, --daemon or --retry-failures is given")
+    if args.claim_chunk and (args.queue or args.daemon or args.retry_failures):
+        parser.error("--claim-chunk only applies to a plain --input/--output run")
+    if args.cache_only and args.max_positions is not None:
+        parser.error("--cache-only can't be combined with --max-positions (the cache holds uncapped rows)")
+
+    scrape_kwargs = dict(
+        engine=args.engine,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        max_rate=args.max_rate,
+        cache_path=None if args.no_cache else args.cache,
+        cache_ttl=args.cache_ttl * 86400,
+        cache_max_entries=args.cache_max_entries,
+        cache_mode="cache-only" if args.cache_only else "refresh" if args.refresh else "use",
+        max_positions=args.max_positions,
+        output_format=args.format,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        hedge=args.hedge,
+        hedge_quantile=args.hedge_quantile,
+        hedge_budget=args.hedge_budget,
+        deadline_s=args.chunk_deadline,
+    )
+    metrics.set_labels(run_id=args.queue or os.environ.get("RUN_ID", "unknown"),
+                       worker=args.worker_id or args.batch_index or socket.gethostname())
+    if args.metrics_port:
+        serve_prometheus(metrics, args.metrics_port)
+    snapshot_writer = None
+    if args.metrics:
+        snapshot_writer = SnapshotWriter(metrics, args.metrics, args.metrics_interval)
+        snapshot_writer.start()
+
+    claimed = True
+    if args.retry_failures:
+        retry_failures(args.retry_failures, args.output, args.batch_index, shutdown=args.shutdown,
+                       summary_file=args.summary, **scrape_kwargs)
+    elif args.daemon:
+        run_daemon(open_bucket(args.bucket, args.local_bucket), args.watch, args.worker_id, args.idle_timeout,
+                   args.poll_seconds, args.shutdown, args.summary, **scrape_kwargs)
+    elif args.queue:
+        run_queue_worker(args.queue, open_bucket(args.bucket, args.local_bucket), args.worker_id,
+                         args.lease_seconds, args.shutdown, args.summary, **scrape_kwargs)
+    elif args.claim_chunk:
+        claimed = run_claimed_chunk(open_bucket(args.bucket, args.local_bucket), args.claim_chunk, args.worker_id,
+                                    args.input, args.output, shutdown=args.shutdown, batch_index=args.batch_index,
+                                    summary_file=args.summary, **scrape_kwargs)
+    else:
+        batch_scrape(args.input, args.output, args.shutdown, args.batch_index, summary_file=args.summary,
+                     **scrape_kwargs)
+    if snapshot_writer:
+        snapshot_writer.stop()
+    if not claimed:
+        raise SystemExit(CHUNK_CLAIMED_EXIT)
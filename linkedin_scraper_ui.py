@@ -2,11 +2,19 @@ import streamlit as st
 import pandas as pd
 import requests
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import zipfile
 import os
 import sys
 import json
+from profile_cache import ProfileCache
+from zip_export import ZipResultExport
+from scrape_jobs import JobManager, FINISHED, DONE, CANCELLED, CANCELLING
+from api_keys import key_entries
+
+try:
+    from streamlit_autorefresh import st_autorefresh
+except ImportError:  # falls back to sleep + rerun
+    st_autorefresh = None
+from field_projection import compile_projection, KEEP_FIELD_PREFIXES
 
 def get_resource_path(relative_path):
     try:
@@ -32,103 +40,103 @@ def load_config():
     with open(config_path, "r") as f:
         return json.load(f)
 
-API_KEY = load_config()["API_KEY"]
-API_URL = "https://api.scrapin.io/enrichment/profile"
+API_KEY = key_entries(load_config())[0]["key"]  # the UI paces a single key
+API_URL = os.environ.get("SCRAPIN_API_URL", "https://api.scrapin.io/enrichment/profile")
 MAX_WORKERS = 10
-BATCH_SIZE = 50
-SLEEP_BETWEEN_BATCHES = 30  # seconds
-
-def flatten_json(y, prefix='', out=None):
-    if out is None:
-        out = {}
-    for k, v in y.items():
-        new_key = f'{prefix}.{k}' if prefix else k
-        if isinstance(v, dict):
-            flatten_json(v, new_key, out)
-        elif isinstance(v, list):
-            for i, item in enumerate(v):
-                if isinstance(item, dict):
-                    flatten_json(item, f'{new_key}[{i}]', out)
-                else:
-                    out[f'{new_key}[{i}]'] = item
+BATCH_SIZE = 50  # rows per batch_N.csv in the result zip
+# Requests are paced continuously instead of 50-URL bursts with 30s pauses;
+# the starting rate matches what those batches averaged.
+INITIAL_RATE = 1.5  # req/s
+MAX_RATE = 10.0
+MAX_THROTTLE_RETRIES = 5
+REQUEST_TIMEOUT = (5.0, 30.0)  # connect, read; a hung request fails instead of pinning a worker
+POLL_INTERVAL_MS = 2000
+# Newer Streamlit builds the download bytes only when the button is clicked.
+DEFERRED_DOWNLOADS = "callable" in (st.download_button.__doc__ or "")
+CACHE_PATH = os.path.abspath("profile_cache.sqlite")
+CACHE_TTL_DAYS = 30
+CACHE_MODES = {
+    "Use cached profiles": "use",
+    "Refresh (ignore cache)": "refresh",
+    "Cache only (no API calls)": "cache-only",
+}
+
+FIELD_PROJECTION = compile_projection(KEEP_FIELD_PREFIXES)
+
+def scrape_profile(url, limiter=None):
+    throttled = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            response = requests.get(API_URL, params={"apikey": API_KEY, "linkedInUrl": url},
+                                    timeout=REQUEST_TIMEOUT)
+            if response.status_code == 429 and limiter is not None and throttled < MAX_THROTTLE_RETRIES:
+                throttled += 1
+                limiter.on_throttle(response.headers.get("Retry-After"))
+                continue
+            result = response.json()
+            if not result.get("success", False):
+                return {"sourceUrl": url, "status": f"🚫 API Error: {result.get('message', 'Unknown error')}"}
+            filtered = FIELD_PROJECTION.project(result)
+            filtered["sourceUrl"] = url
+            filtered["status"] = "✅ Success"
+            if limiter is not None:
+                limiter.on_success()
+            return filtered
+        except Exception as e:
+            return {"sourceUrl": url, "status": f"🛑 Error: {str(e)}"}
+
+def lookup_cached(linkedin_urls, cache, cache_mode):
+    cached_results = []
+    pending = []
+    for url in linkedin_urls:
+        cached = cache.get(url) if cache_mode != "refresh" else None
+        if cached is not None:
+            row = {k: v for k, v in cached.items() if k.startswith(KEEP_FIELD_PREFIXES)}
+            row["sourceUrl"] = url
+            row["status"] = "✅ Success"
+            cached_results.append(row)
+        elif cache_mode == "cache-only":
+            cached_results.append({"sourceUrl": url, "status": "💤 Cache miss"})
         else:
-            out[new_key] = v
-    return out
-
-def should_keep_field(field):
-    return (
-        field.startswith("person.linkedin") or
-        field.startswith("person.firstName") or
-        field.startswith("person.lastName") or
-        field.startswith("person.headline") or
-        field.startswith("person.location") or
-        field.startswith("person.summary") or
-        field.startswith("person.positions") or
-        field.startswith("company")
+            pending.append(url)
+    return cached_results, pending
+
+def is_success(result):
+    return result["status"] == "✅ Success"
+
+@st.cache_resource
+def get_cache():
+    return ProfileCache(CACHE_PATH, ttl=CACHE_TTL_DAYS * 86400)
+
+def scrape_and_cache(url, limiter):
+    result = scrape_profile(url, limiter)
+    if is_success(result):
+        get_cache().put(result["sourceUrl"], result)
+    return result
+
+@st.cache_resource
+def get_job_manager():
+    # Shared by every browser session of this Streamlit process.
+    return JobManager(
+        scrape_and_cache,
+        lookup_fn=lambda urls, cache_mode: lookup_cached(urls, get_cache(), cache_mode),
+        sink_factory=lambda job: ZipResultExport(BATCH_SIZE),
+        is_success=is_success,
+        workers=MAX_WORKERS,
+        rate=INITIAL_RATE,
+        max_rate=MAX_RATE,
     )
 
-def scrape_profile(url):
-    try:
-        response = requests.get(API_URL, params={"apikey": API_KEY, "linkedInUrl": url})
-        result = response.json()
-        if not result.get("success", False):
-            return {"sourceUrl": url, "status": f"🚫 API Error: {result.get('message', 'Unknown error')}"}
-        flat = flatten_json(result)
-        filtered = {k: v for k, v in flat.items() if should_keep_field(k)}
-        filtered["sourceUrl"] = url
-        filtered["status"] = "✅ Success"
-        return filtered
-    except Exception as e:
-        return {"sourceUrl": url, "status": f"🛑 Error: {str(e)}"}
-
-def batch_scrape(linkedin_urls):
-    all_results = []
-    batch_files = []
-    num_batches = (len(linkedin_urls) + BATCH_SIZE - 1) // BATCH_SIZE
-
-    for i in range(num_batches):
-        st.info(f"🚀 Processing batch {i + 1} of {num_batches}...")
-        batch = linkedin_urls[i * BATCH_SIZE : (i + 1) * BATCH_SIZE]
-        batch_results = []
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_url = {executor.submit(scrape_profile, url): url for url in batch}
-            total = len(future_to_url)
-            completed = 0
-
-            for future in as_completed(future_to_url):
-                batch_results.append(future.result())
-                completed += 1
-                progress = int((completed / total) * 100)
-                progress_bar.progress(progress)
-                status_text.text(f"Processed {completed} of {total} in batch {i + 1}...")
-
-        batch_df = pd.DataFrame(batch_results)
-        batch_filename = f"batch_{i+1}.csv"
-        batch_df.to_csv(batch_filename, index=False)
-        batch_files.append(batch_filename)
-        all_results.extend(batch_results)
-        st.success(f"✅ Batch {i + 1} saved as {batch_filename}")
-
-        if i < num_batches - 1:
-            st.info(f"⏳ Sleeping {SLEEP_BETWEEN_BATCHES}s before next batch...")
-            time.sleep(SLEEP_BETWEEN_BATCHES)
-
-    # Save full merged CSV
-    merged_filename = "linkedin_scraped_all.csv"
-    pd.DataFrame(all_results).to_csv(merged_filename, index=False)
-    batch_files.append(merged_filename)
-
-    # Create a ZIP archive
-    zip_filename = "linkedin_result.zip"
-    with zipfile.ZipFile(zip_filename, "w") as zipf:
-        for file in batch_files:
-            zipf.write(file)
-            os.remove(file)  # Clean up after zipping
-
-    return zip_filename, pd.DataFrame(all_results)
+def batch_scrape(linkedin_urls, cache_mode="use"):
+    # Blocking helper for scripts and benchmarks; the page itself polls.
+    # Returns the job's ZipResultExport (.read_bytes(), .dataframe()).
+    manager = get_job_manager()
+    job = manager.get(manager.submit(linkedin_urls, cache_mode))
+    while job.status not in FINISHED:
+        time.sleep(0.2)
+    return job.output
 
 st.title("🔍 LinkedIn Profile Scraper (Batch)")
 st.markdown("Upload a CSV file with LinkedIn profile URLs in the first column. Then click **Start Scraping**.")
@@ -142,21 +150,54 @@ if uploaded_file:
     else:
         linkedin_urls = df.iloc[:, 0].dropna().tolist()
         st.success(f"✅ Uploaded {len(linkedin_urls)} LinkedIn URLs.")
+        cache_choice = st.radio("💾 Profile cache", list(CACHE_MODES), horizontal=True)
 
         if st.button("▶️ Start Scraping"):
-            with st.spinner("⏳ Scraping in batches..."):
-                zip_path, output_df = batch_scrape(linkedin_urls)
-
-            st.success("🎉 All batches completed and zipped!")
-
-            # Single ZIP download
-            with open(zip_path, "rb") as f:
-                st.download_button(
-                    label="⬇️ Download Result (ZIP)",
-                    data=f.read(),
-                    file_name=zip_path,
-                    mime="application/zip"
-                )
+            job_id = get_job_manager().submit(linkedin_urls, CACHE_MODES[cache_choice])
+            st.session_state["job_id"] = job_id
+            st.query_params["job"] = job_id  # lets a browser refresh find the job again
+
+# --- Job progress (survives reruns and refreshes) ---
+job_id = st.session_state.get("job_id") or st.query_params.get("job")
+job = get_job_manager().get(job_id) if job_id else None
+
+if job_id and job is None:
+    st.warning(f"Job {job_id} is no longer available.")
+elif job is not None:
+    state = job.state()
+    st.subheader(f"📋 Job `{job.id}`")
+    progress = int(state["completed"] / state["total"] * 100) if state["total"] else 100
+    st.progress(progress, text=f"{state['completed']} of {state['total']} profiles "
+                               f"({state['successes']} succeeded, {state['cache_hits']} from cache, "
+                               f"{state['deduped']} duplicates) · "
+                               f"{state['rows_per_min']:.0f} rows/min")
+
+    if state["status"] not in FINISHED:
+        if st.button("⏹️ Cancel job", disabled=state["status"] == CANCELLING):
+            get_job_manager().cancel(job.id)
+            st.rerun()
+        st.info("⏳ Cancelling..." if state["status"] == CANCELLING else "⏳ Scraping in the background...")
+        if st_autorefresh is not None:
+            st_autorefresh(interval=POLL_INTERVAL_MS, key=f"poll_{job.id}")
+        else:
+            time.sleep(POLL_INTERVAL_MS / 1000)
+            st.rerun()
+    else:
+        if state["status"] == DONE:
+            st.success("🎉 Scraping completed!")
+        elif state["status"] == CANCELLED:
+            st.warning(f"⏹️ Job cancelled after {state['completed']} profiles. Partial results below.")
+        if state["error"]:
+            st.error(f"🛑 {state['error']}")
+
+        if job.output is not None:
+            # Single ZIP download, served from the job's spooled buffer
+            st.download_button(
+                label=f"⬇️ Download Result (ZIP, {job.output.size / 1024:,.0f} KB)",
+                data=job.output.read_bytes if DEFERRED_DOWNLOADS else job.output.read_bytes(),
+                file_name="linkedin_result.zip",
+                mime="application/zip"
+            )
 
             st.subheader("📄 Preview (First 20 Rows)")
-            st.dataframe(output_df.head(20))
+            st.dataframe(pd.DataFrame(job.preview))
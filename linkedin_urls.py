@@ -0,0 +1,66 @@
+import hashlib
+from urllib.parse import urlsplit, unquote
+
+LINKEDIN_HOST = "www.linkedin.com"
+DUPLICATE_COLUMN = "duplicateOf"  # on rows filled in from another row's fetch
+
+
+def canonical_profile_url(url):
+    # Normalizes the many spellings of one profile URL (scheme, www/country
+    # subdomain, trailing slash, query string, case) to a single key.
+    if not isinstance(url, str):
+        return url
+    url = url.strip()
+    if not url:
+        return url
+    if "://" not in url:
+        url = "https://" + url
+    parts = urlsplit(url)
+    host = parts.netloc.lower().split("@")[-1].split(":")[0]
+    if host == "linkedin.com" or host.endswith(".linkedin.com"):
+        host = LINKEDIN_HOST
+    path = unquote(parts.path).rstrip("/").lower()
+    return f"https://{host}{path}"
+
+
+def is_profile_url(canonical):
+    # A canonical URL on linkedin.com with a path; blank and foreign URLs
+    # are not deduplicated, each row stands on its own.
+    return isinstance(canonical, str) and canonical.startswith(f"https://{LINKEDIN_HOST}/")
+
+
+def profile_key(url):
+    # Compact fixed-size key for the dedup set of a whole upload.
+    return hashlib.blake2b(str(canonical_profile_url(url)).encode(), digest_size=8).digest()
+
+
+def dedup_rows(rows, on_duplicate, column=0):
+    # Yields the first row per profile (URL in `column`) and passes every
+    # later row pointing at the same profile to on_duplicate(row, canonical).
+    # Rows without a LinkedIn URL always pass. Memory is 8 bytes of key per
+    # unique profile, not the rows.
+    seen = set()
+    for row in rows:
+        url = row[column] if len(row) > column else ""
+        if not is_profile_url(canonical_profile_url(url)):
+            yield row
+            continue
+        key = profile_key(url)
+        if key in seen:
+            on_duplicate(row, canonical_profile_url(url))
+            continue
+        seen.add(key)
+        yield row
+
+
+def group_by_profile(urls):
+    # Maps the first spelling of each profile to every input URL that points
+    # at it, itself included, in input order. Anything but a LinkedIn URL
+    # only groups with exact repeats.
+    first = {}
+    groups = {}
+    for url in urls:
+        canonical = canonical_profile_url(url)
+        rep = first.setdefault(canonical, url) if is_profile_url(canonical) else url
+        groups.setdefault(rep, []).append(url)
+    return groups
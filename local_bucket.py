@@ -0,0 +1,190 @@
+import fcntl
+import fnmatch
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    from google.api_core.exceptions import NotFound, PreconditionFailed
+except ImportError:  # google-cloud-storage not installed
+    class NotFound(Exception):
+        pass
+
+    class PreconditionFailed(Exception):
+        pass
+
+
+class LocalBucket:
+    # Directory-backed stand-in for google.cloud.storage.Bucket covering the
+    # calls this repo makes (list/read/write/compose/delete with generation
+    # preconditions). Used for local runs and for testing without GCS.
+    def __init__(self, root, name=None):
+        self.root = os.path.abspath(root)
+        self.name = name or os.path.basename(self.root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, blob_name):
+        return os.path.join(self.root, *blob_name.split("/"))
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.root, ".bucket.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def blob(self, blob_name):
+        return LocalBlob(self, blob_name)
+
+    def get_blob(self, blob_name):
+        blob = LocalBlob(self, blob_name)
+        if not blob.exists():
+            return None
+        blob.reload()
+        return blob
+
+    def list_blobs(self, prefix="", match_glob=None, delimiter=None):
+        prefix = prefix or ""
+        names = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith(".bucket.") or filename.startswith(".tmp-"):
+                    continue
+                rel = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, "/")
+                if not rel.startswith(prefix):
+                    continue
+                if match_glob and not fnmatch.fnmatchcase(rel, match_glob):
+                    continue
+                if delimiter and delimiter in rel[len(prefix):]:
+                    continue
+                names.append(rel)
+        for name in sorted(names):
+            blob = LocalBlob(self, name)
+            blob.reload()
+            yield blob
+
+
+class LocalBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.generation = None
+        self.size = None
+        self.etag = None
+        self.updated = None
+        self.content_type = None
+        self.content_encoding = None
+
+    @property
+    def path(self):
+        return self.bucket._path(self.name)
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def reload(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+        self.generation = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.etag = hashlib.md5(f"{self.name}:{stat.st_mtime_ns}:{stat.st_size}".encode()).hexdigest()
+        self.updated = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+
+    def _current_generation(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _check(self, if_generation_match):
+        if if_generation_match is not None and self._current_generation() != if_generation_match:
+            raise PreconditionFailed(f"Generation mismatch for {self.name}")
+
+    def _write(self, write_fn, if_generation_match=None):
+        if self.content_encoding == "gzip":
+            # Stored decompressed: GCS serves gzip-encoded objects that way
+            # (decompressive transcoding) to the readers in this repo.
+            write_raw = write_fn
+
+            def write_fn(f):
+                with tempfile.TemporaryFile() as spool:
+                    write_raw(spool)
+                    spool.seek(0)
+                    with gzip.GzipFile(fileobj=spool) as decompressed:
+                        shutil.copyfileobj(decompressed, f)
+        with self.bucket._locked():
+            self._check(if_generation_match)
+            previous = self._current_generation()
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(self.path))
+            with os.fdopen(fd, "wb") as f:
+                write_fn(f)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.path)
+            # Generations must change on every write, even within one mtime tick.
+            if os.stat(self.path).st_mtime_ns <= previous:
+                os.utime(self.path, ns=(previous + 1, previous + 1))
+        self.reload()
+
+    def upload_from_filename(self, filename, content_type=None, if_generation_match=None):
+        def write(f):
+            with open(filename, "rb") as src:
+                shutil.copyfileobj(src, f)
+        self._write(write, if_generation_match)
+
+    def upload_from_file(self, file_obj, content_type=None, rewind=False, size=None, if_generation_match=None):
+        if rewind:
+            file_obj.seek(0)
+        self._write(lambda f: shutil.copyfileobj(file_obj, f), if_generation_match)
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._write(lambda f: f.write(data), if_generation_match)
+
+    def download_to_filename(self, filename):
+        if not self.exists():
+            raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+        shutil.copyfile(self.path, filename)
+
+    def download_as_bytes(self, start=None, end=None):
+        if not self.exists():
+            raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+        with open(self.path, "rb") as f:
+            f.seek(start or 0)
+            # end is inclusive, as in the GCS client
+            return f.read() if end is None else f.read(end - (start or 0) + 1)
+
+    def download_as_text(self, encoding="utf-8"):
+        return self.download_as_bytes().decode(encoding)
+
+    def compose(self, sources, if_generation_match=None):
+        def write(f):
+            for source in sources:
+                with open(source.path, "rb") as src:
+                    shutil.copyfileobj(src, f)
+        self._write(write, if_generation_match)
+
+    def delete(self, if_generation_match=None):
+        with self.bucket._locked():
+            self._check(if_generation_match)
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+
+
+def open_bucket(bucket_name, local_dir=None):
+    # GCS bucket by name, or a LocalBucket rooted at local_dir.
+    if local_dir:
+        return LocalBucket(local_dir, bucket_name)
+    from google.cloud import storage
+    return storage.Client().bucket(bucket_name)
@@ -1,58 +1,440 @@
-import pandas as pd
+import argparse
+import csv
+import io
+import json
 import os
-from google.cloud import storage
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from columnar_output import is_columnar_file, iter_result_rows, columnar_fieldnames
+from local_bucket import open_bucket
+from failure_policy import classify_status, SUCCESS
+from linkedin_urls import canonical_profile_url, DUPLICATE_COLUMN
 
 BUCKET_NAME = "contact-scraper-bucket"
 RESULTS_PREFIX = "results/"
-MERGED_SUCCESS = "results/ALL_SUCCESS.csv"
-MERGED_FAILURES = "results/ALL_FAILURES.csv"
+MERGED_SUCCESS = "ALL_SUCCESS.csv"
+MERGED_FAILURES = "ALL_FAILURES.csv"
+MERGE_MANIFEST = "MERGE_MANIFEST.json"
+DUPLICATES_FILE = "DUPLICATES.csv"  # rows dropped at split time as repeats of another row's profile
+MERGED_OUTPUTS = {"result_": MERGED_SUCCESS, "failures_": MERGED_FAILURES}
+DOWNLOAD_WORKERS = 8
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "merge_cache")
 
-def download_csv_files(blob_prefix):
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
+# Wide result rows can carry long summaries/descriptions.
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+def get_bucket(bucket_name=BUCKET_NAME, local_dir=None):
+    return open_bucket(bucket_name, local_dir)
+
+def is_result_blob(name):
+    base = os.path.basename(name)
+    is_result_file = base.endswith(".csv") or is_columnar_file(base)
+    return is_result_file and (base.startswith("result_") or base.startswith("failures_"))
+
+def download_csv_files(blob_prefix, bucket=None, dest_dir=None):
+    bucket = bucket or get_bucket()
+    dest_dir = dest_dir or tempfile.mkdtemp(prefix="merge_")
     blobs = bucket.list_blobs(prefix=blob_prefix)
-    
+
     result_files = []
     for blob in blobs:
-        if blob.name.endswith(".csv") and ("result_" in blob.name or "failures_" in blob.name):
-            local_path = f"/tmp/{os.path.basename(blob.name)}"
+        if is_result_blob(blob.name):
+            local_path = os.path.join(dest_dir, os.path.basename(blob.name))
             blob.download_to_filename(local_path)
             result_files.append(local_path)
-    return result_files
+    return sorted(result_files)
+
+def is_source_blob(name):
+    # Plain result/failure files, or the per-chunk zips workers upload.
+    base = os.path.basename(name)
+    return is_result_blob(name) or (base.startswith("scrape_results_") and base.endswith(".zip"))
+
+def read_header(path):
+    if is_columnar_file(path):
+        return columnar_fieldnames(path)
+    with open(path, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), [])
+
+def union_header(files, duplicates=None):
+    # Cheap first pass: only headers are read. Column order follows
+    # first appearance, like pd.concat did.
+    fieldnames = []
+    seen = set()
+    for file in files:
+        for name in read_header(file):
+            if name not in seen:
+                seen.add(name)
+                fieldnames.append(name)
+    if duplicates and fieldnames and DUPLICATE_COLUMN not in seen:
+        fieldnames.append(DUPLICATE_COLUMN)
+    return fieldnames
+
+class DuplicateRows:
+    # canonical profile URL -> input URLs that were dropped at split time
+    # because an earlier row already points at that profile. `direct` holds
+    # the dropped URLs that have rows of their own anyway (a retry pass that
+    # scraped them), which are not filled in a second time; `kept` the ones
+    # that are the fetched spelling itself (exact repeats in the input).
+    def __init__(self, by_profile=None, direct=(), kept=()):
+        self.by_profile = by_profile or {}
+        self.direct = set(direct)
+        self.kept = set(kept)
+
+    def __bool__(self):
+        return bool(self.by_profile)
 
-def merge_csvs(files, pattern):
-    dfs = []
+    def __len__(self):
+        return sum(map(len, self.by_profile.values()))
+
+    def urls(self):
+        return {url for urls in self.by_profile.values() for url in urls}
+
+    def fill_ins(self, url):
+        if url in self.direct:
+            return []
+        return [d for d in self.by_profile.get(canonical_profile_url(url), ()) if d not in self.direct]
+
+def load_duplicates(blob):
+    if blob is None:
+        return DuplicateRows()
+    by_profile = {}
+    for row in csv.DictReader(io.StringIO(blob.download_as_text())):
+        by_profile.setdefault(row["canonicalUrl"], []).append(row["sourceUrl"])
+    return DuplicateRows(by_profile)
+
+def scraped_duplicates(files, duplicates):
+    # Dropped URLs with rows of their own in files, split into (direct,
+    # kept): kept ones are the first spelling of their profile in file
+    # order, i.e. the URL the split kept.
+    if not duplicates:
+        return set(), set()
+    dropped = duplicates.urls()
+    first = {}
+    scraped = set()
+    for file in files:
+        if not os.path.basename(file).startswith("result_"):
+            continue
+        for row in iter_result_rows(file):
+            url = row.get("sourceUrl")
+            if row.get(DUPLICATE_COLUMN) or not url:
+                continue
+            key = canonical_profile_url(url)
+            if key in duplicates.by_profile:
+                first.setdefault(key, url)
+            if url in dropped:
+                scraped.add(url)
+    kept = scraped & set(first.values())
+    return scraped - kept, kept
+
+def fan_out(rows, duplicates):
+    # Writes a fetched row back to every dropped duplicate of its profile.
+    for row in rows:
+        yield row
+        if duplicates and not row.get(DUPLICATE_COLUMN):
+            url = row.get("sourceUrl")
+            for duplicate in duplicates.fill_ins(url):
+                yield {**row, "sourceUrl": duplicate, DUPLICATE_COLUMN: url}
+
+def superseded(row, succeeded):
+    # A failure row for a URL that a result file has since scraped
+    # successfully (a retry pass). A duplicate row goes with the URL it was
+    # filled in from.
+    if not succeeded or classify_status(row.get("status")) == SUCCESS:
+        return False
+    filled_from = row.get(DUPLICATE_COLUMN)
+    return row.get("sourceUrl") in succeeded or bool(filled_from and filled_from in succeeded)
+
+def write_rows(writer, files, dedup=False, duplicates=None, succeeded=frozenset(), seen_urls=None):
+    # Streams rows into writer, dropping superseded failures and, with
+    # dedup, repeat sourceUrls. Returns rows written.
+    seen_urls = set() if seen_urls is None else seen_urls
+    rows = 0
     for file in files:
-        if pattern in os.path.basename(file):
-            df = pd.read_csv(file)
-            dfs.append(df)
-    if dfs:
-        return pd.concat(dfs, ignore_index=True)
-    return pd.DataFrame()
-
-def upload_file_to_bucket(local_path, destination_blob):
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
+        for row in fan_out(iter_result_rows(file), duplicates):
+            if superseded(row, succeeded):
+                continue
+            if dedup:
+                url = row.get("sourceUrl")
+                if url in seen_urls:
+                    continue
+                seen_urls.add(url)
+            writer.writerow(row)
+            rows += 1
+    return rows
+
+def merge_csvs(files, pattern, output_path, dedup=False, duplicates=None, succeeded=frozenset(), fieldnames=None):
+    # Streams every matching file into output_path under the union header.
+    # Memory is constant apart from the sourceUrl sets used by dedup and
+    # for superseded failures.
+    files = [f for f in files if os.path.basename(f).startswith(pattern)]
+    if not files:
+        return 0
+    fieldnames = fieldnames or union_header(files, duplicates)
+    with open(output_path, mode='w', newline='', encoding='utf-8') as out:
+        writer = csv.DictWriter(out, fieldnames=fieldnames, restval='', extrasaction='ignore')
+        writer.writeheader()
+        return write_rows(writer, files, dedup, duplicates, succeeded)
+
+def failure_urls(files):
+    return {row.get("sourceUrl") for file in files if os.path.basename(file).startswith("failures_")
+            for row in iter_result_rows(file)}
+
+def succeeded_urls(files, among=None):
+    # Successful sourceUrls in the result files; with among, only those in
+    # it, so the set stays as small as the failures it can supersede.
+    if among is not None and not among:
+        return set()
+    return {row.get("sourceUrl") for file in files if os.path.basename(file).startswith("result_")
+            for row in iter_result_rows(file) if (among is None or row.get("sourceUrl") in among)
+            and classify_status(row.get("status")) == SUCCESS}
+
+def merge_failures(files, output_path, succeeded, fieldnames=None, duplicates=None):
+    # Keeps the latest failure per sourceUrl and drops URLs that have since
+    # succeeded, so a retry pass replaces the failures it fixed. A duplicate
+    # row goes with the URL it was filled in from.
+    last = {}
+    for i, file in enumerate(files):
+        for j, row in enumerate(fan_out(iter_result_rows(file), duplicates)):
+            last[row.get("sourceUrl")] = (i, j)
+    if not last:
+        return 0
+    fieldnames = fieldnames or union_header(files, duplicates)
+    rows = 0
+    with open(output_path, mode='w', newline='', encoding='utf-8') as out:
+        writer = csv.DictWriter(out, fieldnames=fieldnames, restval='', extrasaction='ignore')
+        writer.writeheader()
+        for i, file in enumerate(files):
+            for j, row in enumerate(fan_out(iter_result_rows(file), duplicates)):
+                if superseded(row, succeeded) or last[row.get("sourceUrl")] != (i, j):
+                    continue
+                writer.writerow(row)
+                rows += 1
+    return rows
+
+def upload_file_to_bucket(local_path, destination_blob, bucket=None):
+    bucket = bucket or get_bucket()
     blob = bucket.blob(destination_blob)
     blob.upload_from_filename(local_path)
     print(f"✅ Uploaded: {destination_blob}")
 
-def main():
-    print("📥 Downloading result and failure CSVs from bucket...")
-    files = download_csv_files(RESULTS_PREFIX)
+def load_manifest(bucket, prefix):
+    blob = bucket.blob(prefix + MERGE_MANIFEST)
+    if not blob.exists():
+        return {"blobs": {}, "outputs": {}}
+    return json.loads(blob.download_as_text())
+
+def save_manifest(bucket, prefix, manifest):
+    bucket.blob(prefix + MERGE_MANIFEST).upload_from_string(
+        json.dumps(manifest, indent=1, sort_keys=True), content_type="application/json"
+    )
+
+def blob_version(blob):
+    return {"generation": str(blob.generation), "etag": blob.etag}
+
+def fetch_source(blob, cache_dir):
+    # Downloads one source blob into a cache keyed by name and generation and
+    # returns the local result/failure files it holds (zips are unpacked).
+    local_dir = os.path.join(cache_dir, blob.name.replace("/", "__") + f"@{blob.generation}")
+    done_marker = os.path.join(local_dir, ".complete")
+    if not os.path.exists(done_marker):
+        os.makedirs(local_dir, exist_ok=True)
+        local_path = os.path.join(local_dir, os.path.basename(blob.name))
+        blob.download_to_filename(local_path)
+        if local_path.endswith(".zip"):
+            with zipfile.ZipFile(local_path) as zipf:
+                for member in zipf.namelist():
+                    if is_result_blob(member):
+                        with zipf.open(member) as src, open(os.path.join(local_dir, os.path.basename(member)), "wb") as dst:
+                            shutil.copyfileobj(src, dst)
+            os.remove(local_path)
+        open(done_marker, "w").close()
+    return sorted(os.path.join(local_dir, f) for f in os.listdir(local_dir) if is_result_blob(f))
+
+def fetch_sources(blobs, cache_dir, workers=DOWNLOAD_WORKERS):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        fetched = executor.map(lambda b: (b.name, fetch_source(b, cache_dir)), blobs)
+        return dict(fetched)
+
+def append_to_output(bucket, output_name, files, pattern, header, work_dir, dedup, output_generation,
+                     duplicates=None, succeeded=frozenset()):
+    # Writes the new rows under the existing header (no header line) and
+    # composes them onto the merged object. Returns rows appended.
+    seen_urls = set()
+    if dedup:
+        existing = os.path.join(work_dir, "existing_" + os.path.basename(output_name))
+        bucket.blob(output_name).download_to_filename(existing)
+        seen_urls = {row.get("sourceUrl") for row in iter_result_rows(existing)}
+    part_path = os.path.join(work_dir, "part_" + os.path.basename(output_name))
+    files = [f for f in files if os.path.basename(f).startswith(pattern)]
+    with open(part_path, mode='w', newline='', encoding='utf-8') as out:
+        writer = csv.DictWriter(out, fieldnames=header, restval='', extrasaction='ignore')
+        rows = write_rows(writer, files, dedup, duplicates, succeeded, seen_urls)
+    if rows:
+        part_blob = bucket.blob(output_name + ".part")
+        part_blob.upload_from_filename(part_path)
+        target = bucket.blob(output_name)
+        target.compose([target, part_blob], if_generation_match=int(output_generation))
+        part_blob.delete()
+    return rows
+
+def failures_on_record(bucket, prefix, manifest, work_dir):
+    # sourceUrls in the merged ALL_FAILURES as of the last merge, or None
+    # when it was changed behind the manifest's back.
+    output_blob = bucket.get_blob(prefix + MERGED_FAILURES)
+    state = manifest["outputs"].get("failures_")
+    if output_blob is None and state is None:
+        return set()
+    if output_blob is None or state is None or str(output_blob.generation) != state["generation"]:
+        return None
+    path = os.path.join(work_dir, "recorded_" + MERGED_FAILURES)
+    output_blob.download_to_filename(path)
+    return {row.get("sourceUrl") for row in iter_result_rows(path)}
+
+def publish_output(bucket, manifest, pattern, output_name, merged_path, rows, header):
+    if rows:
+        upload_file_to_bucket(merged_path, output_name, bucket)
+        output_blob = bucket.get_blob(output_name)
+        manifest["outputs"][pattern] = {"header": header, "rows": rows, "generation": str(output_blob.generation)}
+    else:
+        manifest["outputs"].pop(pattern, None)
+        stale = bucket.get_blob(output_name)
+        if stale is not None:
+            stale.delete()
 
-    success_df = merge_csvs(files, "result_")
-    failure_df = merge_csvs(files, "failures_")
+def incremental_merge(prefix=RESULTS_PREFIX, bucket=None, dedup=False, full=False, cache_dir=None):
+    # Merges only the source blobs that are new or changed since the last
+    # run, as recorded in MERGE_MANIFEST.json next to the merged files.
+    start = time.monotonic()
+    bucket = bucket or get_bucket()
+    cache_dir = cache_dir or os.path.join(CACHE_DIR, bucket.name)
+    os.makedirs(cache_dir, exist_ok=True)
 
-    if not success_df.empty:
-        merged_success_path = "/tmp/ALL_SUCCESS.csv"
-        success_df.to_csv(merged_success_path, index=False)
-        upload_file_to_bucket(merged_success_path, MERGED_SUCCESS)
+    sources = {b.name: b for b in bucket.list_blobs(prefix=prefix) if is_source_blob(b.name)}
+    manifest = {"blobs": {}, "outputs": {}} if full else load_manifest(bucket, prefix)
+    merged = manifest["blobs"]
+    duplicates_blob = bucket.get_blob(prefix + DUPLICATES_FILE)
+    duplicates = load_duplicates(duplicates_blob)
+    duplicates_version = blob_version(duplicates_blob) if duplicates_blob else None
+    duplicates.direct = set(manifest.get("direct_duplicates", ()))
+    duplicates.kept = set(manifest.get("kept_duplicates", ()))
+    # Rows already merged were fanned out with the old duplicates list.
+    duplicates_changed = manifest.get("duplicates") != duplicates_version
 
-    if not failure_df.empty:
-        merged_failures_path = "/tmp/ALL_FAILURES.csv"
-        failure_df.to_csv(merged_failures_path, index=False)
-        upload_file_to_bucket(merged_failures_path, MERGED_FAILURES)
+    new = [b for name, b in sources.items() if name not in merged]
+    changed = [b for name, b in sources.items() if name in merged and merged[name] != blob_version(b)]
+    removed = [name for name in merged if name not in sources]
+
+    if not (new or changed or removed or duplicates_changed) and manifest["outputs"]:
+        print(f"✅ No new results under {prefix} ({time.monotonic() - start:.2f}s)")
+        return manifest
+
+    print(f"📥 {len(new)} new, {len(changed)} changed, {len(removed)} removed result blobs")
+    if duplicates:
+        print(f"🧬 Filling in {len(duplicates)} duplicate rows from {DUPLICATES_FILE}")
+    work_dir = tempfile.mkdtemp(prefix="merge_")
+    fetched = fetch_sources(new + changed, cache_dir)
+    all_files = None
+    # A dropped URL scraped directly must lose the row already filled in for
+    # it, and telling that apart from an exact repeat needs every file, so a
+    # new one means a full rewrite.
+    new_direct = set().union(*scraped_duplicates([f for b in new for f in fetched[b.name]], duplicates))
+    new_direct -= duplicates.direct | duplicates.kept
+
+    for pattern, output_file in MERGED_OUTPUTS.items():
+        output_name = prefix + output_file
+        output_state = manifest["outputs"].get(pattern)
+        new_files = [f for b in new for f in fetched[b.name] if os.path.basename(f).startswith(pattern)]
+        output_blob = bucket.get_blob(output_name)
+
+        can_append = (
+            output_state is not None
+            and output_blob is not None
+            and str(output_blob.generation) == output_state["generation"]
+            and not changed and not removed and not duplicates_changed and not new_direct
+            and set(union_header(new_files, duplicates)) <= set(output_state["header"])
+        )
+        new_successes = succeeded_urls([f for b in new for f in fetched[b.name]]) if can_append else set()
+        if can_append and pattern == "result_" and new_successes:
+            # Every failure row in ALL_SUCCESS also sits in ALL_FAILURES
+            # (merged after this output), so only a new success for a URL
+            # listed there can leave a stale failure row behind.
+            failed_urls = failures_on_record(bucket, prefix, manifest, work_dir)
+            if failed_urls is None or failed_urls & new_successes:
+                existing = os.path.join(work_dir, "existing_" + output_file)
+                output_blob.download_to_filename(existing)
+                merged_path = os.path.join(work_dir, output_file)
+                header = union_header([existing] + new_files, duplicates)
+                rows = merge_csvs([existing] + new_files, "", merged_path, dedup, duplicates, new_successes, header)
+                publish_output(bucket, manifest, pattern, output_name, merged_path, rows, header)
+                print(f"🔁 Rewrote {output_name}: replaced failures that a retry pass fixed")
+                continue
+
+        if can_append and pattern == "failures_":
+            # New successes (a retry pass) or repeat failures for URLs already
+            # in ALL_FAILURES mean rewriting it instead of appending.
+            if new_successes or new_files:
+                existing = os.path.join(work_dir, "existing_" + output_file)
+                output_blob.download_to_filename(existing)
+                existing_urls = {row.get("sourceUrl") for row in iter_result_rows(existing)}
+                new_urls = {row.get("sourceUrl") for f in new_files for row in iter_result_rows(f)}
+                if existing_urls & (new_successes | new_urls) or new_urls & new_successes:
+                    merged_path = os.path.join(work_dir, output_file)
+                    header = union_header([existing] + new_files, duplicates)
+                    rows = merge_failures([existing] + new_files, merged_path, new_successes, header, duplicates)
+                    publish_output(bucket, manifest, pattern, output_name, merged_path, rows, header)
+                    print(f"🔁 Rewrote {output_name}: {rows} failures left")
+                    continue
+
+        if can_append:
+            if not new_files:
+                continue
+            rows = append_to_output(bucket, output_name, new_files, pattern, output_state["header"],
+                                    work_dir, dedup, output_state["generation"], duplicates, new_successes)
+            output_blob = bucket.get_blob(output_name)
+            output_state.update(rows=output_state["rows"] + rows, generation=str(output_blob.generation))
+            print(f"➕ Appended {rows} rows to {output_name}")
+            continue
+
+        # Full rewrite of this output; unchanged blobs come from the local cache.
+        if all_files is None:
+            fetched_all = fetch_sources(list(sources.values()), cache_dir)
+            all_files = [f for name in sorted(fetched_all) for f in fetched_all[name]]
+            duplicates.direct, duplicates.kept = scraped_duplicates(all_files, duplicates)
+            # Only URLs with a failure row can be superseded; without
+            # failures the merge stays a single streaming pass.
+            retried = succeeded_urls(all_files, failure_urls(all_files))
+        merged_path = os.path.join(work_dir, output_file)
+        pattern_files = [f for f in all_files if os.path.basename(f).startswith(pattern)]
+        if pattern == "failures_":
+            rows = merge_failures(pattern_files, merged_path, retried, duplicates=duplicates)
+        else:
+            rows = merge_csvs(all_files, pattern, merged_path, dedup, duplicates, retried)
+        publish_output(bucket, manifest, pattern, output_name, merged_path, rows,
+                       union_header(pattern_files, duplicates))
+
+    manifest["blobs"] = {name: blob_version(b) for name, b in sources.items()}
+    manifest["duplicates"] = duplicates_version
+    manifest["direct_duplicates"] = sorted(duplicates.direct)
+    manifest["kept_duplicates"] = sorted(duplicates.kept)
+    save_manifest(bucket, prefix, manifest)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"🔀 Merge finished in {time.monotonic() - start:.2f}s")
+    return manifest
+
+def main(prefix=RESULTS_PREFIX, bucket=None, dedup=False, full=False):
+    incremental_merge(prefix, bucket, dedup, full)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bucket", default=BUCKET_NAME, help="GCS bucket holding the results")
+    parser.add_argument("--prefix", default=RESULTS_PREFIX, help="Blob prefix to merge, e.g. users/<run_id>/results/")
+    parser.add_argument("--local-dir", help="Use a local directory in place of the GCS bucket")
+    parser.add_argument("--dedup", action="store_true", help="Keep only the first row per sourceUrl")
+    parser.add_argument("--full", action="store_true", help="Ignore the merge manifest and rebuild everything")
+
+    args = parser.parse_args()
+    main(args.prefix, get_bucket(args.bucket, args.local_dir), args.dedup, args.full)
@@ -0,0 +1,83 @@
+import json
+import sqlite3
+import time
+from threading import Lock
+
+from linkedin_urls import canonical_profile_url
+
+DEFAULT_CACHE_PATH = "profile_cache.sqlite"
+DEFAULT_TTL = 30 * 24 * 3600  # seconds
+DEFAULT_MAX_ENTRIES = 200_000
+EVICT_EVERY = 500  # puts between LRU size checks
+
+# Rows are stored without the per-request columns; callers add them back.
+VOLATILE_FIELDS = ("sourceUrl", "status")
+
+
+class ProfileCache:
+    # SQLite store of filtered profile rows keyed by canonical LinkedIn URL,
+    # with TTL expiry and size-bounded LRU eviction.
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            "url TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS profiles_last_used ON profiles (last_used)")
+        self.conn.commit()
+
+    def get(self, url):
+        key = canonical_profile_url(url)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT data, fetched_at FROM profiles WHERE url = ?", (key,)).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self.conn.execute("DELETE FROM profiles WHERE url = ?", (key,))
+                    self.conn.commit()
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE profiles SET last_used = ? WHERE url = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, url, row):
+        data = {k: v for k, v in row.items() if k not in VOLATILE_FIELDS}
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO profiles (url, data, fetched_at, last_used) VALUES (?, ?, ?, ?)",
+                (canonical_profile_url(url), json.dumps(data), now, now),
+            )
+            self.conn.commit()
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        if self.ttl:
+            self.conn.execute("DELETE FROM profiles WHERE fetched_at < ?", (time.time() - self.ttl,))
+        count = self.conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM profiles WHERE url IN (SELECT url FROM profiles ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        self.conn.commit()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self.conn.close()
@@ -0,0 +1,118 @@
+import codecs
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from local_bucket import PreconditionFailed
+
+PROGRESS_BLOB = "progress.jsonl"
+APPEND_ATTEMPTS = 10
+
+
+def parse_records(text):
+    # Parses concatenated JSON objects (one per line, or the older pretty
+    # printed multi-line form). Returns (records, unparsed_tail); the tail is
+    # an incomplete trailing record to retry once more bytes arrive.
+    decoder = json.JSONDecoder()
+    records = []
+    idx = 0
+    n = len(text)
+    while True:
+        while idx < n and text[idx].isspace():
+            idx += 1
+        if idx >= n:
+            return records, ""
+        try:
+            obj, idx = decoder.raw_decode(text, idx)
+        except json.JSONDecodeError:
+            next_record = text.find("\n{", idx)
+            if next_record == -1:
+                return records, text[idx:]
+            idx = next_record + 1  # corrupt record, skip to the next one
+            continue
+        if isinstance(obj, dict):
+            records.append(obj)
+
+
+class ProgressTail:
+    # Follows the append-only progress log with ranged reads: only bytes past
+    # the last offset are fetched, and nothing is fetched when the object
+    # generation is unchanged. Keeps an index of completed chunks per run.
+    def __init__(self, bucket, blob_name=PROGRESS_BLOB):
+        self.bucket = bucket
+        self.blob_name = blob_name
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.generation = None
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+        self.completed = defaultdict(set)
+        self.records = defaultdict(list)
+
+    def poll(self):
+        with self._lock:
+            blob = self.bucket.get_blob(self.blob_name)
+            if blob is None or blob.generation == self.generation:
+                return False
+            if blob.size < self.offset:
+                self._reset()  # log was rewritten, start over
+            if blob.size > self.offset:
+                data = blob.download_as_bytes(start=self.offset)
+                self.offset += len(data)
+                self._ingest(data)
+            self.generation = blob.generation
+            return True
+
+    def _ingest(self, data):
+        records, self._pending = parse_records(self._pending + self._decoder.decode(data))
+        for record in records:
+            run_id = record.get("run_id")
+            if not run_id:
+                continue
+            self.records[run_id].append(record)
+            if record.get("status") == "completed" and isinstance(record.get("chunk_index"), int):
+                self.completed[run_id].add(record["chunk_index"])
+
+    def completed_chunks(self, run_id):
+        with self._lock:
+            return set(self.completed.get(run_id, ()))
+
+    def run_records(self, run_id):
+        with self._lock:
+            return list(self.records.get(run_id, ()))
+
+    def all_records(self):
+        with self._lock:
+            return [record for records in self.records.values() for record in records]
+
+    def run_ids(self):
+        with self._lock:
+            return set(self.records)
+
+
+def append_record(bucket, record, blob_name=PROGRESS_BLOB):
+    # Appends one JSON line with a generation-checked compose, so concurrent
+    # writers retry instead of overwriting each other's records.
+    line = json.dumps(record) + "\n"
+    part = bucket.blob(f"tmp/progress_{uuid.uuid4().hex}.jsonl")
+    part.upload_from_string(line, content_type="application/json")
+    try:
+        for _ in range(APPEND_ATTEMPTS):
+            current = bucket.get_blob(blob_name)
+            try:
+                if current is None:
+                    bucket.blob(blob_name).upload_from_string(line, if_generation_match=0)
+                else:
+                    bucket.blob(blob_name).compose([current, part], if_generation_match=current.generation)
+                return
+            except PreconditionFailed:
+                time.sleep(random.uniform(0.1, 1.0))
+        raise RuntimeError(f"Could not append to {blob_name} after {APPEND_ATTEMPTS} attempts")
+    finally:
+        part.delete()
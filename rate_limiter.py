@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+DEFAULT_THROTTLE_PAUSE = 30  # seconds, used when a 429 carries no Retry-After
+LATENCY_SAMPLES = 2048
+
+
+def parse_retry_after(value):
+    # Retry-After is either a number of seconds or an HTTP date.
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    # Process-wide AIMD pacer shared by every worker thread/coroutine.
+    # Each request reserves the next send slot; successes raise the rate
+    # additively, a 429 halves it and pauses all workers at once.
+    def __init__(self, rate=1.0, min_rate=0.1, max_rate=10.0, increase=0.05, decrease=0.5, burst=1):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self.successes = 0
+        self.throttle_events = []
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            earliest = now - (self.burst - 1) / self.rate
+            start = max(self._next_slot, earliest, self._paused_until)
+            self._next_slot = start + 1.0 / self.rate
+            return max(0.0, start - now)
+
+    def ready_in(self):
+        # Seconds until the next free send slot, without reserving it.
+        with self._lock:
+            now = time.monotonic()
+            earliest = now - (self.burst - 1) / self.rate
+            return max(0.0, self._next_slot - now, earliest - now, self._paused_until - now)
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def on_success(self):
+        with self._lock:
+            self.successes += 1
+            if time.monotonic() >= self._paused_until:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def record_latency(self, seconds):
+        self.latencies.append(seconds)
+
+    def latency_percentile(self, pct):
+        samples = sorted(self.latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def on_throttle(self, retry_after=None):
+        pause = parse_retry_after(retry_after)
+        if pause is None:
+            pause = DEFAULT_THROTTLE_PAUSE
+        with self._lock:
+            now = time.monotonic()
+            # 429s from requests already in flight belong to the same event:
+            # extend the pause if needed but only cut the rate once.
+            if now >= self._paused_until:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._paused_until = max(self._paused_until, now + pause)
+            self._next_slot = max(self._next_slot, self._paused_until)
+            self.throttle_events.append({
+                "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "pause_s": round(pause, 2),
+                "rate_after": round(self.rate, 3),
+            })
+            return pause
+
+    def stats(self):
+        p50, p95 = self.latency_percentile(50), self.latency_percentile(95)
+        with self._lock:
+            return {
+                "latency_p50_s": round(p50, 3) if p50 is not None else None,
+                "latency_p95_s": round(p95, 3) if p95 is not None else None,
+                "rate": round(self.rate, 3),
+                "successes": self.successes,
+                "throttle_events": len(self.throttle_events),
+                "paused_for_s": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            }
@@ -0,0 +1,99 @@
+import csv
+import json
+import os
+
+FSYNC_EVERY = 20  # results per fsync group
+
+
+def journal_path_for(output_file):
+    return f"{output_file}.journal"
+
+
+def iter_journal(path):
+    # Yields journaled rows in write order. A torn last line left by a crash
+    # is skipped; the URL it belonged to is simply scraped again.
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def completed_urls(path):
+    return {row["sourceUrl"] for row in iter_journal(path) if "sourceUrl" in row}
+
+
+class ResultJournal:
+    # Append-only JSONL log of scraped rows, fsynced in small groups so a
+    # preempted worker loses at most FSYNC_EVERY paid requests.
+    def __init__(self, path, fsync_every=FSYNC_EVERY):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._unsynced = 0
+        needs_newline = os.path.exists(path) and os.path.getsize(path) > 0 and not _ends_with_newline(path)
+        self._f = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            self._f.write("\n")
+
+    def append(self, row):
+        self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        if not self._f.closed:
+            self.sync()
+            self._f.close()
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def journal_fieldnames(path, preferred_fields):
+    all_fields = set()
+    failures = 0
+    for row in iter_journal(path):
+        all_fields.update(row.keys())
+        if row.get("status") != "Success":
+            failures += 1
+    remaining_fields = sorted(f for f in all_fields if f not in preferred_fields)
+    return list(preferred_fields) + remaining_fields, failures
+
+
+def compact_journal(path, output_file, failure_file, preferred_fields):
+    # Two streaming passes: the first collects the union header, the second
+    # writes result and failure CSVs row by row. Returns (rows, failures).
+    fieldnames, failures = journal_fieldnames(path, preferred_fields)
+    rows = 0
+    with open(output_file, mode='w', newline='', encoding='utf-8') as res_f:
+        res_writer = csv.DictWriter(res_f, fieldnames=fieldnames)
+        res_writer.writeheader()
+        fail_f = open(failure_file, mode='w', newline='', encoding='utf-8') if failures else None
+        try:
+            fail_writer = csv.DictWriter(fail_f, fieldnames=fieldnames) if fail_f else None
+            if fail_writer:
+                fail_writer.writeheader()
+            for row in iter_journal(path):
+                res_writer.writerow(row)
+                rows += 1
+                if fail_writer and row.get("status") != "Success":
+                    fail_writer.writerow(row)
+        finally:
+            if fail_f:
+                fail_f.close()
+    return rows, failures
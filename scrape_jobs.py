@@ -0,0 +1,165 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from rate_limiter import AdaptiveRateLimiter
+from linkedin_urls import group_by_profile, DUPLICATE_COLUMN
+
+MAX_WORKERS = 10
+MAX_RATE = 10.0  # req/s, shared by every job in the process
+INITIAL_RATE = 2.0
+MAX_FINISHED_JOBS = 20  # finished jobs kept around for download
+PREVIEW_ROWS = 20
+
+QUEUED, RUNNING, CANCELLING, CANCELLED, DONE, FAILED = "queued", "running", "cancelling", "cancelled", "done", "failed"
+FINISHED = (CANCELLED, DONE, FAILED)
+
+
+class ScrapeJob:
+    def __init__(self, urls, cache_mode):
+        self.id = uuid.uuid4().hex[:8]
+        self.urls = urls
+        self.cache_mode = cache_mode
+        self.status = QUEUED
+        self.total = len(urls)
+        self.completed = 0
+        self.successes = 0
+        self.cache_hits = 0
+        self.deduped = 0  # rows filled in from another row's fetch of the same profile
+        self.preview = []  # first rows only; the full results live in the sink
+        self.sink = None
+        self.output = None  # what sink.close() returned
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def add(self, result, success):
+        if self.sink is not None:
+            self.sink.add(result)
+        with self._lock:
+            if len(self.preview) < PREVIEW_ROWS:
+                self.preview.append(result)
+            self.completed += 1
+            self.successes += success
+
+    def state(self):
+        with self._lock:
+            elapsed = (self.finished or time.time()) - self.created
+            return {
+                "id": self.id,
+                "status": self.status,
+                "total": self.total,
+                "completed": self.completed,
+                "successes": self.successes,
+                "cache_hits": self.cache_hits,
+                "deduped": self.deduped,
+                "elapsed_s": round(elapsed, 1),
+                "rows_per_min": round(self.completed / elapsed * 60, 1) if elapsed > 0 else 0.0,
+                "error": self.error,
+            }
+
+
+class JobManager:
+    # Runs scrape jobs on background threads so they outlive Streamlit reruns
+    # and browser refreshes. One rate limiter and one request pool are shared
+    # by all jobs in the process: they all spend the same API key.
+    def __init__(self, scrape_fn, lookup_fn=None, sink_factory=None, is_success=None, workers=MAX_WORKERS,
+                 rate=INITIAL_RATE, max_rate=MAX_RATE):
+        # sink_factory(job) returns an object with add(row) and close(); rows
+        # are handed to it as they finish instead of being kept on the job.
+        self.scrape_fn = scrape_fn
+        self.lookup_fn = lookup_fn
+        self.sink_factory = sink_factory
+        self.is_success = is_success or (lambda result: True)
+        self.workers = workers
+        self.limiter = AdaptiveRateLimiter(rate=rate, max_rate=max_rate)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape")
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, urls, cache_mode="use"):
+        job = ScrapeJob(list(urls), cache_mode)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        threading.Thread(target=self._run, args=(job,), name=f"job-{job.id}", daemon=True).start()
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and job.status not in FINISHED:
+            job.status = CANCELLING
+            job.cancel_event.set()
+
+    def _prune(self):
+        finished = sorted((j for j in self.jobs.values() if j.status in FINISHED), key=lambda j: j.finished)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            discard = getattr(job.output, "discard", None)
+            if discard is not None:
+                discard()
+            del self.jobs[job.id]
+
+    def _run(self, job):
+        if job.status == QUEUED:
+            job.status = RUNNING
+        status = FAILED
+        try:
+            if self.sink_factory is not None:
+                job.sink = self.sink_factory(job)
+            # Each profile is fetched once, under its first spelling, and the
+            # result is added for every row that points at it.
+            profiles = group_by_profile(job.urls)
+            job.deduped = len(job.urls) - len(profiles)
+
+            def deliver(result):
+                success = self.is_success(result)
+                source_url = result["sourceUrl"]
+                rows = profiles.get(source_url) or [source_url]
+                job.add(result, success)
+                for url in rows[1:]:
+                    job.add({**result, "sourceUrl": url, DUPLICATE_COLUMN: source_url}, success)
+
+            pending = list(profiles)
+            if self.lookup_fn is not None:
+                cached, pending = self.lookup_fn(pending, job.cache_mode)
+                job.cache_hits = len(cached)
+                for result in cached:
+                    deliver(result)
+
+            # Requests go out continuously under the shared limiter. Only a
+            # small window per job is queued on the pool, so concurrent jobs
+            # interleave instead of running back to back.
+            in_flight = set()
+            urls = iter(pending)
+            while not job.cancel_event.is_set():
+                while len(in_flight) < self.workers:
+                    url = next(urls, None)
+                    if url is None:
+                        break
+                    in_flight.add(self.pool.submit(self.scrape_fn, url, self.limiter))
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    deliver(future.result())
+
+            for future in in_flight:
+                future.cancel()
+            status = CANCELLED if job.cancel_event.is_set() else DONE
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            job.finished = time.time()
+            if job.sink is not None:
+                try:
+                    job.output = job.sink.close()
+                except Exception as e:
+                    job.error = job.error or f"Could not build the result file: {e}"
+            job.status = status
@@ -7,12 +7,19 @@ cd /workspace
 mkdir -p chunks
 
 # Pull the scraper script, config, and assigned chunk
-gsutil cp gs://$BUCKET/linkedin_scraper.py .
+for module in linkedin_scraper.py rate_limiter.py linkedin_urls.py profile_cache.py result_journal.py field_projection.py columnar_output.py local_bucket.py work_queue.py scraper_metrics.py failure_policy.py progress_log.py api_keys.py chunk_upload.py hedging.py; do
+  gsutil cp gs://$BUCKET/$module .
+done
 gsutil cp gs://$BUCKET/config.json .
 gsutil cp gs://$BUCKET/chunks/chunk_${CHUNK_INDEX}.csv input.csv
 
 # Run the scraper
-python3 linkedin_scraper.py --input input.csv --output result_${CHUNK_INDEX}.csv --shutdown --batch-index ${CHUNK_INDEX}
+python3 linkedin_scraper.py --input input.csv --output result_${CHUNK_INDEX}.csv --shutdown --batch-index ${CHUNK_INDEX} \
+  --claim-chunk chunks/chunk_${CHUNK_INDEX}.csv --bucket $BUCKET
+if [[ $? -eq 3 ]]; then
+  sudo shutdown -h now  # another worker has this chunk
+  exit 0
+fi
 
 # Upload the result to GCS
 gsutil cp result_${CHUNK_INDEX}.csv gs://$BUCKET/results/
@@ -1,13 +1,22 @@
 import streamlit as st
 import pandas as pd
 import os
+import csv
+import io
 import json
 import time
 import uuid
-import shutil
-import zipfile
+from datetime import datetime, timedelta
 from google.cloud import storage
 from google.oauth2 import service_account
+import merge_results
+from progress_log import ProgressTail
+from failure_policy import PERMANENT, TRANSIENT, retriable_urls
+from chunk_planner import DEFAULT_COST_PER_CALL, plan_chunks, throughput_profile
+from scraper_metrics import summarize_snapshots
+from work_queue import UNIT_ROWS, WorkQueue, enqueue_rows, write_queue_manifest
+from chunk_upload import count_rows, read_csv_rows, spool_chunks, upload_chunks
+from linkedin_urls import canonical_profile_url, dedup_rows
 
 st.set_page_config(page_title="Contact Scraper Dashboard")
 st.title("📇 Contact Scraper Dashboard")
@@ -23,134 +32,194 @@ else:
 bucket_name = st.secrets["BUCKET_NAME"]
 bucket = client.bucket(bucket_name)
 
+@st.cache_resource
+def get_progress_tail():
+    # One tail of the global progress log shared by every dashboard session.
+    return ProgressTail(bucket)
+
+def render_metrics(run_id, placeholder):
+    # Worker snapshots are uploaded every ~30s by startup.sh.
+    snapshots = []
+    for blob in bucket.list_blobs(prefix=f"users/{run_id}/metrics/"):
+        try:
+            snapshots.append(json.loads(blob.download_as_text()))
+        except ValueError:
+            continue
+    if not snapshots:
+        return
+    workers, outcomes = summarize_snapshots(snapshots)
+    with placeholder.container():
+        st.subheader("📈 Worker metrics")
+        st.dataframe(pd.DataFrame(workers), hide_index=True)
+        st.bar_chart(pd.Series(outcomes, name="results"))
+
 # --- Upload + Split CSV ---
 uploaded_file = st.file_uploader("Upload full LinkedIn CSV to split and scrape", type=["csv"])
-num_chunks = 3
+target_minutes = st.number_input("Target completion time (minutes)", min_value=5, value=60, step=5)
+max_vms = st.number_input("Max VMs", min_value=1, value=10, step=1)
+use_queue = st.checkbox("Work-queue mode (workers pull small units, so one slow VM can't hold up the run)")
+unit_rows = st.number_input("Rows per work unit", min_value=10, value=UNIT_ROWS, step=10, disabled=not use_queue)
+gzip_chunks = st.checkbox("Gzip chunk uploads (smaller transfers, workers still read plain CSV)", disabled=use_queue)
 
 run_id = st.session_state.get("run_id")
 
 if uploaded_file:
-    input_df = pd.read_csv(uploaded_file)
-    st.write(f"✅ Dataframe loaded: {len(input_df)} rows")
+    # One streaming pass per upload, remembered across reruns: the file is
+    # never loaded into a DataFrame.
+    upload_key = getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+    if st.session_state.get("upload_rows", (None, 0))[0] != upload_key:
+        st.session_state["upload_rows"] = (upload_key, count_rows(uploaded_file))
+    total_rows = st.session_state["upload_rows"][1]
+    st.write(f"✅ File loaded: {total_rows} rows")
 
-    rows_per_chunk = -(-len(input_df) // num_chunks)
-    est_time_per_chunk_min = rows_per_chunk / 200
-    st.info(f"⏱️ Estimated processing time: ~{int(est_time_per_chunk_min)} minutes per chunk")
+    progress_tail = get_progress_tail()
+    try:
+        progress_tail.poll()
+    except Exception as e:
+        st.warning(f"Error reading progress log: {e}")
+    profile = throughput_profile(progress_tail.all_records())
+    plan = plan_chunks(total_rows, target_minutes, max_vms, profile,
+                       float(st.secrets.get("COST_PER_PROFILE", DEFAULT_COST_PER_CALL)))
+    num_chunks = plan["chunks"]
+    rows_per_chunk = plan["rows_per_chunk"]
+
+    finish = datetime.now() + timedelta(minutes=plan["predicted_minutes"])
+    st.info(f"🧮 Plan: {num_chunks} chunks of up to {rows_per_chunk} rows. "
+            f"Predicted finish ~{finish:%H:%M} ({plan['predicted_minutes']:.0f} min), "
+            f"~{plan['api_calls']} API calls ≈ ${plan['api_cost']:,.2f}")
+    if not plan["meets_target"]:
+        st.warning(f"⚠️ The target can't be met: limited by {plan['limited_by'] or 'VM startup time'}.")
+    if profile["samples"]:
+        latency = f", p95 latency {profile['latency_p95_s']:.2f}s" if profile["latency_p95_s"] is not None else ""
+        st.caption(f"Based on {profile['samples']} past workers: {profile['rows_per_s'] * 60:.0f} rows/min per VM"
+                   f"{latency}, {profile['throttle_rate']:.1%} of API calls throttled.")
+    else:
+        st.caption("No run telemetry yet, assuming 200 rows/min per VM.")
 
     if st.button("Split & Upload"):
         # Generate session UUID at this point only
         run_id = str(uuid.uuid4())[:8]
         st.session_state["run_id"] = run_id
+        st.session_state["queue_mode"] = use_queue
+        st.session_state["num_chunks"] = num_chunks
+        st.session_state.pop("queue_run_id", None)
+        st.session_state.pop("retry_count", None)
         st.markdown(f"**Session ID:** `{run_id}`")
 
-        st.info("🧹 Clearing previous session files...")
-        for prefix in [f"users/{run_id}/chunks/", f"users/{run_id}/results/"]:
-            blobs = list(bucket.list_blobs(prefix=prefix))
-            for blob in blobs:
-                blob.delete()
-
-        st.info("📤 Splitting CSV and uploading new chunks...")
-        os.makedirs("chunks", exist_ok=True)
-        for i in range(num_chunks):
-            start = i * rows_per_chunk
-            end = min((i + 1) * rows_per_chunk, len(input_df))
-            chunk_df = input_df.iloc[start:end]
-            if not chunk_df.empty:
-                filename = f"chunk_{i + 1}.csv"
-                path = os.path.join("chunks", filename)
-                chunk_df.to_csv(path, index=False)
-                blob = bucket.blob(f"users/{run_id}/chunks/{filename}")
-                blob.upload_from_filename(path)
-                st.success(f"✅ Uploaded chunk: {filename} ({len(chunk_df)} rows)")
-                os.remove(path)
-        shutil.rmtree("chunks", ignore_errors=True)
-        st.balloons()
-        st.success("🚀 All chunks uploaded. Scraping will start automatically.")
+        rows = read_csv_rows(uploaded_file)
+        header = next(rows, [])
+        upload_progress = st.progress(0, text="📤 Uploading...")
+        uploaded_rows = 0
+
+        # Rows pointing at a profile already seen in the upload (another
+        # spelling, or a repeat) are not scraped again. The merge writes
+        # the profile's result back to them from DUPLICATES.csv.
+        duplicates_buffer = io.StringIO()
+        duplicates_writer = csv.writer(duplicates_buffer)
+        duplicates_writer.writerow(["sourceUrl", "canonicalUrl"])
+        duplicate_rows = 0
+
+        def record_duplicate(row, canonical):
+            global duplicate_rows
+            duplicates_writer.writerow([row[0], canonical])
+            duplicate_rows += 1
+
+        rows = dedup_rows(rows, record_duplicate)
+
+        def report_upload(name, count, size):
+            global uploaded_rows
+            uploaded_rows += count
+            done_rows = uploaded_rows + duplicate_rows
+            upload_progress.progress(min(100, int(done_rows / max(total_rows, 1) * 100)),
+                                     text=f"✅ Uploaded {os.path.basename(name)} ({count} rows, {size / 1024:,.0f} KB)"
+                                          f" · {done_rows}/{total_rows} rows")
+
+        if use_queue:
+            st.info("📤 Enqueueing work units...")
+            units = enqueue_rows(bucket, run_id, header, rows, int(unit_rows), on_uploaded=report_upload)
+            # The manifest goes last: the launcher starts workers once it appears.
+            write_queue_manifest(bucket, run_id, units, workers=num_chunks, unit_rows=int(unit_rows))
+            st.balloons()
+            st.success(f"🚀 {len(units)} work units queued for {num_chunks} workers. Scraping will start automatically.")
+        else:
+            # The run_id was just generated, so there are no old session files
+            # to clear. Chunks stream from the upload straight to the bucket.
+            st.info("📤 Splitting CSV and uploading chunks...")
+            chunks = spool_chunks(header, rows, rows_per_chunk, lambda i: f"users/{run_id}/chunks/chunk_{i}.csv",
+                                  gzip_chunks)
+            uploaded_chunks = 0
+            for uploaded in upload_chunks(bucket, chunks, gzip_chunks=gzip_chunks):
+                report_upload(*uploaded)
+                uploaded_chunks += 1
+            st.session_state["num_chunks"] = uploaded_chunks
+            st.balloons()
+            st.success(f"🚀 All {uploaded_chunks} chunks uploaded. Scraping will start automatically.")
+        if duplicate_rows:
+            # The merge notices a new DUPLICATES.csv and rebuilds its outputs.
+            bucket.blob(f"users/{run_id}/results/{merge_results.DUPLICATES_FILE}").upload_from_string(
+                duplicates_buffer.getvalue(), content_type="text/csv")
+            st.info(f"🧬 {duplicate_rows} rows repeat a profile already in the upload: "
+                    f"{duplicate_rows} API calls saved, their rows are filled in at merge time.")
 
 # --- Progress Monitoring ---
 if run_id:
     st.header("📊 Scraping Progress")
     progress_placeholder = st.empty()
     status_text = st.empty()
+    metrics_placeholder = st.empty()
 
-    def fetch_central_progress():
-        blob = bucket.blob("progress.jsonl")
-        if not blob.exists():
-            return []
-        local_path = "/tmp/central_progress.jsonl"
-        try:
-            blob.download_to_filename(local_path)
-            with open(local_path, "r") as f:
-                raw_lines = f.read()
-                json_str = f"[{raw_lines.replace('}\n{', '},{')}]"
-                return json.loads(json_str)
-        except Exception as e:
-            st.warning(f"Error reading progress log: {e}")
-            return []
-
-    def filter_records_by_run_id(records, run_id):
-        return [r for r in records if r.get("run_id") == run_id and r.get("status") == "completed"]
+    progress_tail = get_progress_tail()
+    num_chunks = st.session_state.get("num_chunks", 1)
+
+    # A retry pass runs as its own queue but delivers into this run's results.
+    queue_run_id = st.session_state.get("queue_run_id", run_id)
+    queue = WorkQueue(bucket, queue_run_id) if st.session_state.get("queue_mode") else None
 
     completed_chunks = 0
     attempt = 0
     while True:
-        all_records = fetch_central_progress()
-        session_records = filter_records_by_run_id(all_records, run_id)
+        if attempt % 6 == 0:
+            try:
+                render_metrics(run_id, metrics_placeholder)
+            except Exception as e:
+                st.warning(f"Error reading worker metrics: {e}")
+        if queue:
+            # Queue runs finish per unit, so count done markers instead of VMs.
+            total_units = max(len(queue.units()), 1)
+            completed_units = len(queue.done())
+            progress_placeholder.progress(int(completed_units / total_units * 100),
+                                          text=f"{completed_units}/{total_units} work units completed")
+            if completed_units >= total_units:
+                status_text.success("✅ All work units completed.")
+                break
+        else:
+            try:
+                progress_tail.poll()
+            except Exception as e:
+                st.warning(f"Error reading progress log: {e}")
+            seen_chunks = progress_tail.completed_chunks(run_id)
 
-        seen_chunks = set()
-        for record in session_records:
-            if isinstance(record.get("chunk_index"), int):
-                seen_chunks.add(record["chunk_index"])
+            completed_chunks = len(seen_chunks)
+            progress = int((completed_chunks / num_chunks) * 100)
+            progress_placeholder.progress(progress, text=f"{completed_chunks}/{num_chunks} chunks completed")
 
-        completed_chunks = len(seen_chunks)
-        progress = int((completed_chunks / num_chunks) * 100)
-        progress_placeholder.progress(progress, text=f"{completed_chunks}/{num_chunks} chunks completed")
-
-        if completed_chunks >= num_chunks:
-            status_text.success("✅ All chunks completed.")
-            break
+            if completed_chunks >= num_chunks:
+                status_text.success("✅ All chunks completed.")
+                break
 
         attempt += 1
         status_text.info(f"⏳ Waiting... (Attempt {attempt})")
         time.sleep(5)
 
-    # --- Merge Results ---
-    def extract_zip_to_tmp(zip_path):
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall("/tmp")
-
-    def download_and_extract_zip_files(prefix):
-        blobs = list(bucket.list_blobs(prefix=prefix))
-        for blob in blobs:
-            if blob.name.endswith(".zip") and "scrape_results_" in blob.name:
-                local_path = f"/tmp/{os.path.basename(blob.name)}"
-                blob.download_to_filename(local_path)
-                extract_zip_to_tmp(local_path)
-
-    def merge_csvs(pattern):
-        files = [os.path.join("/tmp", f) for f in os.listdir("/tmp") if f.endswith(".csv") and pattern in f]
-        return pd.concat([pd.read_csv(f) for f in files], ignore_index=True) if files else pd.DataFrame()
-
-    def upload_to_bucket(local_path, dest_name):
-        blob = bucket.blob(dest_name)
-        blob.upload_from_filename(local_path)
+    try:
+        render_metrics(run_id, metrics_placeholder)
+    except Exception as e:
+        st.warning(f"Error reading worker metrics: {e}")
 
+    # --- Merge Results ---
     merge_success = False
     st.info("🔀 Merging results...")
-    download_and_extract_zip_files(f"users/{run_id}/results/")
-    success_df = merge_csvs("result_")
-    failure_df = merge_csvs("failures_")
-
-    if not success_df.empty:
-        success_path = "/tmp/ALL_SUCCESS.csv"
-        success_df.to_csv(success_path, index=False)
-        upload_to_bucket(success_path, f"users/{run_id}/results/ALL_SUCCESS.csv")
-
-    if not failure_df.empty:
-        failure_path = "/tmp/ALL_FAILURES.csv"
-        failure_df.to_csv(failure_path, index=False)
-        upload_to_bucket(failure_path, f"users/{run_id}/results/ALL_FAILURES.csv")
-
+    merge_results.incremental_merge(f"users/{run_id}/results/", bucket)
     merge_success = True
 
     # --- Download Buttons ---
@@ -164,5 +233,25 @@ if run_id:
                 with open(local_path, "rb") as f:
                     st.download_button(f"⬇️ Download {fname}", f, file_name=fname)
 
+        # --- Retry Transient Failures ---
+        if os.path.exists("/tmp/ALL_FAILURES.csv") and bucket.blob(f"users/{run_id}/results/ALL_FAILURES.csv").exists():
+            retry_urls, failure_counts = retriable_urls(["/tmp/ALL_FAILURES.csv"])
+            st.write(f"❗ {failure_counts[TRANSIENT]} transient failures (timeouts, throttling, 5xx, credits) "
+                     f"and {failure_counts[PERMANENT]} permanent ones (not found, invalid URL).")
+            if retry_urls and st.button(f"🔁 Retry {len(retry_urls)} transient failures"):
+                retry_count = st.session_state.get("retry_count", 0) + 1
+                retry_run_id = f"{run_id}-retry{retry_count}"
+                # Spellings of one profile go to the same unit, where they share a fetch.
+                retry_units = enqueue_rows(bucket, retry_run_id, ["LinkedIn URL"],
+                                           [[u] for u in sorted(retry_urls, key=canonical_profile_url)],
+                                           int(unit_rows))
+                write_queue_manifest(bucket, retry_run_id, retry_units,
+                                     workers=max(1, min(num_chunks, len(retry_units))), unit_rows=int(unit_rows),
+                                     results_prefix=f"users/{run_id}/results/")
+                st.session_state["retry_count"] = retry_count
+                st.session_state["queue_mode"] = True
+                st.session_state["queue_run_id"] = retry_run_id
+                st.rerun()
+
 st.markdown("---")
 st.caption("Powered by eCore Services.")
@@ -0,0 +1,204 @@
+import json
+import os
+import re
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SNAPSHOT_INTERVAL = 15  # seconds
+METRIC_PREFIX = "scraper_"
+
+
+def outcome_of(status):
+    # Short error class for breakdowns: "success", "http_404", "ValueError", ...
+    if status == "Success":
+        return "success"
+    match = re.match(r"HTTPError: (\d{3})", status)
+    if match:
+        return f"http_{match.group(1)}"
+    return status.split(":", 1)[0].strip() or "unknown"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, pct):
+        # Linear interpolation inside the bucket holding the percentile, as
+        # Prometheus' histogram_quantile does.
+        if not self.count:
+            return None
+        rank = self.count * pct / 100
+        seen = 0
+        lower = 0.0
+        for bound, n in zip(self.buckets, self.counts):
+            if n and seen + n >= rank:
+                return round(lower + (bound - lower) * (rank - seen) / n, 6)
+            seen += n
+            lower = bound
+        return self.buckets[-1]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class Metrics:
+    # Process-wide counters and histograms. Everything goes through one lock;
+    # each update is a dict lookup and an add, cheap next to an HTTP call.
+    def __init__(self):
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self.labels = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, kind=None, n=1):
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[kind] = series.get(kind, 0) + n
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def set_labels(self, **labels):
+        with self._lock:
+            self.labels.update(labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self.labels,
+                "updated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "uptime_s": round(time.time() - self.started, 1),
+                "counters": {
+                    name: {kind or "total": value for kind, value in series.items()}
+                    for name, series in self.counters.items()
+                },
+                "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+            }
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                metric = METRIC_PREFIX + name
+                lines.append(f"# TYPE {metric} counter")
+                for kind, value in sorted(series.items(), key=lambda item: item[0] or ""):
+                    label = f'{{kind="{kind}"}}' if kind else ""
+                    lines.append(f"{metric}{label} {value}")
+            for name, histogram in sorted(self.histograms.items()):
+                metric = METRIC_PREFIX + name
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, n in zip([str(b) for b in histogram.buckets] + ["+Inf"], histogram.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f"{metric}_sum {histogram.sum}")
+                lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def write_snapshot(metrics, path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(metrics.snapshot(), f)
+    os.replace(tmp, path)  # readers never see a half-written file
+
+
+class SnapshotWriter(threading.Thread):
+    # Rewrites the JSON snapshot every interval and once more on stop().
+    def __init__(self, metrics, path, interval=SNAPSHOT_INTERVAL):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                write_snapshot(self.metrics, self.path)
+            except OSError as e:
+                print(f"⚠️  Could not write metrics snapshot: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        write_snapshot(self.metrics, self.path)
+
+
+def serve_prometheus(metrics, port, host="0.0.0.0"):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Prometheus metrics on http://{socket.gethostname()}:{port}/metrics")
+    return server
+
+
+def summarize_snapshots(snapshots):
+    # Per-worker rows for the dashboard plus an error breakdown for the run.
+    workers = []
+    outcomes = {}
+    for snapshot in snapshots:
+        results = snapshot.get("counters", {}).get("results_total", {})
+        done = sum(results.values())
+        request = snapshot.get("histograms", {}).get("request_seconds", {})
+        workers.append({
+            "worker": snapshot.get("worker"),
+            "results": done,
+            "rows_per_min": round(done / snapshot["uptime_s"] * 60, 1) if snapshot.get("uptime_s") else None,
+            "request_p50_s": request.get("p50"),
+            "request_p95_s": request.get("p95"),
+            "throttled": sum(snapshot.get("counters", {}).get("throttled_total", {}).values()),
+            "retries": sum(snapshot.get("counters", {}).get("retries_total", {}).values()),
+            "updated": snapshot.get("updated"),
+        })
+        for outcome, n in results.items():
+            outcomes[outcome] = outcomes.get(outcome, 0) + n
+    return workers, outcomes
+
+
+metrics = Metrics()
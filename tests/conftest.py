@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.mock_scrapin import MockScrapin  # noqa: E402
+from local_bucket import LocalBucket  # noqa: E402
+
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    # Starts a local scrapin.io stand-in and points the scraper at it.
+    # Extra keyword arguments go to MockScrapin.
+    import linkedin_scraper
+
+    servers = []
+
+    def start(server_class=MockScrapin, **options):
+        options.setdefault("latency_ms", 1.0)
+        options.setdefault("latency_dist", "fixed")
+        server = server_class(**options).start()
+        servers.append(server)
+        monkeypatch.setattr(linkedin_scraper, "API_URL", server.url)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    return LocalBucket(str(tmp_path / "bucket"), "test-bucket")
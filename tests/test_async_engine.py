@@ -0,0 +1,114 @@
+import csv
+import threading
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+import linkedin_scraper  # noqa: E402
+from benchmarks.mock_scrapin import MockScrapin  # noqa: E402
+from failure_policy import TRANSIENT, PERMANENT, classify_status  # noqa: E402
+
+CONFIG = {"API_KEY": "test-key"}
+ENGINES = ["threads", "async"]
+
+
+class ScriptedMock(MockScrapin):
+    # Answers the first `script` requests with the given outcomes ("429",
+    # "5xx", "success_false"), then behaves like the plain mock.
+    def __init__(self, script=(), **options):
+        super().__init__(**options)
+        self.script = list(script)
+        self.script_lock = threading.Lock()
+        self.bodies = self.bodies[:1]  # every profile identical, rows comparable across runs
+
+    def draw(self):
+        delay, outcome, body = super().draw()
+        with self.script_lock:
+            if self.script:
+                outcome = self.script.pop(0)
+        return delay, outcome, body
+
+
+def profile_urls(count):
+    return [f"https://www.linkedin.com/in/test-user-{i}" for i in range(count)]
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def scrape(tmp_path, engine, urls, name=None):
+    name = name or engine
+    input_file = tmp_path / f"input_{name}.csv"
+    linkedin_scraper.write_input_urls(urls, str(input_file))
+    output_file = tmp_path / f"result_{name}.csv"
+    linkedin_scraper.batch_scrape(str(input_file), str(output_file), engine=engine, rate=1000, max_rate=1000,
+                                  cache_path=None, config=CONFIG)
+    failure_file = tmp_path / f"failures_{name}.csv"
+    return read_rows(output_file), read_rows(failure_file) if failure_file.exists() else []
+
+
+def test_async_rows_match_threads(tmp_path, mock_api):
+    mock_api(ScriptedMock)
+    urls = profile_urls(25)
+    by_engine = {}
+    for engine in ENGINES:
+        rows, failures = scrape(tmp_path, engine, urls)
+        assert failures == []
+        by_engine[engine] = sorted(rows, key=lambda row: row["sourceUrl"])
+
+    assert [row["sourceUrl"] for row in by_engine["async"]] == sorted(urls)
+    assert by_engine["async"] == by_engine["threads"]
+    assert all(row["status"] == "Success" for row in by_engine["async"])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_result_and_failure_files(tmp_path, mock_api, engine):
+    # Every row lands in result_, the failures (and only those) in failures_.
+    server = mock_api(ScriptedMock, script=["success_false"] * 3)
+    urls = profile_urls(10)
+    rows, failures = scrape(tmp_path, engine, urls)
+
+    assert sorted(row["sourceUrl"] for row in rows) == sorted(urls)
+    failed = [row for row in rows if row["status"] != "Success"]
+    assert len(failed) == 3
+    assert sorted(row["sourceUrl"] for row in failures) == sorted(row["sourceUrl"] for row in failed)
+    assert all(classify_status(row["status"]) == PERMANENT for row in failures)
+    assert server.stats["requests"] == 10  # success: false is not retried
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_throttled_requests_are_retried(tmp_path, mock_api, engine):
+    server = mock_api(ScriptedMock, script=["429"] * 4, retry_after="0")
+    urls = profile_urls(8)
+    rows, failures = scrape(tmp_path, engine, urls)
+
+    assert failures == []
+    assert all(row["status"] == "Success" for row in rows)
+    assert server.stats["429"] == 4
+    assert server.stats["requests"] == len(urls) + 4
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_server_errors_are_retried(tmp_path, mock_api, engine):
+    server = mock_api(ScriptedMock, script=["5xx"] * 2)
+    urls = profile_urls(6)
+    rows, failures = scrape(tmp_path, engine, urls)
+
+    assert failures == []
+    assert all(row["status"] == "Success" for row in rows)
+    assert server.stats["5xx"] == 2
+    assert server.stats["requests"] == len(urls) + 2
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_persistent_server_errors_are_transient_failures(tmp_path, mock_api, engine):
+    server = mock_api(rate_5xx=1.0)
+    urls = profile_urls(3)
+    rows, failures = scrape(tmp_path, engine, urls)
+
+    assert len(failures) == len(urls)
+    assert all(classify_status(row["status"]) == TRANSIENT for row in failures)
+    assert server.stats["requests"] == len(urls) * linkedin_scraper.MAX_RETRIES
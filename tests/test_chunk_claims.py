@@ -0,0 +1,63 @@
+import json
+
+import linkedin_scraper
+
+CONFIG = {"API_KEY": "test-key"}
+
+
+def upload_chunk(bucket, tmp_path, index, urls):
+    path = tmp_path / f"chunk_{index}.csv"
+    linkedin_scraper.write_input_urls(urls, str(path))
+    name = f"users/run/chunks/chunk_{index}.csv"
+    bucket.blob(name).upload_from_filename(str(path))
+    return name, path
+
+
+def test_chunk_vm_and_daemon_never_scrape_the_same_chunk(bucket, tmp_path, mock_api, monkeypatch):
+    server = mock_api()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.json").write_text(json.dumps(CONFIG))
+    first, first_path = upload_chunk(bucket, tmp_path, 1, [f"https://www.linkedin.com/in/a-{i}" for i in range(3)])
+    second, _ = upload_chunk(bucket, tmp_path, 2, [f"https://www.linkedin.com/in/b-{i}" for i in range(2)])
+
+    assert linkedin_scraper.run_claimed_chunk(bucket, first, "chunk-vm-1", str(first_path),
+                                              str(tmp_path / "result_1.csv"), cache_path=None, config=CONFIG)
+    linkedin_scraper.run_daemon(bucket, "users/", "daemon", idle_timeout=0, cache_path=None)
+
+    assert bucket.get_blob(first + ".claimed").download_as_text() == "chunk-vm-1"
+    assert bucket.get_blob(second + ".claimed").download_as_text() == "daemon"
+    assert server.stats["requests"] == 5
+    assert not linkedin_scraper.run_claimed_chunk(bucket, second, "chunk-vm-2", str(first_path),
+                                                  str(tmp_path / "result_2.csv"), cache_path=None, config=CONFIG)
+    assert server.stats["requests"] == 5
+
+
+def test_restarted_worker_resumes_its_own_claim(bucket, tmp_path, mock_api, monkeypatch):
+    server = mock_api()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.json").write_text(json.dumps(CONFIG))
+    name, path = upload_chunk(bucket, tmp_path, 1, [f"https://www.linkedin.com/in/a-{i}" for i in range(3)])
+    # A chunk VM claimed the chunk, then was preempted before finishing.
+    assert linkedin_scraper.claim_chunk(bucket, name, "scraper-vm-run-1")
+
+    assert linkedin_scraper.claim_chunk(bucket, name, "scraper-vm-run-1")
+    assert not linkedin_scraper.claim_chunk(bucket, name, "daemon")
+    assert linkedin_scraper.run_claimed_chunk(bucket, name, "scraper-vm-run-1", str(path),
+                                              str(tmp_path / "result_1.csv"), cache_path=None, config=CONFIG)
+    assert server.stats["requests"] == 3
+
+
+def test_restarted_daemon_finishes_its_unfinished_chunks(bucket, tmp_path, mock_api, monkeypatch):
+    server = mock_api()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.json").write_text(json.dumps(CONFIG))
+    unfinished, _ = upload_chunk(bucket, tmp_path, 1, [f"https://www.linkedin.com/in/a-{i}" for i in range(2)])
+    finished, _ = upload_chunk(bucket, tmp_path, 2, [f"https://www.linkedin.com/in/b-{i}" for i in range(2)])
+    for name in (unfinished, finished):
+        assert linkedin_scraper.claim_chunk(bucket, name, "daemon-vm")
+    bucket.blob(linkedin_scraper.chunk_result_blob(finished)).upload_from_string("zip")
+
+    linkedin_scraper.run_daemon(bucket, "users/", "daemon-vm", idle_timeout=0, cache_path=None)
+
+    assert bucket.get_blob(linkedin_scraper.chunk_result_blob(unfinished)) is not None
+    assert server.stats["requests"] == 2
@@ -0,0 +1,140 @@
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+from conftest import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "cloudfunction"))
+import main as cloudfunction  # noqa: E402
+import launcher  # noqa: E402
+
+RUN_ID = "runE"
+
+
+class HttpError(Exception):
+    # Shaped like googleapiclient.errors.HttpError for http_status().
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.resp = types.SimpleNamespace(status=status)
+
+
+class FakeCompute:
+    # instances().insert(...).execute() with GCE's 409 on a taken name.
+    # `errors` maps a VM name to exceptions raised on its next inserts.
+    def __init__(self, errors=None, existing=()):
+        self.inserts = []
+        self.instances_by_name = set(existing)
+        self.errors = {name: list(raised) for name, raised in (errors or {}).items()}
+        self.lock = threading.Lock()
+
+    def instances(self):
+        return self
+
+    def insert(self, project, zone, sourceInstanceTemplate, body):
+        name = body["name"]
+
+        def execute():
+            with self.lock:
+                self.inserts.append(name)
+                if self.errors.get(name):
+                    raise self.errors[name].pop(0)
+                if name in self.instances_by_name:
+                    raise HttpError(409, f"The resource '{name}' already exists")
+                self.instances_by_name.add(name)
+            return {"name": f"operation-{name}"}
+
+        return types.SimpleNamespace(execute=execute)
+
+
+class FakeStorageClient:
+    def __init__(self, bucket):
+        self._bucket = bucket
+
+    def bucket(self, name):
+        return self._bucket
+
+
+def upload_chunks(bucket, count, run_id=RUN_ID):
+    for index in range(1, count + 1):
+        bucket.blob(f"users/{run_id}/chunks/chunk_{index}.csv").upload_from_string("LinkedIn URL\nx\n")
+
+
+def fire(bucket, compute, index, run_id=RUN_ID):
+    event = {"bucket": bucket.name, "name": f"users/{run_id}/chunks/chunk_{index}.csv"}
+    context = types.SimpleNamespace(event_id=f"event-{index}")
+    return cloudfunction.launch_scraper_vms(event, context, FakeStorageClient(bucket), lambda: compute)
+
+
+def markers(bucket, run_id=RUN_ID):
+    return sorted(blob.name for blob in bucket.list_blobs(prefix=f"users/{run_id}/launches/"))
+
+
+def test_one_insert_per_chunk_for_repeated_and_concurrent_events(bucket):
+    upload_chunks(bucket, 5)
+    compute = FakeCompute()
+    threads = [threading.Thread(target=fire, args=(bucket, compute, index))
+               for index in [1, 2, 3, 4, 5, 1, 3, 5]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    fire(bucket, compute, 2)
+
+    expected = [cloudfunction.vm_name_for(RUN_ID, index) for index in range(1, 6)]
+    assert sorted(compute.inserts) == expected
+    assert markers(bucket) == [f"users/{RUN_ID}/launches/chunk_{index}.json" for index in range(1, 6)]
+
+
+def test_existing_instance_counts_as_launched(bucket):
+    upload_chunks(bucket, 2)
+    taken = cloudfunction.vm_name_for(RUN_ID, 1)
+    compute = FakeCompute(existing=[taken])
+    results = fire(bucket, compute, 1)
+
+    assert results[taken] == "exists"
+    assert results[cloudfunction.vm_name_for(RUN_ID, 2)] == "launched"
+    assert len(markers(bucket)) == 2  # the chunk stays claimed, no further attempts
+    assert fire(bucket, compute, 1) == {}
+
+
+def test_quota_error_defers_and_releases_the_marker(bucket):
+    upload_chunks(bucket, 3)
+    stuck = cloudfunction.vm_name_for(RUN_ID, 2)
+    compute = FakeCompute(errors={stuck: [HttpError(403, "Quota 'CPUS' exceeded. quotaExceeded")]})
+
+    with pytest.raises(cloudfunction.LaunchDeferred):
+        fire(bucket, compute, 2)
+    assert f"users/{RUN_ID}/launches/chunk_2.json" not in markers(bucket)
+
+    # The redelivered event launches only the deferred chunk.
+    results = fire(bucket, compute, 2)
+    assert results == {stuck: "launched"}
+    assert compute.inserts.count(stuck) == 2
+    assert len(markers(bucket)) == 3
+
+
+def test_permanent_error_releases_without_deferring(bucket):
+    upload_chunks(bucket, 1)
+    name = cloudfunction.vm_name_for(RUN_ID, 1)
+    compute = FakeCompute(errors={name: [HttpError(400, "Invalid instance template")]})
+
+    results = fire(bucket, compute, 1)
+    assert results[name].startswith("error:")
+    assert markers(bucket) == []
+
+
+def test_unrelated_objects_are_ignored(bucket):
+    compute = FakeCompute()
+    event = {"bucket": bucket.name, "name": "chunks/chunk_1.csv"}
+    assert cloudfunction.launch_scraper_vms(event, None, FakeStorageClient(bucket), lambda: compute) is None
+    assert compute.inserts == []
+
+
+def test_launcher_and_function_agree_on_vm_names():
+    for run_id in ["runE", "Run_ID.2024", "x" * 80]:
+        name = launcher.vm_name_for(run_id, 12)
+        assert name == cloudfunction.vm_name_for(run_id, 12)
+        assert len(name) <= 63 and name.endswith("-12") and name == name.lower()
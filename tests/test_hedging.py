@@ -0,0 +1,93 @@
+import threading
+import time
+
+import linkedin_scraper
+from hedging import HedgePolicy
+
+
+class FixedLatencies:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def latencies(self):
+        return [self.latency] * 20
+
+
+def run_callers(policy, send, callers):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(policy.run(send, FixedLatencies(0.3))))
+               for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_busy_pool_does_not_trigger_hedges():
+    # More callers than the default pool: requests well under the hedge
+    # delay must not be duplicated while they wait for a thread.
+    policy = HedgePolicy(max_fraction=1.0, min_samples=1)
+    policy.size_for(80)
+    sent = []
+
+    def send():
+        sent.append(1)
+        time.sleep(0.2)
+        return "ok"
+
+    assert run_callers(policy, send, 80) == ["ok"] * 80
+    assert len(sent) == 80
+    assert policy.stats()["hedges"] == 0
+
+
+def test_slow_request_is_hedged():
+    policy = HedgePolicy(max_fraction=1.0, min_samples=1)
+    calls = []
+
+    def send():
+        calls.append(1)
+        time.sleep(1.0 if len(calls) == 1 else 0.01)
+        return len(calls)
+
+    started = time.monotonic()
+    assert policy.run(send, FixedLatencies(0.05)) == 2
+    assert time.monotonic() - started < 0.5
+    assert policy.stats()["hedge_wins"] == 1
+
+
+def test_no_retries_after_the_deadline(mock_api):
+    server = mock_api(rate_5xx=1.0)
+    started = time.monotonic()
+    result = linkedin_scraper.scrape_profile("https://www.linkedin.com/in/x", "test-key", retries=5, backoff=10,
+                                             deadline=started + 0.5)
+
+    assert result["status"] == linkedin_scraper.DEADLINE_STATUS
+    assert time.monotonic() - started < 2
+    assert server.stats["requests"] == 1
+
+
+def test_answers_landing_at_the_deadline_are_kept(monkeypatch):
+    release = threading.Event()
+
+    def fake_scrape(url, apikey, **kwargs):
+        if url.startswith("slow"):
+            release.wait(5)
+        return {"sourceUrl": url, "status": "Success"}
+
+    def late_wait(futures, timeout=None, return_when=None):
+        # Wakes up only after the deadline, with the fast answers already in.
+        time.sleep(timeout + 0.05)
+        return set(), set(futures)
+
+    monkeypatch.setattr(linkedin_scraper, "scrape_profile", fake_scrape)
+    monkeypatch.setattr(linkedin_scraper, "wait", late_wait)
+    results = {}
+    try:
+        linkedin_scraper.run_threaded(["fast-1", "fast-2", "slow-1"], "test-key",
+                                      lambda row: results.setdefault(row["sourceUrl"], row["status"]),
+                                      deadline=time.monotonic() + 0.1)
+    finally:
+        release.set()
+
+    assert results == {"fast-1": "Success", "fast-2": "Success", "slow-1": linkedin_scraper.DEADLINE_STATUS}
@@ -0,0 +1,25 @@
+from linkedin_urls import dedup_rows, group_by_profile
+
+
+def test_dedup_rows_drops_other_spellings_of_a_profile():
+    dropped = []
+    rows = [["linkedin.com/in/Jane/"], ["https://www.linkedin.com/in/jane?trk=x"], ["https://uk.linkedin.com/in/bob"]]
+    kept = list(dedup_rows(rows, lambda row, canonical: dropped.append((row[0], canonical))))
+
+    assert kept == [["linkedin.com/in/Jane/"], ["https://uk.linkedin.com/in/bob"]]
+    assert dropped == [("https://www.linkedin.com/in/jane?trk=x", "https://www.linkedin.com/in/jane")]
+
+
+def test_dedup_rows_passes_blank_and_foreign_urls_through():
+    dropped = []
+    rows = [[""], [], ["  "], [""], ["example.com/in/jane"], ["EXAMPLE.com/in/jane"], ["https://linkedin.com/"]]
+    kept = list(dedup_rows(rows, lambda row, canonical: dropped.append(row)))
+
+    assert kept == rows
+    assert dropped == []
+
+
+def test_group_by_profile_keeps_foreign_spellings_apart():
+    groups = group_by_profile(["example.com/a", "EXAMPLE.com/a", "linkedin.com/in/a", "https://www.linkedin.com/in/A"])
+    assert groups == {"example.com/a": ["example.com/a"], "EXAMPLE.com/a": ["EXAMPLE.com/a"],
+                      "linkedin.com/in/a": ["linkedin.com/in/a", "https://www.linkedin.com/in/A"]}
@@ -0,0 +1,127 @@
+import csv
+import io
+
+import pytest
+
+import failure_policy
+import merge_results
+
+PREFIX = "users/run/results/"
+
+
+def upload_csv(bucket, tmp_path, name, rows, fieldnames=None):
+    fieldnames = fieldnames or list(rows[0])
+    path = tmp_path / name
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    bucket.blob(PREFIX + name).upload_from_filename(str(path))
+
+
+def merged(bucket, name=merge_results.MERGED_SUCCESS):
+    blob = bucket.get_blob(PREFIX + name)
+    if blob is None:
+        return None, []
+    reader = csv.DictReader(io.StringIO(blob.download_as_text()))
+    return reader.fieldnames, list(reader)
+
+
+def merge(bucket, tmp_path, **kwargs):
+    return merge_results.incremental_merge(PREFIX, bucket, cache_dir=str(tmp_path / "cache"), **kwargs)
+
+
+def test_union_header_across_differing_columns(bucket, tmp_path):
+    upload_csv(bucket, tmp_path, "result_1.csv", [{"sourceUrl": "a", "status": "Success", "person.firstName": "A"}])
+    upload_csv(bucket, tmp_path, "result_2.csv", [{"sourceUrl": "b", "status": "Success", "company.name": "B Co"}])
+    merge(bucket, tmp_path)
+
+    header, rows = merged(bucket)
+    assert header == ["sourceUrl", "status", "person.firstName", "company.name"]
+    assert rows[0]["company.name"] == "" and rows[1]["person.firstName"] == ""
+
+
+def test_row_order_is_stable(bucket, tmp_path):
+    upload_csv(bucket, tmp_path, "result_2.csv", [{"sourceUrl": u, "status": "Success"} for u in ("d", "c")])
+    upload_csv(bucket, tmp_path, "result_1.csv", [{"sourceUrl": u, "status": "Success"} for u in ("b", "a")])
+    merge(bucket, tmp_path)
+    first = [row["sourceUrl"] for row in merged(bucket)[1]]
+    merge(bucket, tmp_path, full=True)
+
+    assert first == ["b", "a", "d", "c"]  # blobs by name, rows in file order
+    assert [row["sourceUrl"] for row in merged(bucket)[1]] == first
+
+
+def test_appends_only_new_blobs(bucket, tmp_path):
+    upload_csv(bucket, tmp_path, "result_1.csv", [{"sourceUrl": "a", "status": "Success"}])
+    merge(bucket, tmp_path)
+    upload_csv(bucket, tmp_path, "result_2.csv", [{"sourceUrl": "b", "status": "Success"}])
+    manifest = merge(bucket, tmp_path)
+
+    assert [row["sourceUrl"] for row in merged(bucket)[1]] == ["a", "b"]
+    assert manifest["outputs"]["result_"]["rows"] == 2
+
+
+def test_dedup_keeps_first_row_per_url(bucket, tmp_path):
+    upload_csv(bucket, tmp_path, "result_1.csv", [{"sourceUrl": "a", "status": "Success", "n": "1"},
+                                                  {"sourceUrl": "b", "status": "Success", "n": "2"}])
+    upload_csv(bucket, tmp_path, "result_2.csv", [{"sourceUrl": "a", "status": "Success", "n": "3"}])
+    merge(bucket, tmp_path, dedup=True)
+
+    assert [(row["sourceUrl"], row["n"]) for row in merged(bucket)[1]] == [("a", "1"), ("b", "2")]
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_retry_success_replaces_failure_rows(bucket, tmp_path, full):
+    upload_csv(bucket, tmp_path, "result_1.csv", [{"sourceUrl": "a", "status": "HTTPError: 503"},
+                                                  {"sourceUrl": "b", "status": "Success"}])
+    upload_csv(bucket, tmp_path, "failures_1.csv", [{"sourceUrl": "a", "status": "HTTPError: 503"}])
+    merge(bucket, tmp_path)
+    upload_csv(bucket, tmp_path, "result_retry.csv", [{"sourceUrl": "a", "status": "Success"}])
+    merge(bucket, tmp_path, full=full, dedup=True)
+
+    assert [(row["sourceUrl"], row["status"]) for row in merged(bucket)[1]] == [("b", "Success"), ("a", "Success")]
+    assert bucket.get_blob(PREFIX + merge_results.MERGED_FAILURES) is None
+
+
+def test_mixed_csv_and_parquet_inputs(bucket, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    upload_csv(bucket, tmp_path, "result_1.csv", [{"sourceUrl": "a", "status": "Success", "person.firstName": "A"}])
+    parquet_path = tmp_path / "result_2.parquet"
+    pq.write_table(pa.Table.from_pylist([{"sourceUrl": "b", "status": "Success", "company.name": "B Co"}]),
+                   str(parquet_path))
+    bucket.blob(PREFIX + "result_2.parquet").upload_from_filename(str(parquet_path))
+    merge(bucket, tmp_path)
+
+    header, rows = merged(bucket)
+    assert header == ["sourceUrl", "status", "person.firstName", "company.name"]
+    assert [(row["sourceUrl"], row["person.firstName"], row["company.name"]) for row in rows] == [
+        ("a", "A", ""), ("b", "", "B Co")]
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_retried_duplicate_is_not_filled_in_twice(bucket, tmp_path, full):
+    canonical = "https://www.linkedin.com/in/a"
+    upload_csv(bucket, tmp_path, merge_results.DUPLICATES_FILE,
+               [{"sourceUrl": "linkedin.com/in/A/", "canonicalUrl": canonical}])
+    upload_csv(bucket, tmp_path, "result_1.csv", [{"sourceUrl": canonical, "status": "HTTPError: 503"}])
+    upload_csv(bucket, tmp_path, "failures_1.csv", [{"sourceUrl": canonical, "status": "HTTPError: 503"}])
+    merge(bucket, tmp_path)
+
+    failures = merged(bucket, merge_results.MERGED_FAILURES)[1]
+    assert [row["sourceUrl"] for row in failures] == [canonical, "linkedin.com/in/A/"]
+    failures_path = tmp_path / "ALL_FAILURES.csv"
+    bucket.get_blob(PREFIX + merge_results.MERGED_FAILURES).download_to_filename(str(failures_path))
+    urls, counts = failure_policy.retriable_urls([str(failures_path)])
+    assert urls == [canonical] and counts[failure_policy.TRANSIENT] == 1
+
+    # An older retry pass that also scraped the duplicate spelling directly.
+    upload_csv(bucket, tmp_path, "result_retry.csv", [{"sourceUrl": canonical, "status": "Success"},
+                                                      {"sourceUrl": "linkedin.com/in/A/", "status": "Success"}])
+    merge(bucket, tmp_path, full=full)
+
+    rows = merged(bucket)[1]
+    assert [(row["sourceUrl"], row["status"]) for row in rows] == [
+        (canonical, "Success"), ("linkedin.com/in/A/", "Success")]
+    assert bucket.get_blob(PREFIX + merge_results.MERGED_FAILURES) is None
@@ -0,0 +1,50 @@
+import json
+import zipfile
+
+import linkedin_scraper
+from work_queue import WorkQueue, enqueue_rows, queue_prefix
+
+RUN_ID = "run"
+
+
+def fake_scrape(on_scrape):
+    # Stands in for batch_scrape: writes the zip and summary it would.
+    def batch_scrape(input_file, output_file, batch_index=None, summary_file=None, **kwargs):
+        on_scrape(batch_index)
+        zip_file = f"scrape_results_{batch_index}.zip"
+        with zipfile.ZipFile(zip_file, "w") as zipf:
+            zipf.writestr(output_file, "sourceUrl,status\n")
+        with open(summary_file, "w") as f:
+            json.dump({"rows": 1}, f)
+        return zip_file
+    return batch_scrape
+
+
+def test_unit_whose_lease_was_taken_over_is_not_published(bucket, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    enqueue_rows(bucket, RUN_ID, ["LinkedIn URL"], [["https://www.linkedin.com/in/a"]], unit_rows=1)
+    other = WorkQueue(bucket, RUN_ID, "other-worker")
+
+    def take_over(unit):
+        # The lease expired mid-scrape and another worker claimed and finished the unit.
+        lease = other._write_lease(unit, if_generation_match=None)
+        other.complete(lease, "users/run/results/theirs.zip")
+
+    monkeypatch.setattr(linkedin_scraper, "batch_scrape", fake_scrape(take_over))
+    linkedin_scraper.run_queue_worker(RUN_ID, bucket, "slow-worker")
+
+    done = json.loads(bucket.get_blob(queue_prefix(RUN_ID) + "done/unit_00001.json").download_as_text())
+    assert done["worker"] == "other-worker"
+    assert list(bucket.list_blobs(prefix=f"users/{RUN_ID}/results/")) == []
+
+
+def test_unit_with_its_lease_is_published(bucket, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    enqueue_rows(bucket, RUN_ID, ["LinkedIn URL"], [["https://www.linkedin.com/in/a"]], unit_rows=1)
+    monkeypatch.setattr(linkedin_scraper, "batch_scrape", fake_scrape(lambda unit: None))
+    linkedin_scraper.run_queue_worker(RUN_ID, bucket, "worker")
+
+    done = json.loads(bucket.get_blob(queue_prefix(RUN_ID) + "done/unit_00001.json").download_as_text())
+    assert done["worker"] == "worker"
+    assert done["result_path"] == f"users/{RUN_ID}/results/scrape_results_unit_00001.zip"
+    assert bucket.get_blob(done["result_path"]) is not None
@@ -0,0 +1,28 @@
+import json
+import zipfile
+
+import linkedin_scraper
+
+CONFIG = {"API_KEY": "test-key"}
+
+
+def test_retry_keeps_the_original_chunk_artifacts(tmp_path, mock_api, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.json").write_text(json.dumps(CONFIG))
+    urls = [f"https://www.linkedin.com/in/user-{i}" for i in range(3)]
+    linkedin_scraper.write_input_urls(urls, "input.csv")
+    mock_api(rate_5xx=1.0)
+    linkedin_scraper.batch_scrape("input.csv", "result_5.csv", batch_index="5", cache_path=None,
+                                  summary_file="run_summary.json", config=CONFIG)
+
+    server = mock_api()
+    linkedin_scraper.retry_failures(["failures_5.csv"], "result_5.csv", "5", cache_path=None,
+                                    summary_file="run_summary.json", config=CONFIG)
+
+    assert server.stats["requests"] == len(urls)
+    with zipfile.ZipFile("scrape_results_5.zip") as zipf:
+        assert sorted(zipf.namelist()) == ["failures_5.csv", "result_5.csv"]
+    with zipfile.ZipFile("scrape_results_5_retry1.zip") as zipf:
+        assert zipf.namelist() == ["result_5_retry1.csv"]
+    assert json.loads((tmp_path / "run_summary.json").read_text())["failures"] == len(urls)
+    assert json.loads((tmp_path / "run_summary_5_retry1.json").read_text())["successes"] == len(urls)
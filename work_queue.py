@@ -0,0 +1,191 @@
+import json
+import socket
+import threading
+import time
+import uuid
+
+from chunk_upload import spool_chunks, upload_chunks
+from local_bucket import NotFound, PreconditionFailed
+
+UNIT_ROWS = 100
+LEASE_SECONDS = 300
+POLL_SECONDS = 15
+
+
+def queue_prefix(run_id):
+    return f"users/{run_id}/queue/"
+
+
+def unit_name(index):
+    return f"unit_{index:05d}"
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+
+
+def write_queue_manifest(bucket, run_id, units, workers, unit_rows=UNIT_ROWS, results_prefix=None):
+    manifest = {"run_id": run_id, "units": units, "workers": workers, "unit_rows": unit_rows}
+    if results_prefix:
+        manifest["results_prefix"] = results_prefix
+    bucket.blob(queue_prefix(run_id) + "manifest.json").upload_from_string(
+        json.dumps(manifest), content_type="application/json",
+    )
+
+
+def read_queue_manifest(bucket, run_id):
+    blob = bucket.get_blob(queue_prefix(run_id) + "manifest.json")
+    return json.loads(blob.download_as_text()) if blob else None
+
+
+def enqueue_rows(bucket, run_id, header, rows, unit_rows=UNIT_ROWS, first_unit=1, on_uploaded=None):
+    # Cuts rows into unit CSVs of unit_rows each, uploaded concurrently.
+    # on_uploaded(blob_name, rows, bytes) runs on the caller's thread as each
+    # unit lands. Returns the units written.
+    prefix = queue_prefix(run_id)
+    units = []
+
+    def name_for(index):
+        units.append(unit_name(first_unit + index - 1))
+        return f"{prefix}units/{units[-1]}.csv"
+
+    for uploaded in upload_chunks(bucket, spool_chunks(header, rows, unit_rows, name_for)):
+        if on_uploaded is not None:
+            on_uploaded(*uploaded)
+    return units
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class Lease:
+    def __init__(self, unit, generation, expires):
+        self.unit = unit
+        self.generation = generation
+        self.expires = expires
+
+
+class WorkQueue:
+    # Bucket-backed queue of small work units. A worker owns a unit while it
+    # holds its lease object; leases are created and renewed with generation
+    # preconditions so two workers can never both win the same unit, and an
+    # expired lease of a dead worker can be taken over by anyone.
+    #
+    #   queue/units/unit_00001.csv   input rows
+    #   queue/leases/unit_00001.json current owner and expiry
+    #   queue/done/unit_00001.json   completion marker
+    def __init__(self, bucket, run_id, worker_id=None, lease_seconds=LEASE_SECONDS, clock=time.time):
+        self.bucket = bucket
+        self.run_id = run_id
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self.prefix = queue_prefix(run_id)
+
+    def _names(self, folder):
+        prefix = f"{self.prefix}{folder}/"
+        return {
+            blob.name[len(prefix):].rsplit(".", 1)[0]: blob
+            for blob in self.bucket.list_blobs(prefix=prefix)
+        }
+
+    def units(self):
+        return sorted(self._names("units"))
+
+    def done(self):
+        return set(self._names("done"))
+
+    def unit_blob(self, unit):
+        return self.bucket.blob(f"{self.prefix}units/{unit}.csv")
+
+    def _lease_blob(self, unit):
+        return self.bucket.blob(f"{self.prefix}leases/{unit}.json")
+
+    def _lease_body(self, expires):
+        return json.dumps({"worker": self.worker_id, "expires": expires})
+
+    def _write_lease(self, unit, if_generation_match):
+        expires = self.clock() + self.lease_seconds
+        blob = self._lease_blob(unit)
+        blob.upload_from_string(self._lease_body(expires), content_type="application/json",
+                                if_generation_match=if_generation_match)
+        return Lease(unit, blob.generation, expires)
+
+    def claim(self):
+        # Returns a Lease on the first free or expired unit, or None.
+        done = self.done()
+        leases = self._names("leases")
+        for unit in self.units():
+            if unit in done:
+                continue
+            lease_blob = leases.get(unit)
+            try:
+                if lease_blob is None:
+                    lease = self._write_lease(unit, if_generation_match=0)
+                    if self.bucket.blob(f"{self.prefix}done/{unit}.json").exists():
+                        self.release(lease)  # finished while we were listing
+                        continue
+                    return lease
+                try:
+                    current = json.loads(lease_blob.download_as_bytes())
+                except (NotFound, ValueError):
+                    continue
+                if current.get("expires", 0) > self.clock():
+                    continue
+                print(f"♻️  Taking over expired lease on {unit} from {current.get('worker')}")
+                return self._write_lease(unit, if_generation_match=lease_blob.generation)
+            except PreconditionFailed:
+                continue  # another worker got there first
+        return None
+
+    def renew(self, lease):
+        try:
+            renewed = self._write_lease(lease.unit, if_generation_match=lease.generation)
+        except PreconditionFailed:
+            raise LeaseLost(f"Lease on {lease.unit} was taken over")
+        lease.generation = renewed.generation
+        lease.expires = renewed.expires
+        return lease
+
+    def complete(self, lease, result_path=None):
+        self.bucket.blob(f"{self.prefix}done/{lease.unit}.json").upload_from_string(
+            json.dumps({"worker": self.worker_id, "finished": self.clock(), "result_path": result_path}),
+            content_type="application/json",
+        )
+        self.release(lease)
+
+    def release(self, lease):
+        try:
+            self._lease_blob(lease.unit).delete(if_generation_match=lease.generation)
+        except (NotFound, PreconditionFailed):
+            pass
+
+    def remaining(self):
+        return len(set(self.units()) - self.done())
+
+
+class LeaseKeeper(threading.Thread):
+    # Renews a lease in the background while its unit is being scraped.
+    def __init__(self, queue, lease, interval=None):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.lease = lease
+        self.interval = interval or queue.lease_seconds / 3
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.queue.renew(self.lease)
+            except LeaseLost as e:
+                print(f"⚠️  {e}")
+                self.lost = True
+                return
+            except Exception as e:
+                print(f"⚠️  Lease renewal failed for {self.lease.unit}: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
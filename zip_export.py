@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import tempfile
+import zipfile
+
+SPOOL_MAX_BYTES = 32 * 1024 * 1024  # beyond this the buffers roll over to disk
+MERGED_MEMBER = "linkedin_scraped_all.csv"
+
+
+def union_fieldnames(rows, fieldnames=None, seen=None):
+    # Column order follows first appearance, like pd.DataFrame(rows).
+    fieldnames = [] if fieldnames is None else fieldnames
+    seen = set(fieldnames) if seen is None else seen
+    for row in rows:
+        for key in row:
+            if key not in seen:
+                seen.add(key)
+                fieldnames.append(key)
+    return fieldnames
+
+
+def write_csv_member(zipf, name, fieldnames, rows):
+    with zipf.open(name, "w", force_zip64=True) as member:
+        text = io.TextIOWrapper(member, encoding="utf-8", newline="")
+        writer = csv.DictWriter(text, fieldnames=fieldnames, restval="", extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+        text.flush()
+        text.detach()
+
+
+class ZipResultExport:
+    # Builds the result zip as rows arrive: every batch_size rows become a
+    # compressed batch_N.csv member, and all rows are spooled as JSON lines
+    # until close() streams them into the merged CSV under the full header.
+    # Each job owns its buffers, so sessions never share files on disk.
+    def __init__(self, batch_size=50, spool_max_bytes=SPOOL_MAX_BYTES):
+        self.batch_size = batch_size
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes)
+        self.zipf = zipfile.ZipFile(self.buffer, "w", zipfile.ZIP_DEFLATED)
+        self.rows_spool = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes, mode="w+", encoding="utf-8")
+        self.fieldnames = []
+        self._seen = set()
+        self.batch = []
+        self.batches = 0
+        self.rows = 0
+        self.closed = False
+
+    def add(self, row):
+        self.batch.append(row)
+        self.rows_spool.write(json.dumps(row) + "\n")
+        union_fieldnames([row], self.fieldnames, self._seen)
+        self.rows += 1
+        if len(self.batch) >= self.batch_size:
+            self._flush_batch()
+
+    def _flush_batch(self):
+        if not self.batch:
+            return
+        self.batches += 1
+        write_csv_member(self.zipf, f"batch_{self.batches}.csv", union_fieldnames(self.batch), self.batch)
+        self.batch = []
+
+    def _spooled_rows(self):
+        self.rows_spool.seek(0)
+        for line in self.rows_spool:
+            yield json.loads(line)
+
+    def close(self):
+        if self.closed:
+            return self
+        self._flush_batch()
+        write_csv_member(self.zipf, MERGED_MEMBER, self.fieldnames, self._spooled_rows())
+        self.zipf.close()
+        self.rows_spool.close()
+        self.closed = True
+        return self
+
+    @property
+    def size(self):
+        return self.buffer.seek(0, io.SEEK_END)
+
+    def read_bytes(self):
+        self.buffer.seek(0)
+        return self.buffer.read()
+
+    def dataframe(self):
+        import pandas as pd
+        self.buffer.seek(0)
+        with zipfile.ZipFile(self.buffer) as zipf, zipf.open(MERGED_MEMBER) as f:
+            return pd.read_csv(f)
+
+    def discard(self):
+        self.buffer.close()
+        if not self.rows_spool.closed:
+            self.rows_spool.close()